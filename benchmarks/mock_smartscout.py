@@ -0,0 +1,366 @@
+# benchmarks/mock_smartscout.py
+#
+# Local stand-in for app.smartscout.com with the DOM the scrapers depend on:
+# sign-in form, Keyword Tools menu -> Rank Maker (ASIN search, ag-grid filter
+# side bar, "Export as" -> CSV menu) and Subcategories -> Niche Finder tab
+# (Filters -> Subcategory filter, Excel side panel -> CSV icon). The grids
+# load through JSON calls shaped like ag-grid's server-side model, so API mode
+# works against it too. Exports are CSV downloads of configurable size and
+# every request can be delayed.
+#
+#   python -m benchmarks.mock_smartscout --port 8765 --rows 5000 --latency 50
+#   SMARTSCOUT_BASE_URL=http://127.0.0.1:8765 python main.py
+import io
+import csv
+import uuid
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Form, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
+
+SESSION_COOKIE = "mock_session"
+PAGE_ROWS = 100  # rows the grid renders, like ag-grid's first block
+
+# 1x1 transparent PNG, also served for the .ico
+PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+
+@dataclass
+class MockConfig:
+    rows: int = 2000            # rows per dataset, before filters
+    latency_ms: int = 0         # added to every page, API and export request
+    jitter_ms: int = 0          # random extra delay, uniform in [0, jitter_ms]
+    export_delay_ms: int = 0    # extra delay before an export starts streaming
+    password: str = None        # accept only this password (any non-empty one if None)
+
+
+STYLE = """
+<style>
+  body { font-family: sans-serif; margin: 0; }
+  .hidden { display: none !important; }
+  nav { display: flex; gap: 16px; padding: 8px; background: #223; color: #fff; }
+  .menu-item, .submenu-item, .mat-tab-label { cursor: pointer; padding: 4px 8px; }
+  mat-icon { display: inline-block; min-width: 16px; }
+  .mat-tab-labels { display: flex; gap: 8px; border-bottom: 1px solid #ccc; }
+  .ag-root-wrapper { display: flex; border: 1px solid #ccc; height: 520px; position: relative; }
+  .ag-center-cols-container { flex: 1; overflow: auto; }
+  .ag-row { display: flex; gap: 12px; border-bottom: 1px solid #eee; padding: 2px 4px; }
+  .ag-overlay-loading-wrapper { position: absolute; inset: 0; background: rgba(255,255,255,.7); }
+  .ag-side-bar { width: 260px; border-left: 1px solid #ccc; padding: 4px; }
+  .ag-side-button-button { display: block; margin-bottom: 4px; }
+  .ag-side-button-button img, img.export-icon { width: 24px; height: 24px; display: inline-block; }
+  .ag-group-title-bar { cursor: pointer; padding: 4px; background: #f4f4f4; }
+</style>
+"""
+
+GRID_SCRIPT = """
+<script>
+  let pending = null;
+  function show(id, on) { document.getElementById(id).classList.toggle('hidden', !on); }
+  function toggle(id) { document.getElementById(id).classList.toggle('hidden'); }
+  function renderRows(rows) {
+    const container = document.querySelector('.ag-center-cols-container');
+    container.innerHTML = rows.slice(0, %(page_rows)d).map(row =>
+      '<div class="ag-row">' + Object.values(row).map(v => '<span>' + v + '</span>').join('') + '</div>'
+    ).join('');
+  }
+  async function loadRows(url, body) {
+    show('grid-loading', true);
+    try {
+      const response = await fetch(url, {
+        method: 'POST', headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(Object.assign({startRow: 0, endRow: %(page_rows)d, filterModel: {}}, body))
+      });
+      const data = await response.json();
+      renderRows(data.rows);
+    } finally {
+      show('grid-loading', false);
+    }
+  }
+  function debounce(fn) { clearTimeout(pending); pending = setTimeout(fn, 300); }
+</script>
+""" % {"page_rows": PAGE_ROWS}
+
+GRID_SHELL = """
+<div class="ag-root-wrapper">
+  <div id="grid-loading" class="ag-overlay-loading-wrapper hidden"><div class="ag-overlay-loading-center">Loading...</div></div>
+  <div class="ag-center-cols-container"></div>
+  <div class="ag-side-bar">%s</div>
+</div>
+"""
+
+SIGNIN_PAGE = """<!doctype html><html><head><title>Sign in</title>%s</head><body>
+<form method="post" action="/sessions/signin">
+  <input id="username" name="username" autocomplete="off">
+  <input id="password" name="password" type="password">
+  <button type="submit">Sign in</button>
+</form>
+%%s
+</body></html>""" % STYLE
+
+APP_PAGE = """<!doctype html><html><head><title>SmartScout (mock)</title>%s%s</head><body>
+<nav>
+  <div class="menu-item" onclick="toggle('keyword-submenu')">
+    <mat-icon data-mat-icon-name="keyword-tools" svgicon="keyword-tools">kw</mat-icon> Keyword Tools
+  </div>
+  <div id="keyword-submenu" class="hidden">
+    <div class="submenu-item" onclick="openRankMaker()"><div class="name">Rank Maker</div></div>
+  </div>
+  <a href="/app/subcategories" style="color:#fff">Subcategories</a>
+</nav>
+<main id="view">%%s</main>
+<script>
+  function openRankMaker() {
+    history.pushState({}, '', '/app/rank-maker');
+    document.getElementById('view').innerHTML = document.getElementById('rank-maker-template').innerHTML;
+    show('keyword-submenu', false);
+  }
+  function rankBody() {
+    const max = document.querySelector("input[formcontrolname='max']").value;
+    const filterModel = max ? {latestRank: {filterType: 'number', type: 'lessThanOrEqual', filter: Number(max)}} : {};
+    return {asin: document.querySelector("input[name='asin']").value, filterModel: filterModel};
+  }
+  function searchAsin(event) {
+    if (event.key !== 'Enter') return;
+    document.getElementById('grid-area').classList.remove('hidden');
+    loadRows('/api/rank-maker/rows', rankBody());
+  }
+  function exportRankMaker() {
+    const body = rankBody();
+    const max = body.filterModel.latestRank ? body.filterModel.latestRank.filter : '';
+    window.location.href = '/export/rank-maker.csv?asin=' + encodeURIComponent(body.asin) + '&max=' + max;
+  }
+</script>
+<template id="rank-maker-template">
+  <input placeholder="Search ASIN" name="asin" onkeydown="searchAsin(event)">
+  <button class="btn-wrapper secondary" onclick="toggle('export-menu')"><span>Export as</span></button>
+  <div id="export-menu" class="hidden">
+    <button mat-menu-item onclick="exportRankMaker()"><mat-icon svgicon="csv">csv</mat-icon> CSV</button>
+  </div>
+  <div id="grid-area" class="hidden">%s</div>
+</template>
+</body></html>""" % (STYLE, GRID_SCRIPT, GRID_SHELL % """
+    <button ref="eToggleButton" class="ag-side-button-button" onclick="toggle('rank-filters')"><span>Filters</span></button>
+    <div id="rank-filters" class="hidden">
+      <div class="ag-group-title-bar" onclick="toggle('rank-group')"><span>Latest Rank</span></div>
+      <div id="rank-group" class="hidden">
+        <input formcontrolname="max" type="number" oninput="debounce(() => loadRows('/api/rank-maker/rows', rankBody()))">
+      </div>
+    </div>
+""")
+
+SUBCATEGORIES_VIEW = """
+<div class="mat-tab-labels">
+  <div class="mat-tab-label"><div class="mat-tab-label-content">Subcategories</div></div>
+  <div class="mat-tab-label" onclick="openNicheFinder()"><div class="mat-tab-label-content">Niche Finder</div></div>
+</div>
+<div id="niche-area" class="hidden">%s</div>
+<script>
+  function nicheBody() {
+    const text = document.querySelector("input[placeholder='Filter...']").value;
+    return {filterModel: text ? {subcategory: {filterType: 'text', type: 'contains', filter: text}} : {}};
+  }
+  function openNicheFinder() {
+    document.getElementById('niche-area').classList.remove('hidden');
+    loadRows('/api/niche-finder/rows', nicheBody());
+  }
+  function exportNicheFinder() {
+    const model = nicheBody().filterModel;
+    window.location.href = '/export/niche-finder.csv?q=' + encodeURIComponent(model.subcategory ? model.subcategory.filter : '');
+  }
+</script>
+""" % (GRID_SHELL % """
+    <button class="ag-side-button-button" onclick="toggle('niche-filters')"><span>Filters</span></button>
+    <div id="niche-filters" class="hidden">
+      <div class="ag-group-title-bar" onclick="toggle('niche-group')"><span>Subcategory</span></div>
+      <div id="niche-group" class="hidden">
+        <input class="ag-input-field-input" placeholder="Filter..."
+               oninput="debounce(() => loadRows('/api/niche-finder/rows', nicheBody()))">
+      </div>
+    </div>
+    <button class="ag-side-button-button" onclick="toggle('excel-panel')"><img src="/assets/excel.png"></button>
+    <div id="excel-panel" class="hidden">
+      <img class="export-icon" src="/assets/csv.ico" mattooltip="Export as CSV" onclick="exportNicheFinder()">
+    </div>
+""")
+
+
+# --- Data ---
+
+def niche_rows(config: MockConfig, text: str = "") -> list:
+    """Every row matches the filter text, so exports keep the configured size"""
+    label = text or "Subcategory"
+    return [
+        {
+            "subcategory": f"{label} {i}",
+            "category": f"Category {i % 25}",
+            "monthlyRevenue": 1000 + (i * 7919) % 250000,
+            "avgPrice": round(5 + (i * 31) % 200 + 0.99, 2),
+            "totalReviews": (i * 131) % 50000,
+            "brands": 1 + i % 60,
+        }
+        for i in range(config.rows)
+    ]
+
+
+def rank_rows(config: MockConfig, asin: str, max_rank: int = None) -> list:
+    rows = [
+        {
+            "keyword": f"{asin.lower()} keyword {i}",
+            "latestRank": 1 + i % 100,
+            "searchVolume": 100 + (i * 977) % 90000,
+            "relevancy": round(((i * 37) % 100) / 100, 2),
+        }
+        for i in range(config.rows)
+    ]
+    if max_rank is not None:
+        rows = [row for row in rows if row["latestRank"] <= max_rank]
+    return rows
+
+
+def _max_rank(filter_model: dict):
+    rank = (filter_model or {}).get("latestRank") or {}
+    return rank.get("filter")
+
+
+def _text_filter(filter_model: dict) -> str:
+    return ((filter_model or {}).get("subcategory") or {}).get("filter") or ""
+
+
+def csv_stream(rows: list):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]) if rows else ["empty"])
+    writer.writeheader()
+    for number, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if number % 1000 == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+# --- App ---
+
+def create_app(config: MockConfig = None) -> FastAPI:
+    config = config or MockConfig()
+    sessions = set()
+    app = FastAPI(title="Mock SmartScout")
+    app.state.config = config
+    app.state.stats = {"requests": 0, "logins": 0, "exports": 0}
+
+    @app.middleware("http")
+    async def inject_latency(request: Request, call_next):
+        app.state.stats["requests"] += 1
+        delay = config.latency_ms + (random.uniform(0, config.jitter_ms) if config.jitter_ms else 0)
+        if delay and not request.url.path.startswith("/assets/"):
+            await asyncio.sleep(delay / 1000)
+        return await call_next(request)
+
+    def signed_in(request: Request) -> bool:
+        return request.cookies.get(SESSION_COOKIE) in sessions
+
+    def app_page(request: Request, view: str = ""):
+        if not signed_in(request):
+            return RedirectResponse("/sessions/signin", status_code=302)
+        return HTMLResponse(APP_PAGE % view)
+
+    @app.get("/sessions/signin")
+    async def signin_page():
+        return HTMLResponse(SIGNIN_PAGE % "")
+
+    @app.post("/sessions/signin")
+    async def signin(username: str = Form(""), password: str = Form("")):
+        if not username or not password or (config.password and password != config.password):
+            return HTMLResponse(SIGNIN_PAGE % "<p class='error'>Invalid credentials</p>", status_code=401)
+        token = uuid.uuid4().hex
+        sessions.add(token)
+        app.state.stats["logins"] += 1
+        response = RedirectResponse("/app/home", status_code=303)
+        response.set_cookie(SESSION_COOKIE, token, httponly=True)
+        return response
+
+    @app.get("/app/home")
+    async def home(request: Request):
+        return app_page(request)
+
+    @app.get("/app/rank-maker")
+    async def rank_maker(request: Request):
+        return app_page(request)
+
+    @app.get("/app/subcategories")
+    async def subcategories(request: Request):
+        return app_page(request, SUBCATEGORIES_VIEW)
+
+    @app.post("/api/rank-maker/rows")
+    async def rank_maker_rows(request: Request):
+        if not signed_in(request):
+            return Response(status_code=401)
+        body = await request.json()
+        rows = rank_rows(config, body.get("asin", ""), _max_rank(body.get("filterModel")))
+        start, end = body.get("startRow", 0), body.get("endRow", PAGE_ROWS)
+        return {"rows": rows[start:end], "lastRow": len(rows)}
+
+    @app.post("/api/niche-finder/rows")
+    async def niche_finder_rows(request: Request):
+        if not signed_in(request):
+            return Response(status_code=401)
+        body = await request.json()
+        rows = niche_rows(config, _text_filter(body.get("filterModel")))
+        start, end = body.get("startRow", 0), body.get("endRow", PAGE_ROWS)
+        return {"rows": rows[start:end], "lastRow": len(rows)}
+
+    async def export(request: Request, name: str, rows: list):
+        if not signed_in(request):
+            return Response(status_code=401)
+        if config.export_delay_ms:
+            await asyncio.sleep(config.export_delay_ms / 1000)
+        app.state.stats["exports"] += 1
+        return StreamingResponse(
+            csv_stream(rows), media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{name}"'},
+        )
+
+    @app.get("/export/rank-maker.csv")
+    async def export_rank_maker(request: Request, asin: str = "", max: str = ""):
+        rows = rank_rows(config, asin, int(max) if max else None)
+        return await export(request, f"rank_maker_{asin}.csv", rows)
+
+    @app.get("/export/niche-finder.csv")
+    async def export_niche_finder(request: Request, q: str = ""):
+        return await export(request, "niche_finder.csv", niche_rows(config, q))
+
+    @app.get("/assets/{name}")
+    async def asset(name: str):
+        return Response(PIXEL, media_type="image/png")
+
+    @app.get("/mock/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the SmartScout web app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", type=int, default=MockConfig.rows, help="rows per dataset, before filters")
+    parser.add_argument("--latency", type=int, default=0, help="ms added to every request")
+    parser.add_argument("--jitter", type=int, default=0, help="random extra ms per request")
+    parser.add_argument("--export-delay", type=int, default=0, help="ms before an export starts")
+    args = parser.parse_args()
+    config = MockConfig(args.rows, args.latency, args.jitter, args.export_delay)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+# benchmarks/run.py
+#
+# Throughput and latency benchmark against the local mock SmartScout site, so
+# releases can be compared without real credentials or the real site.
+#
+#   python -m benchmarks.run                                   # all scenarios, concurrency 1,2,4
+#   python -m benchmarks.run --scenarios niche-finder,rank-maker-api --concurrency 1,4 --jobs 8
+#   python -m benchmarks.run --save-baseline                   # store results as the baseline
+#   python -m benchmarks.run --baseline benchmarks/results/baseline.json --tolerance 0.2
+#
+# Scenarios:
+#   niche-finder, rank-maker          run_niche_finder_export / run_keyword_tools_export directly
+#   niche-finder-api, rank-maker-api  the same in API mode (grid data call replayed)
+#   http-niche-finder, http-rank-maker  the FastAPI endpoints, served by uvicorn in this process
+#
+# Reports p50/p95/p99 latency, jobs per minute and the peak RSS of this
+# process plus its children (chromedriver and Chrome). Exits 1 when a result
+# regresses past the baseline by more than the tolerance.
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_smartscout import MockConfig, create_app
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+USERNAME = "bench@example.com"
+PASSWORD = "bench-password"
+
+SCENARIOS = (
+    "niche-finder", "rank-maker",
+    "niche-finder-api", "rank-maker-api",
+    "http-niche-finder", "http-rank-maker",
+)
+
+
+# --- Servers ---
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(app, port: int):
+    """Run an ASGI app with uvicorn on a background thread; returns the server"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name=f"uvicorn-{port}", daemon=True).start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"Server on port {port} did not start")
+        time.sleep(0.05)
+    return server
+
+
+# --- Measurements ---
+
+def _children() -> dict:
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the ppid follows its closing paren
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return parents
+
+
+def tree_rss_bytes(root_pid: int = None) -> int:
+    """Resident memory of a process and all its descendants, read from /proc"""
+    root_pid = root_pid or os.getpid()
+    parents = _children()
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        for child, parent in parents.items():
+            if parent == pid and child not in tree:
+                tree.add(child)
+                frontier.append(child)
+    total = 0
+    for pid in tree:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class RssSampler:
+    """Samples the process tree's RSS on a thread and keeps the peak"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = tree_rss_bytes()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, tree_rss_bytes())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, tree_rss_bytes())
+
+
+def percentile(values: list, pct: float) -> float:
+    """Linear-interpolated percentile of `values` (0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies: list, errors: list, wall_seconds: float, peak_rss: int) -> dict:
+    return {
+        "jobs": len(latencies) + len(errors),
+        "errors": len(errors),
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "jobs_per_min": round(len(latencies) / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        "wall_seconds": round(wall_seconds, 2),
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+        "first_errors": errors[:3],
+    }
+
+
+# --- Scenarios ---
+
+def _remove_result(result: dict):
+    if isinstance(result, dict) and result.get("file_path") and os.path.exists(result["file_path"]):
+        os.remove(result["file_path"])
+
+
+def direct_job(scenario: str, pool):
+    from scrapers.smartscout.scrapers.niche_finder import run_niche_finder_export
+    from scrapers.smartscout.scrapers.rank_maker import run_keyword_tools_export
+
+    mode = "api" if scenario.endswith("-api") else "browser"
+
+    def job(i: int):
+        if scenario.startswith("niche-finder"):
+            result = run_niche_finder_export(f"bench {i}", USERNAME, PASSWORD, pool=pool, mode=mode)
+        else:
+            result = run_keyword_tools_export(f"B0BENCH{i:04d}", USERNAME, PASSWORD, pool=pool, mode=mode)
+        _remove_result(result)
+    return job
+
+
+def http_job(scenario: str, base_url: str):
+    import requests
+
+    endpoint = "/smartscout/niche-finder" if scenario == "http-niche-finder" else "/smartscout/rank-maker"
+    run_id = uuid.uuid4().hex[:8]  # unique search texts so the result cache never answers
+
+    def job(i: int):
+        response = requests.post(base_url + endpoint, json={
+            "search_text": f"bench {run_id} {i}" if "niche" in endpoint else f"B0{run_id}{i:04d}".upper(),
+            "username": USERNAME,
+            "password": PASSWORD,
+        }, timeout=900)
+        response.raise_for_status()
+    return job
+
+
+def run_level(job, concurrency: int, jobs: int) -> dict:
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            job(i)
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}"[:300])
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, range(jobs)))
+        wall = time.perf_counter() - started
+    return summarize(latencies, errors, wall, rss.peak)
+
+
+# --- Baselines ---
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions as strings: p95 slower or throughput lower than the baseline by more than `tolerance`"""
+    regressions = []
+    for key, current in results.items():
+        before = baseline.get("results", {}).get(key)
+        if not before or current["errors"] == current["jobs"]:
+            continue
+        if before["p95"] and current["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {before['p95']}s -> {current['p95']}s")
+        if before["jobs_per_min"] and current["jobs_per_min"] < before["jobs_per_min"] * (1 - tolerance):
+            regressions.append(f"{key}: {before['jobs_per_min']} -> {current['jobs_per_min']} jobs/min")
+    return regressions
+
+
+def print_table(results: dict, baseline: dict = None):
+    header = f"{'scenario @ concurrency':<30} {'jobs':>5} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'jobs/min':>9} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for key, r in results.items():
+        line = (f"{key:<30} {r['jobs']:>5} {r['errors']:>4} {r['p50']:>8.2f} {r['p95']:>8.2f} "
+                f"{r['p99']:>8.2f} {r['jobs_per_min']:>9.1f} {r['peak_rss_mb']:>8.1f}")
+        before = (baseline or {}).get("results", {}).get(key)
+        if before and before["p95"]:
+            line += f"   p95 {(r['p95'] / before['p95'] - 1) * 100:+.0f}% vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against a local mock SmartScout")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated, see module docstring")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma separated concurrency levels")
+    parser.add_argument("--jobs", type=int, default=6, help="jobs per concurrency level")
+    parser.add_argument("--rows", type=int, default=MockConfig.rows, help="rows per mock dataset")
+    parser.add_argument("--latency", type=int, default=50, help="ms the mock adds to every request")
+    parser.add_argument("--jitter", type=int, default=25, help="random extra ms per mock request")
+    parser.add_argument("--export-delay", type=int, default=250, help="ms before a mock export starts")
+    parser.add_argument("--profile", default=os.getenv("BROWSER_PROFILE", "performance"), help="browser profile")
+    parser.add_argument("--baseline", default=None, help=f"compare with this file (default {BASELINE_PATH} if present)")
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression, as a fraction")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    config = MockConfig(args.rows, args.latency, args.jitter, args.export_delay)
+    mock_port = free_port()
+    serve(create_app(config), mock_port)
+    print(f"🧪 Mock SmartScout on http://127.0.0.1:{mock_port} ({args.rows} rows, {args.latency}±{args.jitter} ms)")
+
+    # Point the scrapers at the mock and keep jobs, caches and sessions out of data/
+    # before any of them is imported
+    workdir = tempfile.mkdtemp(prefix="scraper-bench-")
+    os.environ.update({
+        "SMARTSCOUT_BASE_URL": f"http://127.0.0.1:{mock_port}",
+        "BROWSER_PROFILE": args.profile,
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "RESULT_CACHE_DIR": os.path.join(workdir, "result_cache"),
+        "SCRAPER_DISPATCH": "local",
+        "SCRAPER_WORKERS": str(max(levels)),
+        "SMARTSCOUT_POOL_SIZE": str(max(levels)),
+        "SMARTSCOUT_PREWARM_BROWSERS": "0",
+    })
+    from scrapers.base_scraper import resolve_chromedriver
+    from scrapers.smartscout.driver_pool import DriverPool
+
+    try:
+        resolve_chromedriver()
+    except Exception as e:
+        sys.exit(f"❌ The benchmark needs Chrome and chromedriver: {e}")
+    results = {}
+    pool = None
+    api_server = None
+    try:
+        for scenario in scenarios:
+            if scenario.startswith("http-"):
+                if api_server is None:
+                    from main import app
+                    api_port = free_port()
+                    api_server = serve(app, api_port)
+                job = http_job(scenario, f"http://127.0.0.1:{api_port}")
+            else:
+                pool = pool or DriverPool(size=max(levels))
+                job = direct_job(scenario, pool)
+            for level in levels:
+                print(f"⏱️ {scenario} @ {level}: {args.jobs} jobs")
+                results[f"{scenario}@{level}"] = run_level(job, level, args.jobs)
+    finally:
+        if pool:
+            pool.close()
+        if api_server:
+            api_server.should_exit = True
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline_path = args.baseline or (BASELINE_PATH if os.path.exists(BASELINE_PATH) else None)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print()
+    print_table(results, baseline)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline")},
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report_path = os.path.join(RESULTS_DIR, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to {report_path}")
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline updated: {BASELINE_PATH}")
+
+    if baseline and not args.save_baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"✅ Within {args.tolerance:.0%} of baseline {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,152 @@
 import asyncio
+import hashlib
+import json
 import os
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import threading
+import time
+import uuid
+from functools import partial
+from typing import Annotated, List, Literal, Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, StringConstraints
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor
 
-# Import scrapers
-from scrapers.smartscout.scrapers.niche_finder import run_niche_finder_export
-from scrapers.smartscout.scrapers.rank_maker import run_keyword_tools_export
+# Scraper modules are imported on first use (see service/registry.py)
+from scrapers.errors import ScrapeAborted
+from scrapers.smartscout.session_cache import credentials_digest
+from scrapers.telemetry import register_gauge, register_runtime_gauges, render_metrics
+from scrapers.circuit_breaker import CIRCUITS, CircuitOpen
+from service.handlers import build_handlers, rank_maker_batch_records
+from service.jobs import (
+    JobRunner, QueueFull, load_queue_backend, run_via_queue, job_status, caused_by,
+    SUCCEEDED, EXPIRED, TERMINAL_STATES
+)
+from service.result_cache import ResultCache, cache_key, result_details
+from service.formats import OutputOptions, FormatError, output_options, render, render_rows
+from service.registry import load_scrapers, watchable_endpoints
+from service.snapshots import SnapshotError, load_snapshot_store, parse_since
+from service.credentials import CredentialsError
+from service.scheduler import (
+    SCHEDULER_ENABLED, WATCH_DEFAULT_SCHEDULE, WATCH_RESULT_TTL, Scheduler, ScheduleError, WatchlistStore
+)
 
 # Load environment variables
 load_dotenv()
 
-# Create limited thread pool
-SCRAPER_EXECUTOR = ThreadPoolExecutor(max_workers=3)
+# "local" runs scrapes in this process; "workers" only queues them for worker.py processes
+SCRAPER_DISPATCH = os.getenv("SCRAPER_DISPATCH", "local")
+LOCAL_SCRAPING = SCRAPER_DISPATCH == "local"
+if LOCAL_SCRAPING:
+    # Only processes that drive browsers load Selenium; API-only replicas never do
+    from scrapers.base_scraper import resolve_chromedriver
+    from scrapers.browser_supervisor import SUPERVISOR
+    from scrapers.smartscout.driver_pool import get_driver_pool, prewarm_from_env
+    from service.accounts import AccountScheduler
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+SYNC_JOB_PRIORITY = int(os.getenv("SYNC_JOB_PRIORITY", "100"))
+# Longest a synchronous scrape is waited for; clients may ask for less with X-Request-Timeout
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "900"))
+DISCONNECT_POLL_INTERVAL = 1.0
 
-app = FastAPI(title="Unified Scraper API")
+# Create limited thread pool, one worker per warm browser. In workers mode the
+# threads only wait on queued jobs, so there can be many more of them.
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "3"))
+DISPATCH_WAITERS = int(os.getenv("DISPATCH_WAITERS", "64"))
+SCRAPER_EXECUTOR = ThreadPoolExecutor(max_workers=SCRAPER_WORKERS if LOCAL_SCRAPING else DISPATCH_WAITERS)
+# Local scrapes are admitted per account (rate, adaptive concurrency, round-robin);
+# in workers mode each worker does this for the jobs it runs
+ACCOUNT_SCHEDULER = AccountScheduler(SCRAPER_EXECUTOR, SCRAPER_WORKERS) if LOCAL_SCRAPING else None
+DRIVER_POOL = get_driver_pool() if LOCAL_SCRAPING else None
+# Every Rank Maker / Niche Finder result is kept as a snapshot for deltas and history
+SNAPSHOTS = load_snapshot_store()
+# Scrapers declared by modules under scrapers/<site>/scrapers/, each served as an endpoint
+SCRAPERS = load_scrapers()
+JOB_HANDLERS = build_handlers(DRIVER_POOL, SNAPSHOTS, SCRAPERS, ACCOUNT_SCHEDULER)
 
-class ScrapeRequest(BaseModel):
+# Identical requests within the TTL are answered from disk
+RESULT_CACHE = ResultCache()
+
+# Background jobs share the scraper executor's slots with synchronous requests
+JOB_STORE = load_queue_backend()
+JOB_RUNNER = JobRunner(JOB_STORE, ACCOUNT_SCHEDULER, SCRAPER_WORKERS, JOB_HANDLERS) if LOCAL_SCRAPING else None
+BATCH_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "downloads", "batches")
+
+register_runtime_gauges(SCRAPER_EXECUTOR, DRIVER_POOL, ACCOUNT_SCHEDULER)
+register_gauge("job_queue_depth", "Jobs waiting in the shared queue", JOB_STORE.queue_depth)
+register_gauge("result_cache_inflight", "Scrapes currently shared by waiting requests",
+               lambda: RESULT_CACHE.stats()["inflight"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if LOCAL_SCRAPING:
+        # Kill browsers a crashed predecessor left running, then keep watching ours
+        await asyncio.to_thread(SUPERVISOR.start)
+        # Resolve chromedriver and log browsers in before the first request needs them
+        try:
+            await asyncio.to_thread(resolve_chromedriver)
+            await asyncio.to_thread(prewarm_from_env, DRIVER_POOL)
+        except Exception as e:
+            print(f"⚠️ Browser warm-up failed, continuing cold: {e}")
+    if JOB_RUNNER:
+        JOB_RUNNER.start()
+    else:
+        print(f"📮 Dispatching scrapes to worker processes ({len(JOB_STORE.workers())} registered)")
+    if SCHEDULER:
+        SCHEDULER.start()
+    yield
+    if SCHEDULER:
+        SCHEDULER.stop()
+    if JOB_RUNNER:
+        JOB_RUNNER.stop()
+    # Quit warm browsers so no Chrome processes outlive the API
+    if ACCOUNT_SCHEDULER:
+        ACCOUNT_SCHEDULER.shutdown()
+    SCRAPER_EXECUTOR.shutdown(wait=True, cancel_futures=True)
+    if JOB_RUNNER:
+        JOB_RUNNER.deregister()
+    if DRIVER_POOL:
+        DRIVER_POOL.close()
+        SUPERVISOR.stop()
+
+app = FastAPI(title="Unified Scraper API", lifespan=lifespan)
+
+# An ASIN is ten letters or digits (trimmed, upper-cased); anything else never reaches the scraper or a file path
+Asin = Annotated[str, StringConstraints(strip_whitespace=True, to_upper=True, pattern=r"^\s*[A-Za-z0-9]{10}\s*$")]
+
+
+class BatchRankMakerRequest(BaseModel):
+    asins: List[Asin] = Field(min_length=1, max_length=int(os.getenv("RANK_MAKER_BATCH_LIMIT", "500")))
+    username: str
+    password: str
+    max_rank: int = 65
+
+# Scrapers searched by text with a snapshot history can be watched; the watchlist store checks the same list
+WATCHABLE_ENDPOINTS = watchable_endpoints(SCRAPERS)
+
+class WatchRequest(BaseModel):
+    endpoint: Literal[WATCHABLE_ENDPOINTS]
     search_text: str
-    username: str 
+    username: str
     password: str
-    max_rank: int = 65  # Added optional max_rank
+    max_rank: int = 65
+    mode: Literal["browser", "api"] = os.getenv("SMARTSCOUT_EXPORT_MODE", "browser")
+    schedule: str = WATCH_DEFAULT_SCHEDULE  # cron: minute hour day month weekday
+    result_ttl: int = Field(WATCH_RESULT_TTL, ge=60)  # seconds the prefetched result is served
+    enabled: bool = True
 
-def cleanup_file(file_path: str):
-    """Delete file after it's been sent"""
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"🗑️ Deleted: {file_path}")
-    except Exception as e:
-        print(f"⚠️ Could not delete {file_path}: {e}")
+class WatchUpdate(BaseModel):
+    search_text: Optional[str] = None
+    username: Optional[str] = None
+    password: Optional[str] = None
+    max_rank: Optional[int] = None
+    mode: Optional[Literal["browser", "api"]] = None
+    schedule: Optional[str] = None
+    result_ttl: Optional[int] = Field(None, ge=60)
+    enabled: Optional[bool] = None
 
 @app.get("/")
 async def root():
@@ -39,79 +154,624 @@ async def root():
 
 # --- SmartScout Endpoints ---
 
-@app.post("/smartscout/niche-finder")
-async def smartscout_niche_finder(request: ScrapeRequest, background_tasks: BackgroundTasks):
+def request_output_options(http_request: Request) -> OutputOptions:
+    """Format, projection, filters and encoding requested by the client"""
+    query = {
+        "format": http_request.query_params.get("format"),
+        "columns": http_request.query_params.get("columns"),
+        "where": http_request.query_params.getlist("where")
+    }
     try:
-        result = await asyncio.get_event_loop().run_in_executor(
-            SCRAPER_EXECUTOR,
-            run_niche_finder_export,
-            request.search_text,
-            request.username,
-            request.password
-        )
-        
-        file_path = result["file_path"]
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=500, detail="File was not created")
-        
-        background_tasks.add_task(cleanup_file, file_path)
-        
-        return FileResponse(
-            path=file_path,
-            filename=result["file_name"],
-            media_type="text/csv"
+        return output_options(query, http_request.headers)
+    except FormatError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+class LeasedFileResponse(FileResponse):
+    """FileResponse that calls `release` once the file has been sent, or the client went away"""
+
+    def __init__(self, *args, release=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.release is not None:
+                self.release()
+
+NEGOTIATED_VARY = "Accept, Accept-Encoding"
+
+def export_response(file_path: str, file_name: str, options: OutputOptions, headers: dict = None, release=None):
+    """
+    Send the export as-is when possible, otherwise stream it re-encoded.
+    `release` is called once the file is no longer read from its path.
+    """
+    # Which representation is sent depends on Accept and Accept-Encoding, passthrough included
+    headers = dict(headers or {}, Vary=NEGOTIATED_VARY)
+    if options.is_passthrough:
+        return LeasedFileResponse(path=file_path, filename=file_name, media_type="text/csv", headers=headers,
+                                  release=release)
+    
+    try:
+        # Opens the file right away; the stream reads from that handle
+        body = render(file_path, options)
+    except FormatError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    finally:
+        if release is not None:
+            release()
+    name = f"{os.path.splitext(file_name)[0]}.{options.format}"
+    headers["Content-Disposition"] = f'attachment; filename="{name}"'
+    if options.encoding != "identity":
+        headers["Content-Encoding"] = options.encoding
+    return StreamingResponse(body, media_type=options.media_type, headers=headers)
+
+def detail_headers(details: dict) -> dict:
+    """How complete an export is, as headers: its resume cursor, whether it was cut short, keyword outcomes"""
+    headers = {}
+    if details.get("cursor") is not None:
+        headers["X-Grid-Cursor"] = details["cursor"]
+    if "truncated" in details:
+        headers["X-Truncated"] = "true" if details["truncated"] else "false"
+    # JSON escapes non-ASCII keywords, which header values cannot carry
+    if "keywords" in details:
+        headers["X-Keywords"] = json.dumps(details["keywords"])
+    if "failed_keywords" in details:
+        headers["X-Failed-Keywords"] = json.dumps(details["failed_keywords"])
+    return headers
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match list names `etag`: `*`, or an entity tag equal to it ignoring W/ (weak comparison)"""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+def cached_file_response(entry: dict, http_request: Request, hit: bool, options: OutputOptions):
+    """Serve a cached result with validators, answering 304 when the client already has it"""
+    etag = entry["etag"]
+    if not options.is_passthrough:
+        # Each format/projection/encoding of the same result is its own representation
+        etag += "-" + hashlib.sha256(options.variant().encode("utf-8")).hexdigest()[:12]
+    etag = f'"{etag}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={max(0, int(entry['expires_at'] - time.time()))}",
+        "X-Cache": "HIT" if hit else "MISS",
+        # A 304 names the same request headers as the response it stands for
+        "Vary": NEGOTIATED_VARY,
+        # Entries cached by an earlier version have no details
+        **detail_headers(entry.get("details", {})),
+    }
+    if etag_matches(http_request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    
+    # Evicting the entry while it is being sent must not delete the file under the response
+    if not RESULT_CACHE.lease(entry):
+        raise HTTPException(status_code=503, detail="Cached result was evicted; retry the request",
+                            headers={"Retry-After": "1"})
+    return export_response(entry["file_path"], entry["file_name"], options, headers,
+                           release=partial(RESULT_CACHE.release, entry))
+
+def scrape_executor(username: str):
+    """Where a synchronous scrape runs: behind its account's limits (shed when full), or on a queue waiter thread"""
+    return ACCOUNT_SCHEDULER.executor_for(username, shed=True) if LOCAL_SCRAPING else SCRAPER_EXECUTOR
+
+def request_credentials(request: BaseModel) -> dict:
+    """The SmartScout login of a request, for scrapers that need an account"""
+    return {name: getattr(request, name) for name in ("username", "password") if hasattr(request, name)}
+
+def scrape_compute(endpoint: str, request: BaseModel):
+    """The scrape behind a synchronous request, `fn(on_step)`: run here, or as a top-priority job on a worker"""
+    params = request.model_dump(exclude={"username", "password"})
+    credentials = request_credentials(request)
+    if LOCAL_SCRAPING:
+        return partial(JOB_HANDLERS[endpoint], params, credentials)
+    return partial(run_via_queue, JOB_STORE, endpoint, params, credentials, priority=SYNC_JOB_PRIORITY)
+
+def request_deadline(http_request: Request) -> float:
+    """Seconds the client will wait for its scrape: X-Request-Timeout, capped by SCRAPE_DEADLINE"""
+    value = http_request.headers.get("x-request-timeout")
+    if value is None:
+        return SCRAPE_DEADLINE
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = 0
+    if seconds <= 0:
+        raise HTTPException(status_code=400, detail="X-Request-Timeout must be a positive number of seconds")
+    return min(seconds, SCRAPE_DEADLINE)
+
+async def wait_for_scrape(key: str, future, http_request: Request, timeout: float):
+    """
+    Await a shared scrape while the client is connected, up to its deadline.
+    Returns None if the client went away. A caller that stops waiting
+    abandons the scrape, which is cancelled once nobody else waits for it.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    # The shared future is already running, so cancelling this waiter never cancels the scrape itself
+    waiter = asyncio.wrap_future(future)
+    finished = False
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise HTTPException(status_code=504, detail=f"Scrape did not finish within {timeout:g}s")
+            done, _ = await asyncio.wait({waiter}, timeout=min(DISCONNECT_POLL_INTERVAL, remaining))
+            if done:
+                finished = True
+                return waiter.result()
+            if await http_request.is_disconnected():
+                print(f"🔌 Client went away while waiting for {key[:12]}")
+                return None
+    finally:
+        if not finished:
+            waiter.cancel()
+            RESULT_CACHE.abandon(key, future)
+
+def requested_since(http_request: Request):
+    """The `since=` of a delta request (None for a full export), validated up front"""
+    since = http_request.query_params.get("since")
+    if since is None:
+        return None
+    if SNAPSHOTS is None:
+        raise HTTPException(status_code=404, detail="Snapshot history is disabled")
+    if since != "previous":
+        try:
+            parse_since(since)
+        except SnapshotError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return since
+
+async def delta_response(snapshot: dict, since: str, options: OutputOptions, file_name: str, details: dict = None):
+    """
+    Rows added, removed or changed since the baseline snapshot, in the
+    requested format. `details` of a cut-short export are passed on, since its
+    missing rows show up as removed.
+    """
+    def compute():
+        baseline = SNAPSHOTS.baseline(snapshot, since)
+        return (baseline,) + SNAPSHOTS.delta(snapshot, baseline)
+    try:
+        baseline, columns, rows = await asyncio.to_thread(compute)
+        body = render_rows(columns, rows, options)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FormatError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    name = f"{os.path.splitext(file_name)[0]}_delta.{options.format}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}"',
+        "X-Snapshot-Id": str(snapshot["id"]),
+        "X-Snapshot-Time": str(snapshot["created_at"]),
+        "X-Baseline-Snapshot-Id": str(baseline["id"]) if baseline else "none",
+        "X-Delta-Rows": str(len(rows)),
+        "Vary": NEGOTIATED_VARY,
+        **detail_headers(details or {}),
+    }
+    if options.encoding != "identity":
+        headers["Content-Encoding"] = options.encoding
+    return StreamingResponse(body, media_type=options.media_type, headers=headers)
+
+def scrape_cache_key(endpoint: str, params: dict, request: BaseModel) -> str:
+    """Result cache address of a request; browser and API exports differ, so the mode is always part of it"""
+    if "mode" in type(request).model_fields:
+        params = {**params, "mode": request.mode}
+    credentials = request_credentials(request)
+    return cache_key(endpoint, params, credentials_digest(credentials.get("username", ""), credentials.get("password", "")))
+
+async def cached_scrape(endpoint: str, params: dict, request: BaseModel, http_request: Request):
+    """Run the scrape through the result cache; identical concurrent requests share one scrape"""
+    # Validate the requested output before spending minutes on a scrape
+    options = request_output_options(http_request)
+    since = requested_since(http_request)
+    timeout = request_deadline(http_request)
+    credentials = request_credentials(request)
+    key = scrape_cache_key(endpoint, params, request)
+    try:
+        future, hit = RESULT_CACHE.submit(
+            key, endpoint, scrape_compute(endpoint, request), scrape_executor(credentials.get("username", ""))
         )
+        entry = await wait_for_scrape(key, future, http_request, timeout)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
     except Exception as e:
+        if caused_by(e, CircuitOpen):
+            while not isinstance(e, CircuitOpen):
+                e = e.__cause__ or e.__context__
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
         raise HTTPException(status_code=500, detail=str(e))
+    if entry is None:
+        return Response(status_code=499)
+    if since is not None:
+        snapshot = await asyncio.to_thread(SNAPSHOTS.latest, endpoint, params)
+        if snapshot is None:
+            # Cached before snapshots were kept
+            snapshot = await asyncio.to_thread(SNAPSHOTS.ingest, endpoint, params, entry["file_path"])
+        return await delta_response(snapshot, since, options, entry["file_name"], entry.get("details"))
+    return cached_file_response(entry, http_request, hit, options)
+
+# --- Batch endpoints ---
+
+def iterate_in_executor(make_iter, executor=SCRAPER_EXECUTOR):
+    """
+    Drive a blocking iterator on `executor` and return an async iterator of
+    its items as they arrive. `make_iter(on_step)` receives a step callback that
+    stops the work once the consumer has gone away. The work is submitted right
+    away, so a full executor raises QueueFull here rather than mid-stream.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    consumer_gone = threading.Event()
+    
+    def on_step(step: str):
+        if consumer_gone.is_set():
+            raise ScrapeAborted("Client disconnected")
+    
+    def produce():
+        try:
+            for item in make_iter(on_step):
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+    
+    executor.submit(produce)
+    
+    async def items():
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            consumer_gone.set()
+    return items()
+
+async def tail_job_lines(job_id: str, output_path: str):
+    """
+    Yield NDJSON lines a worker appends to `output_path` until its job ends;
+    cancel it if we stop early. The file is deleted either way; one a cancelled
+    worker still writes is removed when the job expires.
+    """
+    offset = 0
+    buffer = b""
+    finished = False
+    try:
+        while True:
+            job = JOB_STORE.get(job_id)
+            done = job is None or job["state"] in TERMINAL_STATES
+            if os.path.exists(output_path):
+                with open(output_path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read()
+                offset += len(data)
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line.decode("utf-8") + "\n"
+            if done:
+                finished = True
+                if job is None or job["state"] != SUCCEEDED:
+                    error = job["error"] if job else "Job disappeared"
+                    yield json.dumps({"error": error or f"Job {job['state']}"}) + "\n"
+                return
+            await asyncio.sleep(0.5)
+    finally:
+        if not finished:
+            JOB_STORE.cancel(job_id)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+@app.post("/smartscout/rank-maker/batch")
+async def smartscout_rank_maker_batch(request: BatchRankMakerRequest):
+    """Stream one NDJSON line per ASIN as soon as its export finishes"""
+    params = {"asins": request.asins, "max_rank": request.max_rank}
+    credentials = {"username": request.username, "password": request.password}
+    
+    if not LOCAL_SCRAPING:
+        # The worker appends records to a file that is streamed back as it grows
+        os.makedirs(BATCH_OUTPUT_DIR, exist_ok=True)
+        params["output_path"] = os.path.join(BATCH_OUTPUT_DIR, f"batch_{uuid.uuid4().hex}.ndjson")
+        try:
+            job_id = JOB_STORE.enqueue("smartscout/rank-maker/batch", params, credentials, priority=SYNC_JOB_PRIORITY)
+        except QueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        return StreamingResponse(tail_job_lines(job_id, params["output_path"]), media_type="application/x-ndjson")
+    
+    # Submitted before the response starts, so a full queue is a 429 rather than an error line in a 200
+    try:
+        records = iterate_in_executor(
+            partial(rank_maker_batch_records, params, credentials, DRIVER_POOL, snapshots=SNAPSHOTS),
+            scrape_executor(request.username)
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    async def lines():
+        try:
+            async for record in records:
+                yield json.dumps(record) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# --- Background jobs ---
 
-@app.post("/smartscout/rank-maker")
-async def smartscout_rank_maker(request: ScrapeRequest, background_tasks: BackgroundTasks):
+def enqueue_job(endpoint: str, request: BaseModel):
+    params = request.model_dump(exclude={"username", "password", "priority"})
+    credentials = request_credentials(request)
     try:
-        result = await asyncio.get_event_loop().run_in_executor(
-            SCRAPER_EXECUTOR,
-            run_keyword_tools_export,
+        job_id = JOB_STORE.enqueue(endpoint, params, credentials, priority=request.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if JOB_RUNNER:
+        JOB_RUNNER.notify()
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job_id,
+            "state": "queued",
+            "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result"
+        }
+    )
+
+def add_scraper_routes(spec):
+    """POST /<name> (cached scrape) and POST /<name>/jobs (background job) for a registered scraper"""
+    request_model, job_model = spec.request_model, spec.job_model
+
+    async def scrape(request: request_model, http_request: Request):
+        return await cached_scrape(spec.name, spec.cache_params(request.model_dump()), request, http_request)
+
+    async def enqueue(request: job_model):
+        return enqueue_job(spec.name, request)
+
+    tag = spec.name.split("/")[0]
+    app.add_api_route(f"/{spec.name}", scrape, methods=["POST"], summary=spec.summary or None, tags=[tag],
+                      name=spec.name.replace("/", "_").replace("-", "_"))
+    app.add_api_route(f"/{spec.name}/jobs", enqueue, methods=["POST"], status_code=202, tags=[tag],
+                      summary=f"Queue: {spec.summary}" if spec.summary else None,
+                      name=spec.name.replace("/", "_").replace("-", "_") + "_job")
+
+for _spec in SCRAPERS.values():
+    add_scraper_routes(_spec)
+
+def get_job_or_404(job_id: str) -> dict:
+    job = JOB_STORE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return job_status(get_job_or_404(job_id))
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, http_request: Request):
+    options = request_output_options(http_request)
+    since = requested_since(http_request)
+    job = get_job_or_404(job_id)
+    if job["state"] == EXPIRED:
+        raise HTTPException(status_code=410, detail="Job result has expired")
+    if job["state"] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['state']}")
+    
+    # Results stay on disk until they expire, so they can be fetched again
+    result = job["result"]
+    if since is not None:
+        snapshot = await asyncio.to_thread(SNAPSHOTS.get, result.get("snapshot_id"))
+        if snapshot is None:
+            raise HTTPException(status_code=409, detail="Job result has no snapshot to diff")
+        return await delta_response(snapshot, since, options, result["file_name"], result_details(result))
+    if not os.path.exists(result["file_path"]):
+        raise HTTPException(status_code=410, detail="Job result is no longer available")
+    return export_response(result["file_path"], result["file_name"], options, detail_headers(result_details(result)))
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    get_job_or_404(job_id)
+    return job_status(JOB_STORE.cancel(job_id))
+
+# --- Watchlist ---
+
+def prefetch_watch_entry(entry: dict) -> dict:
+    """Scrape a watched search into the result cache, where daytime requests for it find it"""
+    endpoint = entry["endpoint"]
+    spec = SCRAPERS[endpoint]
+    # Parameters the scraper does not declare (max_rank for Niche Finder) are ignored
+    request = spec.request_model(
+        search_text=entry["search_text"],
+        max_rank=entry["max_rank"],
+        mode=entry["mode"],
+        **entry["credentials"]
+    )
+    key = scrape_cache_key(endpoint, spec.cache_params(request.model_dump()), request)
+    future, _ = RESULT_CACHE.submit(
+        key, endpoint, scrape_compute(endpoint, request), scrape_executor(request.username),
+        refresh=True, ttl=entry["result_ttl"]
+    )
+    return future.result()
+
+WATCHLIST = WatchlistStore(endpoints=WATCHABLE_ENDPOINTS) if SCHEDULER_ENABLED else None
+SCHEDULER = Scheduler(WATCHLIST, prefetch_watch_entry) if SCHEDULER_ENABLED else None
+
+def watchlist_store() -> WatchlistStore:
+    if WATCHLIST is None:
+        raise HTTPException(status_code=404, detail="The scheduler is disabled")
+    return WATCHLIST
+
+def get_watch_or_404(entry_id: str) -> dict:
+    entry = watchlist_store().get(entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Watchlist entry not found")
+    return entry
+
+@app.post("/watchlist", status_code=201)
+async def create_watch(request: WatchRequest):
+    """Watch a search: it is prefetched on its schedule, inside the off-peak windows"""
+    try:
+        return watchlist_store().add(
+            request.endpoint,
             request.search_text,
-            request.username,
-            request.password,
-            None,
-            True,
-            request.max_rank
+            {"username": request.username, "password": request.password},
+            max_rank=request.max_rank,
+            mode=request.mode,
+            schedule=request.schedule,
+            result_ttl=request.result_ttl,
+            enabled=request.enabled
         )
-        
-        file_path = result["file_path"]
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=500, detail="File was not created")
-        
-        background_tasks.add_task(cleanup_file, file_path)
-        
-        return FileResponse(
-            path=file_path,
-            filename=result["file_name"],
-            media_type="text/csv"
+    except ScheduleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/watchlist")
+async def list_watches(endpoint: str = None):
+    return {
+        "windows": SCHEDULER and [f"{s // 60:02d}:{s % 60:02d}-{e // 60:02d}:{e % 60:02d}" for s, e in SCHEDULER.windows],
+        "in_window": SCHEDULER.in_window() if SCHEDULER else False,
+        "running": SCHEDULER.running() if SCHEDULER else [],
+        "entries": watchlist_store().list(endpoint)
+    }
+
+@app.get("/watchlist/{entry_id}")
+async def get_watch(entry_id: str):
+    return get_watch_or_404(entry_id)
+
+@app.patch("/watchlist/{entry_id}")
+async def update_watch(entry_id: str, request: WatchUpdate):
+    entry = get_watch_or_404(entry_id)
+    changes = request.model_dump(exclude={"username", "password"}, exclude_none=True)
+    if request.username or request.password:
+        try:
+            current = watchlist_store().get(entry_id, include_credentials=True)["credentials"]
+        except CredentialsError as e:
+            # Both given: nothing of the unreadable login is needed
+            if not (request.username and request.password):
+                raise HTTPException(status_code=409, detail=f"{e} Send both username and password.")
+            current = {}
+        changes["credentials"] = {
+            "username": request.username or current["username"],
+            "password": request.password or current["password"]
+        }
+    try:
+        return watchlist_store().update(entry["id"], **changes)
+    except ScheduleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/watchlist/{entry_id}", status_code=204)
+async def delete_watch(entry_id: str):
+    if not watchlist_store().delete(entry_id):
+        raise HTTPException(status_code=404, detail="Watchlist entry not found")
+
+@app.post("/watchlist/{entry_id}/run", status_code=202)
+async def run_watch(entry_id: str):
+    """Prefetch an entry now, regardless of the off-peak windows"""
+    get_watch_or_404(entry_id)
+    try:
+        started = SCHEDULER.run_now(entry_id)
+    except CredentialsError as e:
+        raise HTTPException(status_code=409, detail=f"{e} Set the entry's username and password again with PATCH.")
+    if not started:
+        raise HTTPException(status_code=409, detail="Prefetch already running")
+    return get_watch_or_404(entry_id)
+
+# --- History ---
+
+def snapshot_store():
+    if SNAPSHOTS is None:
+        raise HTTPException(status_code=404, detail="Snapshot history is disabled")
+    return SNAPSHOTS
+
+def time_param(value: str = None):
+    try:
+        return parse_since(value) if value else None
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/history/snapshots")
+async def list_snapshots(endpoint: str = None, subject: str = None, since: str = None, until: str = None,
+                         limit: int = Query(100, ge=1, le=1000)):
+    """Snapshots taken, newest first; `subject` is the ASIN or niche search text"""
+    snapshots = await asyncio.to_thread(
+        snapshot_store().snapshots, endpoint, subject, time_param(since), time_param(until), limit
+    )
+    return {"snapshots": snapshots}
+
+@app.get("/history/rows")
+async def history_rows(asin: str = None, keyword: str = None, niche: str = None, endpoint: str = None,
+                       since: str = None, until: str = None, limit: int = Query(1000, ge=1, le=10000)):
+    """How rows for an ASIN, keyword or niche looked in each snapshot, newest first"""
+    try:
+        rows = await asyncio.to_thread(
+            snapshot_store().history, asin, keyword, niche, endpoint, time_param(since), time_param(until), limit
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"rows": rows}
+
+@app.get("/history/snapshots/{snapshot_id}/delta")
+async def snapshot_delta(snapshot_id: int, http_request: Request):
+    """What changed between a stored snapshot and its predecessor (or the one at `since=`)"""
+    options = request_output_options(http_request)
+    since = requested_since(http_request) or "previous"
+    snapshot = await asyncio.to_thread(snapshot_store().get, snapshot_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    subject = (snapshot["subject"] or str(snapshot_id)).replace(" ", "_")
+    name = f"{snapshot['endpoint'].split('/')[-1]}_{subject}.csv"
+    return await delta_response(snapshot, since, options, name)
+
+@app.get("/scrapers")
+async def list_scrapers():
+    """Registered scrapers, their parameters and whether their module has been imported yet"""
+    return {"scrapers": [spec.describe() for spec in SCRAPERS.values()]}
 
-# Placeholder endpoints for future scrapers
-@app.post("/smartscout/seller-search")
-async def smartscout_seller_search():
-    return {"message": "Endpoint not yet implemented"}
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of this process (workers serve their own on --metrics-port)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-@app.post("/smartscout/product-search")
-async def smartscout_product_search():
-    return {"message": "Endpoint not yet implemented"}
+@app.get("/accounts")
+async def list_accounts():
+    """Per-account limits, queues and congestion counters of this process (accounts are hashed)"""
+    if ACCOUNT_SCHEDULER is None:
+        return {"dispatch": SCRAPER_DISPATCH, "capacity": 0, "running": 0, "accounts": []}
+    return dict(ACCOUNT_SCHEDULER.stats(), dispatch=SCRAPER_DISPATCH)
 
-@app.post("/website2/scrape")
-async def website2_scrape():
-    return {"message": "Endpoint not yet implemented"}
+@app.get("/circuits")
+async def list_circuits():
+    """Steps of this process that failed recent scrapes, and whether their circuit breaker is open"""
+    return {"dispatch": SCRAPER_DISPATCH, "circuits": CIRCUITS.status()}
 
-@app.post("/website3/scrape")
-async def website3_scrape():
-    return {"message": "Endpoint not yet implemented"}
+@app.get("/workers")
+async def list_workers():
+    """Registered scrape workers with their heartbeat, capacity and current jobs"""
+    return {"dispatch": SCRAPER_DISPATCH, "workers": JOB_STORE.workers()}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    workers = [w for w in JOB_STORE.workers() if w["alive"]]
+    return {
+        "status": "healthy" if workers else "degraded",
+        "dispatch": SCRAPER_DISPATCH,
+        "browsers": DRIVER_POOL.stats() if DRIVER_POOL else {},
+        "browser_processes": SUPERVISOR.stats() if LOCAL_SCRAPING else {},
+        "workers": {
+            "alive": len(workers),
+            "capacity": sum(w["capacity"] for w in workers),
+            "busy": sum(len(w["current_jobs"]) for w in workers)
+        },
+        "queued_jobs": JOB_STORE.queue_depth(),
+        "result_cache": RESULT_CACHE.stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
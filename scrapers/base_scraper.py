@@ -1,81 +1,656 @@
 import os
+import re
+import json
 import time
-import glob
 import shutil
+import select
+import threading
+import subprocess
+import ctypes
+import ctypes.util
+import fnmatch
+import random
+import tempfile
+import uuid
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (
+    TimeoutException,
+    StaleElementReferenceException,
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+    WebDriverException,
+)
 from webdriver_manager.chrome import ChromeDriverManager
+from .browser_profiles import get_profile, apply_options, apply_blocking
+from .browser_supervisor import SUPERVISOR
+from .telemetry import span
+from .circuit_breaker import CIRCUITS
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOB_DOWNLOADS_ROOT = os.path.join(PROJECT_ROOT, "downloads", ".jobs")
+
+PARTIAL_SUFFIXES = (".crdownload", ".tmp", ".part")
+# Search texts come from requests; in file names only these characters survive
+UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+MAX_NAME_PART = 80
+
+# ChromeDriver resolution: a pinned binary, a pinned version, or the cached result
+# of the last webdriver-manager lookup; offline mode never touches the network.
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH")
+CHROMEDRIVER_VERSION = os.getenv("CHROMEDRIVER_VERSION")
+CHROMEDRIVER_OFFLINE = os.getenv("CHROMEDRIVER_OFFLINE", "0").lower() in ("1", "true", "yes")
+CHROMEDRIVER_CACHE_TTL = int(os.getenv("CHROMEDRIVER_CACHE_TTL", str(7 * 24 * 60 * 60)))
+CHROMEDRIVER_CACHE_FILE = os.path.join(PROJECT_ROOT, "data", "chromedriver.json")
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+# Step retries back off exponentially (with jitter) up to a cap; a step that
+# still fails makes the flow resume from its last good checkpoint a few times
+STEP_RETRY_BACKOFF = float(os.getenv("STEP_RETRY_BACKOFF", "0.5"))
+STEP_RETRY_MAX_DELAY = float(os.getenv("STEP_RETRY_MAX_DELAY", "5"))
+FLOW_RESUME_ATTEMPTS = int(os.getenv("FLOW_RESUME_ATTEMPTS", "2"))
+
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+
+def chrome_version():
+    """Installed Chrome's version, or None if it cannot be found"""
+    for name in CHROME_BINARIES:
+        binary = shutil.which(name)
+        if not binary:
+            continue
+        try:
+            output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r"\d+(\.\d+)+", output)
+        if match:
+            return match.group(0)
+    return None
+
+
+def _load_chromedriver_cache():
+    try:
+        with open(CHROMEDRIVER_CACHE_FILE) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if os.path.exists(entry.get("path", "")) else None
+
+
+def _save_chromedriver_cache(path, browser_version):
+    os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE_FILE), exist_ok=True)
+    tmp_path = f"{CHROMEDRIVER_CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "path": path,
+            "browser_version": browser_version,
+            "driver_version": CHROMEDRIVER_VERSION,
+            "resolved_at": time.time(),
+        }, f)
+    os.replace(tmp_path, CHROMEDRIVER_CACHE_FILE)
+
+
+def resolve_chromedriver():
+    """
+    Path of the chromedriver binary, resolved once per process. Call it at
+    startup so no request pays for the version lookup.
+    """
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path:
+            return _chromedriver_path
+        started = time.time()
+
+        if CHROMEDRIVER_PATH:
+            if not os.path.exists(CHROMEDRIVER_PATH):
+                raise RuntimeError(f"CHROMEDRIVER_PATH does not exist: {CHROMEDRIVER_PATH}")
+            path, source = CHROMEDRIVER_PATH, "pinned path"
+        else:
+            cached = _load_chromedriver_cache()
+            if CHROMEDRIVER_OFFLINE:
+                # Offline: the cached binary, else one on PATH, else give up
+                path = cached["path"] if cached else shutil.which("chromedriver")
+                if not path:
+                    raise RuntimeError(
+                        "CHROMEDRIVER_OFFLINE is set but no chromedriver is cached or on PATH; "
+                        "set CHROMEDRIVER_PATH or resolve once while online"
+                    )
+                source = "offline cache" if cached else "PATH"
+            else:
+                browser_version = chrome_version()
+                if (
+                    cached
+                    and cached.get("browser_version") == browser_version
+                    and cached.get("driver_version") == CHROMEDRIVER_VERSION
+                    and time.time() - cached.get("resolved_at", 0) < CHROMEDRIVER_CACHE_TTL
+                ):
+                    path, source = cached["path"], "cache"
+                else:
+                    path = ChromeDriverManager(driver_version=CHROMEDRIVER_VERSION).install()
+                    _save_chromedriver_cache(path, browser_version)
+                    source = "webdriver-manager"
+
+        _chromedriver_path = path
+        print(f"🧭 Using chromedriver {path} ({source}, {time.time() - started:.2f}s)")
+        return path
+
 
 class BaseScraper:
     def __init__(self, download_dir=None):
+        self.project_root = PROJECT_ROOT
         if download_dir is None:
-            self.project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
             self.download_dir = os.path.join(self.project_root, "downloads")
         else:
             self.download_dir = download_dir
         
         os.makedirs(self.download_dir, exist_ok=True)
-        self.system_downloads = os.path.join(os.path.expanduser("~"), "Downloads")
 
-    def get_driver(self, headless=False):
+    def get_driver(self, headless=False, download_dir=None, profile=None):
+        profile = get_profile(profile)
         options = Options()
-        if headless:
-            options.add_argument("--headless")
+        if headless and not profile.headless:
+            options.add_argument("--headless=new")
+        apply_options(options, profile)
         
-        options.add_argument("--start-maximized")
         options.add_argument("--disable-blink-features=AutomationControlled")
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
+        if download_dir:
+            options.add_experimental_option("prefs", download_prefs(download_dir))
         
         driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()), 
+            service=Service(resolve_chromedriver(), env=SUPERVISOR.service_env()),
             options=options
         )
+        SUPERVISOR.track(driver)
+        apply_blocking(driver, profile)
         return driver
 
-    def get_latest_download(self, pattern: str = "*.csv", timeout: int = 20, search_dir: str = None):
-        """Get the most recently downloaded file with timeout"""
-        target_dir = search_dir or self.system_downloads
-        print(f"  Checking for files in: {target_dir}")
-        
-        files_before = set(glob.glob(os.path.join(target_dir, pattern)))
-        files_before = {f for f in files_before if not f.endswith('.crdownload')}
-        
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            files_now = set(glob.glob(os.path.join(target_dir, pattern)))
-            files_now = {f for f in files_now if not f.endswith('.crdownload')}
-            
-            new_files = files_now - files_before
-            if new_files:
-                latest_file = max(new_files, key=os.path.getctime)
-                
-                # Wait for file to finish downloading
-                size1 = -1
-                while True:
-                    size2 = os.path.getsize(latest_file)
-                    if size1 == size2 and size1 > 0:
-                        return latest_file
-                    size1 = size2
-                    time.sleep(1)
-            
-            time.sleep(1)
-        return None
+    def create_job_download_dir(self):
+        """Fresh, private directory for one job's browser downloads"""
+        return create_job_download_dir()
+
+    def wait_for_download(self, job_dir: str, pattern: str = "*.csv", timeout: int = 20):
+        """Block until a completed download matching `pattern` lands in `job_dir`"""
+        with span("Wait for download") as current:
+            path = wait_for_download(job_dir, pattern=pattern, timeout=timeout)
+            current.set(found=bool(path))
+            return path
+
+    def output_path(self, prefix, search_text, extension):
+        """
+        Path and file name of an export in the output directory; every part is
+        sanitized, and a random suffix keeps concurrent exports of the same
+        search (in the same second) from overwriting each other
+        """
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        extension = "." + safe_name_part(extension.lstrip("."), "csv")
+        unique = uuid.uuid4().hex[:8]
+        new_filename = f"{safe_name_part(prefix)}_{safe_name_part(search_text)}_{timestamp}_{unique}{extension}"
+        return os.path.join(self.download_dir, new_filename), new_filename
 
     def move_to_output(self, source_file, prefix, search_text, cleanup=True):
         """Move downloaded file to project output directory with renamed filename"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        safe_search = search_text.replace(' ', '_')
-        new_filename = f"{prefix}_{safe_search}_{timestamp}{os.path.splitext(source_file)[1]}"
-        dest_path = os.path.join(self.download_dir, new_filename)
+        dest_path, new_filename = self.output_path(prefix, search_text, os.path.splitext(source_file)[1])
         
-        shutil.copy2(source_file, dest_path)
-        if cleanup:
-            try:
-                os.remove(source_file)
-            except Exception as e:
-                print(f"  ⚠️ Could not remove source file: {e}")
+        with span("Move to output", copy=not cleanup) as current:
+            if cleanup:
+                # Job directories live next to the output folder, so this is a rename
+                shutil.move(source_file, dest_path)
+            else:
+                shutil.copy2(source_file, dest_path)
+            current.set(bytes=os.path.getsize(dest_path))
         
         return dest_path, new_filename
+
+    def save_download(self, download, prefix, search_text, cleanup=True):
+        """Write a CapturedDownload to the output directory with a renamed filename"""
+        dest_path, new_filename = self.output_path(prefix, search_text, download.extension)
+        
+        with span("Move to output", captured=download.buffer is not None) as current:
+            download.save(dest_path, cleanup=cleanup)
+            current.set(bytes=download.size)
+        
+        return dest_path, new_filename
+
+
+def safe_name_part(text, default: str = "all") -> str:
+    """`text` as one file name component: no separators, no leading dots, bounded length"""
+    part = UNSAFE_NAME_CHARS.sub("_", str(text or "")).strip("._")
+    return part[:MAX_NAME_PART] or default
+
+
+# --- Per-job downloads ---
+#
+# Every job downloads into its own directory, so concurrent jobs can never
+# pick up each other's files. Completion is signalled by inotify (Chrome
+# renames the .crdownload to its final name when done) rather than polling.
+
+def download_prefs(download_dir: str) -> dict:
+    """Chrome prefs that send downloads to `download_dir` without prompting"""
+    return {
+        "download.default_directory": download_dir,
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "safebrowsing.enabled": True,
+    }
+
+
+def create_job_download_dir() -> str:
+    os.makedirs(JOB_DOWNLOADS_ROOT, exist_ok=True)
+    return tempfile.mkdtemp(prefix="job_", dir=JOB_DOWNLOADS_ROOT)
+
+
+def remove_job_download_dir(job_dir: str):
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def set_download_dir(driver, download_dir: str):
+    """Point an already running browser's downloads at `download_dir`"""
+    params = {"behavior": "allow", "downloadPath": download_dir, "eventsEnabled": True}
+    if getattr(driver, "shares_browser", False):
+        # A tab sets its own page's behaviour; the browser-wide one would redirect its neighbours' downloads
+        params.pop("eventsEnabled")
+        driver.execute_cdp_cmd("Page.setDownloadBehavior", params)
+        return
+    try:
+        driver.execute_cdp_cmd("Browser.setDownloadBehavior", params)
+    except Exception:
+        params.pop("eventsEnabled")
+        driver.execute_cdp_cmd("Page.setDownloadBehavior", params)
+
+
+def _completed_downloads(directory: str, pattern: str) -> list:
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    files = []
+    for name in names:
+        if name.endswith(PARTIAL_SUFFIXES) or not fnmatch.fnmatch(name, pattern):
+            continue
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            files.append(path)
+    return files
+
+
+class _Inotify:
+    """Minimal inotify wrapper (Linux); wakes up when files are written or renamed in"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    _libc = None
+
+    def __init__(self, directory: str):
+        if _Inotify._libc is None:
+            _Inotify._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+        if self._libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self.fd], [], [], max(0, timeout))
+        if readable:
+            try:
+                os.read(self.fd, 64 * 1024)  # drain; the directory is rescanned anyway
+            except BlockingIOError:
+                pass
+        return bool(readable)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def wait_for_download(job_dir: str, pattern: str = "*.csv", timeout: int = 20):
+    """Return the first completed download in `job_dir`, or None after `timeout` seconds"""
+    print(f"  Waiting for download in: {job_dir}")
+    deadline = time.time() + timeout
+
+    try:
+        watcher = _Inotify(job_dir)
+    except (OSError, AttributeError):
+        watcher = None  # not Linux - fall back to a tight poll
+
+    try:
+        while True:
+            # Scan after the watch is armed so a file finished in between is not missed
+            files = _completed_downloads(job_dir, pattern)
+            if files:
+                return max(files, key=os.path.getmtime)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            if watcher:
+                watcher.wait(remaining)
+            else:
+                time.sleep(min(0.2, remaining))
+    finally:
+        if watcher:
+            watcher.close()
+
+
+# --- Step engine ---
+#
+# A scraper flow is a list of Steps. Each step waits for its element, performs
+# an action on it, then waits for a readiness condition before the next step
+# starts - so pacing follows the page instead of fixed sleeps.
+
+RETRYABLE_ERRORS = (
+    TimeoutException,
+    StaleElementReferenceException,
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+)
+
+
+class StepError(Exception):
+    """Raised when a step still fails after all of its retries"""
+
+    def __init__(self, step, error):
+        super().__init__(f"Step '{step.name}' failed: {error}")
+        self.step = step
+        self.error = error
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds to wait before retry number `attempt` (0-based)"""
+    delay = min(STEP_RETRY_MAX_DELAY, STEP_RETRY_BACKOFF * 2 ** attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def clickable(locator):
+    """Element at `locator` is visible and enabled"""
+    return EC.element_to_be_clickable(locator)
+
+
+def visible(locator):
+    """Element at `locator` is displayed"""
+    return EC.visibility_of_element_located(locator)
+
+
+def present(locator):
+    """Element at `locator` is in the DOM"""
+    return EC.presence_of_element_located(locator)
+
+
+class input_value:
+    """Input at `locator` holds `value`"""
+
+    def __init__(self, locator, value):
+        self.locator = locator
+        self.value = str(value)
+
+    def __call__(self, driver):
+        return driver.find_element(*self.locator).get_attribute("value") == self.value
+
+
+class grid_ready:
+    """No ag-grid loading overlay is showing"""
+
+    SCRIPT = """
+        return Array.from(document.querySelectorAll(
+            '.ag-overlay-loading-wrapper, .ag-overlay-loading-center'
+        )).every(el => el.offsetParent === null);
+    """
+
+    def __call__(self, driver):
+        return driver.execute_script(self.SCRIPT)
+
+
+class network_idle:
+    """Document loaded and no fetch/XHR traffic for `quiet` seconds"""
+
+    SCRIPT = """
+        if (!window.__scraperNet) {
+            const net = window.__scraperNet = {pending: 0};
+            const origFetch = window.fetch;
+            if (origFetch) {
+                window.fetch = function() {
+                    net.pending++;
+                    return origFetch.apply(this, arguments).finally(() => net.pending--);
+                };
+            }
+            const origSend = XMLHttpRequest.prototype.send;
+            XMLHttpRequest.prototype.send = function() {
+                net.pending++;
+                this.addEventListener('loadend', () => net.pending--, {once: true});
+                return origSend.apply(this, arguments);
+            };
+        }
+        return [document.readyState, window.__scraperNet.pending,
+                performance.getEntriesByType('resource').length];
+    """
+
+    def __init__(self, quiet: float = 0.5):
+        self.quiet = quiet
+        self.reset()
+
+    def reset(self):
+        self._last = None
+        self._since = None
+
+    def __call__(self, driver):
+        state, pending, resources = driver.execute_script(self.SCRIPT)
+        now = time.time()
+        snapshot = (pending, resources)
+        if state != "complete" or pending > 0 or snapshot != self._last:
+            self._last = snapshot
+            self._since = now
+            return False
+        return now - self._since >= self.quiet
+
+
+class row_count_stable:
+    """Rendered ag-grid row count unchanged for `quiet` seconds and no loading overlay"""
+
+    SCRIPT = """
+        const loading = Array.from(document.querySelectorAll(
+            '.ag-overlay-loading-wrapper, .ag-overlay-loading-center'
+        )).some(el => el.offsetParent !== null);
+        const rows = document.querySelectorAll('.ag-center-cols-container .ag-row').length;
+        return [loading, rows];
+    """
+
+    def __init__(self, quiet: float = 1.0):
+        self.quiet = quiet
+        self.reset()
+
+    def reset(self):
+        self._rows = None
+        self._since = None
+
+    def __call__(self, driver):
+        loading, rows = driver.execute_script(self.SCRIPT)
+        now = time.time()
+        if loading or rows != self._rows:
+            self._rows = rows
+            self._since = now
+            return False
+        return now - self._since >= self.quiet
+
+
+class Step:
+    """
+    One declarative step of a scraper flow.
+
+    locator  -- (By, value) of the element to act on, or None
+    action   -- "get" (navigate to `value`), "click", "js_click", "type",
+                "type_submit", or a callable(driver, element)
+    ready    -- condition (or list of conditions) that must hold afterwards
+    wait_for -- how the element must look before acting: "clickable",
+                "visible" or "present" (derived from the action by default)
+    optional -- log and continue instead of failing when retries run out
+    checkpoint -- the page state after this step can be resumed from; a
+                condition telling whether that state still holds, or True to
+                check that the step's element is still there
+
+    When the action went through but `ready` timed out, a retry only waits
+    for readiness again; navigating and typing are repeated, but clicks and
+    callables are not, as a second click would close a panel the first opened.
+    """
+
+    DEFAULT_WAIT_FOR = {
+        "click": "clickable",
+        "js_click": "present",
+        "type": "visible",
+        "type_submit": "visible",
+    }
+    WAITS = {"clickable": clickable, "visible": visible, "present": present}
+    # Actions with the same effect when done twice
+    REPEATABLE_ACTIONS = ("get", "type")
+
+    def __init__(self, name, locator=None, action=None, value=None, ready=None,
+                 wait_for=None, timeout: float = 25, retries: int = 2, optional: bool = False,
+                 checkpoint=None):
+        self.name = name
+        self.locator = locator
+        self.action = action
+        self.value = value
+        if ready is None:
+            ready = []
+        self.ready = ready if isinstance(ready, (list, tuple)) else [ready]
+        self.wait_for = wait_for or self.DEFAULT_WAIT_FOR.get(action, "present")
+        self.timeout = timeout
+        self.retries = retries
+        self.optional = optional
+        if checkpoint is True:
+            checkpoint = present(locator) if locator is not None else None
+        self.checkpoint = checkpoint
+
+    def run(self, driver):
+        """Locate, act and wait for readiness, retrying transient failures"""
+        performed = False
+        element = None
+        for attempt in range(self.retries + 1):
+            try:
+                if not performed or self.action in self.REPEATABLE_ACTIONS:
+                    element = None
+                    if self.locator is not None:
+                        element = WebDriverWait(driver, self.timeout).until(self.WAITS[self.wait_for](self.locator))
+                    self._perform(driver, element)
+                    performed = True
+                self._wait_ready(driver)
+                return element
+            except RETRYABLE_ERRORS as e:
+                if attempt < self.retries:
+                    delay = backoff_delay(attempt)
+                    print(f"  🔁 Retrying '{self.name}' in {delay:.1f}s ({attempt + 1}/{self.retries}): "
+                          f"{type(e).__name__}")
+                    time.sleep(delay)
+                    continue
+                if self.optional:
+                    print(f"  ⚠️ '{self.name}' not ready within timeout, proceeding anyway...")
+                    return None
+                raise StepError(self, e) from e
+
+    def holds(self, driver) -> bool:
+        """True while the page is still in the state this checkpoint step left it in"""
+        if not self.checkpoint:
+            return False
+        try:
+            return bool(self.checkpoint(driver))
+        except WebDriverException:
+            return False
+
+    def _perform(self, driver, element):
+        action = self.action
+        if action is None:
+            return
+        if callable(action):
+            action(driver, element)
+        elif action == "get":
+            driver.get(self.value)
+        elif action == "click":
+            element.click()
+        elif action == "js_click":
+            driver.execute_script("arguments[0].scrollIntoView(true); arguments[0].click();", element)
+        elif action in ("type", "type_submit"):
+            element.clear()
+            element.send_keys(str(self.value))
+            if action == "type_submit":
+                element.send_keys(Keys.RETURN)
+        else:
+            raise ValueError(f"Unknown step action: {action}")
+
+    def _wait_ready(self, driver):
+        if not self.ready:
+            return
+        for condition in self.ready:
+            if hasattr(condition, "reset"):
+                condition.reset()
+        WebDriverWait(driver, self.timeout, poll_frequency=0.2).until(
+            lambda d: all(condition(d) for condition in self.ready)
+        )
+
+
+def dismiss_overlays(driver):
+    """Close whatever menu or dialog is open (Escape), e.g. a half-opened 'Export as' menu"""
+    try:
+        driver.switch_to.active_element.send_keys(Keys.ESCAPE)
+    except WebDriverException:
+        pass
+
+
+def resume_point(driver, completed) -> int:
+    """Index to continue from: just after the last checkpoint of `completed` whose state still holds"""
+    dismiss_overlays(driver)
+    index = 0
+    for number, step in enumerate(completed, 1):
+        if step.checkpoint:
+            if not step.holds(driver):
+                break
+            index = number
+    return index
+
+
+def run_steps(driver, steps, on_step=None, resume_attempts: int = FLOW_RESUME_ATTEMPTS, resume: bool = False):
+    """
+    Run steps in order; each starts as soon as the previous one is ready.
+    With `resume` the flow starts after the last checkpoint that already
+    holds, e.g. on a page an earlier run of the same flow left set up.
+
+    `on_step(name)` is called before every step, e.g. to report progress; it
+    may raise to stop the flow between steps.
+
+    A step that still fails after its retries does not end the flow: it
+    resumes after the last checkpoint whose page state still holds (from the
+    start if none does), up to `resume_attempts` times, so work such as the
+    search is not redone. Giving up counts against the step's circuit breaker.
+    """
+    index = resume_point(driver, steps) if resume else 0
+    if index:
+        print(f"  ⏭️ Page is already past '{steps[index - 1].name}', continuing from there")
+    resumes = 0
+    while index < len(steps):
+        step = steps[index]
+        if on_step:
+            on_step(step.name)
+        print(f"Step {index + 1}: {step.name}...")
+        try:
+            with span(step.name, number=index + 1) as current:
+                step.run(driver)
+        except StepError:
+            if resumes >= resume_attempts:
+                CIRCUITS.record_failure(step)
+                raise
+            time.sleep(backoff_delay(resumes))
+            resumes += 1
+            index = resume_point(driver, steps[:index])
+            where = f"after '{steps[index - 1].name}'" if index else "from the start"
+            print(f"  ↩️ '{step.name}' failed, resuming {where} ({resumes}/{resume_attempts})")
+            continue
+        CIRCUITS.record_success(step)
+        print(f"  ✅ {step.name} ({current.seconds:.1f}s)")
+        index += 1
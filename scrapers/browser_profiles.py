@@ -0,0 +1,116 @@
+# scrapers/browser_profiles.py
+#
+# Named Chrome setups. "standard" is the visible, maximized browser the
+# scrapers were written against; "performance" runs headless with a small
+# viewport, capped renderer memory and heavy or third-party requests blocked,
+# so more browsers fit on a node and pages load faster.
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Extra URL patterns to block in every blocking profile, comma separated
+BROWSER_BLOCK_EXTRA = tuple(p.strip() for p in os.getenv("BROWSER_BLOCK_EXTRA", "").split(",") if p.strip())
+
+FONT_PATTERNS = ("*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot")
+MEDIA_PATTERNS = ("*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a")
+# Product thumbnails in the grids; the UI's own icons are kept because the
+# export flows locate buttons by their <img> sources
+PRODUCT_IMAGE_PATTERNS = ("*m.media-amazon.com*", "*images-amazon.com*", "*ssl-images-amazon.com*")
+TRACKER_PATTERNS = (
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googleadservices.com*",
+    "*facebook.net*", "*facebook.com/tr*", "*hotjar.com*", "*hotjar.io*", "*segment.io*", "*segment.com*",
+    "*intercom.io*", "*intercomcdn.com*", "*mixpanel.com*", "*fullstory.com*", "*clarity.ms*",
+    "*hubspot.com*", "*hs-analytics.net*", "*linkedin.com/px*", "*bing.com/bat*", "*tiktok.com*",
+)
+
+LEAN_ARGS = (
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--mute-audio",
+    "--renderer-process-limit=2",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,CalculateNativeWinOcclusion",
+)
+
+
+@dataclass(frozen=True)
+class BrowserProfile:
+    name: str
+    headless: bool = False
+    window_size: Optional[Tuple[int, int]] = None  # None starts maximized
+    blocked_urls: Tuple[str, ...] = ()
+    args: Tuple[str, ...] = ()
+    js_heap_mb: Optional[int] = None  # V8 old-space cap per renderer
+
+
+PROFILES = {
+    "standard": BrowserProfile("standard"),
+    "performance": BrowserProfile(
+        "performance",
+        headless=True,
+        window_size=(1366, 900),  # wide enough for the grids' side panels
+        blocked_urls=FONT_PATTERNS + MEDIA_PATTERNS + PRODUCT_IMAGE_PATTERNS + TRACKER_PATTERNS + BROWSER_BLOCK_EXTRA,
+        args=LEAN_ARGS,
+        js_heap_mb=int(os.getenv("BROWSER_JS_HEAP_MB", "512")),
+    ),
+}
+
+
+def parse_profile_map(spec: str) -> dict:
+    """Per-endpoint profiles from "smartscout/rank-maker=performance,smartscout/niche-finder=standard" """
+    mapping = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, name = item.partition("=")
+        mapping[endpoint.strip()] = name.strip()
+    return mapping
+
+
+BROWSER_PROFILE = os.getenv("BROWSER_PROFILE", "standard")
+BROWSER_PROFILES = parse_profile_map(os.getenv("BROWSER_PROFILES", ""))
+
+
+def get_profile(profile=None) -> BrowserProfile:
+    """Look up a profile by name (or pass one through); the default comes from BROWSER_PROFILE"""
+    if isinstance(profile, BrowserProfile):
+        return profile
+    name = profile or BROWSER_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown browser profile '{name}', expected one of {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def profile_for(endpoint: str) -> BrowserProfile:
+    """Profile configured for an endpoint, falling back to the default"""
+    return get_profile(BROWSER_PROFILES.get(endpoint))
+
+
+def apply_options(options, profile: BrowserProfile):
+    """Add the profile's command-line switches to Chrome `options`"""
+    if profile.headless:
+        options.add_argument("--headless=new")
+    if profile.window_size:
+        options.add_argument("--window-size={},{}".format(*profile.window_size))
+    else:
+        options.add_argument("--start-maximized")
+    for arg in profile.args:
+        options.add_argument(arg)
+    if profile.js_heap_mb:
+        options.add_argument(f"--js-flags=--max-old-space-size={profile.js_heap_mb}")
+
+
+def apply_blocking(driver, profile: BrowserProfile):
+    """Block the profile's URL patterns in the driver's current tab via CDP"""
+    if not profile.blocked_urls:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(profile.blocked_urls)})
+    except Exception as e:
+        print(f"  ⚠️ Could not enable request blocking: {e}")
@@ -0,0 +1,405 @@
+# scrapers/browser_supervisor.py
+#
+# Chrome process bookkeeping. Every browser started by get_chrome_driver or
+# BaseScraper.get_driver is registered here by its chromedriver PID; its Chrome
+# processes are that PID's descendants in /proc. chromedriver is started with
+# SCRAPER_BROWSER_OWNER=<pid>:<start time> in its environment, which Chrome and
+# its helpers inherit, so a process can be traced back to the scraper process
+# that started it even after that process is gone.
+#
+# The supervisor
+#   - quits browsers with a deadline and kills their processes when quit() hangs
+#     or leaves some behind,
+#   - measures each browser's memory and age, so the pool recycles browsers over
+#     BROWSER_MAX_RSS_MB or BROWSER_MAX_LIFETIME once their job is done,
+#   - kills browsers whose owner died (a crashed or SIGKILLed API or worker) at
+#     startup and every BROWSER_REAP_INTERVAL seconds, along with browsers this
+#     process lost track of (a driver dropped without quit(), Chrome left behind
+#     by a dead chromedriver).
+#
+# Memory is read from /proc, so measuring and reaping only happen on Linux.
+import os
+import time
+import signal
+import weakref
+import threading
+
+from .telemetry import BROWSERS_REAPED, BROWSERS_RECYCLED, register_gauge
+
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1536"))
+BROWSER_MAX_LIFETIME = int(os.getenv("BROWSER_MAX_LIFETIME", "14400"))
+# A leased browser this far over the limit is killed mid-job instead of waiting for release (0: never)
+BROWSER_KILL_RSS_MB = int(os.getenv("BROWSER_KILL_RSS_MB", "0"))
+BROWSER_QUIT_TIMEOUT = int(os.getenv("BROWSER_QUIT_TIMEOUT", "20"))
+BROWSER_REAP_INTERVAL = int(os.getenv("BROWSER_REAP_INTERVAL", "60"))
+# Browsers still starting are not registered yet; they are left alone this long
+BROWSER_START_GRACE = 120
+
+OWNER_ENV = "SCRAPER_BROWSER_OWNER"
+PROC_AVAILABLE = os.path.isdir("/proc/self")
+
+
+# --- /proc ---
+
+def _processes() -> dict:
+    """pid -> (ppid, start time in clock ticks) for every running process in /proc"""
+    processes = {}
+    if not PROC_AVAILABLE:
+        return processes
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the other fields follow its closing paren
+                fields = f.read().rsplit(")", 1)[1].split()
+            if fields[0] in ("Z", "X"):
+                continue  # already dead, waiting to be reaped by its parent
+            processes[int(entry)] = (int(fields[1]), int(fields[19]))
+        except (OSError, IndexError, ValueError):
+            continue
+    return processes
+
+
+def _descendants(root: int, processes: dict) -> set:
+    children = {}
+    for pid, (ppid, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+    tree, frontier = {root}, [root]
+    while frontier:
+        for child in children.get(frontier.pop(), ()):
+            if child not in tree:
+                tree.add(child)
+                frontier.append(child)
+    return tree
+
+
+def _read(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+def _owner(pid: int):
+    """The owner token a process inherited from chromedriver, None if it is not one of ours"""
+    prefix = OWNER_ENV.encode() + b"="
+    for item in _read(f"/proc/{pid}/environ").split(b"\0"):
+        if item.startswith(prefix):
+            return item[len(prefix):].decode()
+    return None
+
+
+def _is_browser_root(pid: int) -> bool:
+    """chromedriver or a Chrome browser process, as opposed to one of Chrome's helpers"""
+    return b"--type=" not in _read(f"/proc/{pid}/cmdline")
+
+
+def _memory_bytes(pid: int) -> int:
+    """Proportional set size: Chrome's processes share pages, and PSS counts each page once across them"""
+    for path, field in ((f"/proc/{pid}/smaps_rollup", b"Pss:"), (f"/proc/{pid}/status", b"VmRSS:")):
+        for line in _read(path).splitlines():
+            if line.startswith(field):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _age(start_ticks: int) -> float:
+    try:
+        uptime = float(_read("/proc/uptime").split()[0])
+    except (IndexError, ValueError):
+        return 0.0
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+def _kill(pids: dict) -> int:
+    """SIGKILL the processes in {pid: start ticks} that are still the same processes; returns how many"""
+    current = _processes() if PROC_AVAILABLE else {}
+    killed = 0
+    for pid, start in pids.items():
+        if PROC_AVAILABLE and (pid not in current or current[pid][1] != start):
+            continue  # already gone, or the PID now belongs to something else
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            continue
+    for pid in pids:
+        # Our own children (chromedriver, or anything reparented to a PID 1 server) would stay zombies
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except (ChildProcessError, OSError):
+            pass
+    return killed
+
+
+def _start_ticks(pid: int) -> int:
+    try:
+        return int(_read(f"/proc/{pid}/stat").rsplit(b")", 1)[1].split()[19])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _token(pid: int) -> str:
+    """Identifies a process across PID reuse: its PID and start time"""
+    return f"{pid}:{_start_ticks(pid)}"
+
+
+def _alive(token: str, processes: dict) -> bool:
+    pid, _, start = token.partition(":")
+    try:
+        return processes.get(int(pid), (None, None))[1] == int(start)
+    except ValueError:
+        return False
+
+
+class TrackedBrowser:
+    """One registered browser: its chromedriver and the last measurement of its process tree"""
+
+    def __init__(self, driver, pid: int, start: int):
+        self.ref = weakref.ref(driver)
+        self.pid = pid
+        self.start = start
+        self.started_at = time.time()
+        self.pids = {pid: start}  # the whole tree at the last sweep
+        self.memory = 0
+        self.over_limit = None  # "memory" once past the limit
+        self.quitting = False
+
+
+class BrowserSupervisor:
+    """
+    Tracks the browsers this process starts. `service_env()` goes into the
+    chromedriver Service, `track(driver)` registers the driver it returns and
+    `quit(driver)` shuts it down for good. `start()` reaps what earlier
+    processes left behind and keeps sweeping in the background.
+    """
+
+    def __init__(self, max_rss_mb: int = BROWSER_MAX_RSS_MB, max_lifetime: int = BROWSER_MAX_LIFETIME,
+                 kill_rss_mb: int = BROWSER_KILL_RSS_MB, quit_timeout: int = BROWSER_QUIT_TIMEOUT):
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_lifetime = max_lifetime
+        self.kill_rss = kill_rss_mb * 1024 * 1024
+        self.quit_timeout = quit_timeout
+        self._token = _token(os.getpid())
+        self._browsers = {}  # chromedriver pid -> TrackedBrowser
+        self._lock = threading.Lock()
+        self._counts = {"reaped": 0, "recycled": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- registration ---
+
+    @property
+    def token(self) -> str:
+        """This process's owner marker; forked worker processes get one of their own"""
+        if not self._token.startswith(f"{os.getpid()}:"):
+            self._token = _token(os.getpid())
+        return self._token
+
+    def service_env(self) -> dict:
+        """Environment for chromedriver; Chrome inherits the owner marker from it"""
+        return {**os.environ, OWNER_ENV: self.token}
+
+    def track(self, driver):
+        """Register a freshly started driver; returns it"""
+        process = getattr(getattr(driver, "service", None), "process", None)
+        if process is None:
+            return driver
+        start = _start_ticks(process.pid)
+        with self._lock:
+            self._browsers[process.pid] = TrackedBrowser(driver, process.pid, start)
+        return driver
+
+    def _find(self, driver):
+        with self._lock:
+            return next((b for b in self._browsers.values() if b.ref() is driver), None)
+
+    def _untrack(self, browser: TrackedBrowser):
+        with self._lock:
+            self._browsers.pop(browser.pid, None)
+
+    # --- limits ---
+
+    def over_limit(self, driver):
+        """"memory" or "lifetime" if the browser should be recycled, as of the last sweep; None otherwise"""
+        browser = self._find(driver)
+        if browser is None:
+            return None
+        if self.max_lifetime and time.time() - browser.started_at > self.max_lifetime:
+            return "lifetime"
+        return browser.over_limit
+
+    # --- shutting down ---
+
+    def quit(self, driver, recycled: str = None):
+        """
+        `driver.quit()` within the quit timeout, then kill whatever of the browser
+        is still running. `recycled` names the limit that retired it.
+        """
+        browser = self._find(driver)
+        if browser is not None:
+            browser.pids = self._tree(browser)
+            browser.quitting = True
+        if recycled:
+            with self._lock:
+                self._counts["recycled"] += 1
+            BROWSERS_RECYCLED.inc(reason=recycled)
+
+        done = threading.Event()
+        errors = []
+
+        def run():
+            try:
+                driver.quit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        threading.Thread(target=run, name="browser-quit", daemon=True).start()
+        reason = None
+        if not done.wait(self.quit_timeout):
+            print(f"  ⚠️ Browser quit hung for {self.quit_timeout}s, killing its processes")
+            reason = "hung"
+        elif errors:
+            print(f"  ⚠️ Could not quit browser: {errors[0]}")
+            reason = "quit_failed"
+        if browser is None:
+            return
+        self._untrack(browser)
+        # Chrome helpers sometimes outlive a clean quit too; without /proc
+        # a PID cannot be told from a reused one, so only a failed quit is cleaned up
+        if PROC_AVAILABLE or reason:
+            self._reap(browser.pids, reason or "leftover")
+
+    def _tree(self, browser: TrackedBrowser) -> dict:
+        if not PROC_AVAILABLE:
+            return {browser.pid: browser.start}
+        processes = _processes()
+        if browser.pid not in processes:
+            return {}
+        return {pid: processes[pid][1] for pid in _descendants(browser.pid, processes)}
+
+    def _reap(self, pids: dict, reason: str) -> int:
+        killed = _kill(pids)
+        if killed:
+            with self._lock:
+                self._counts["reaped"] += killed
+            BROWSERS_REAPED.inc(killed, reason=reason)
+        return killed
+
+    # --- sweeping ---
+
+    def sweep(self):
+        """Measure every tracked browser, then kill dropped, runaway, lost and orphaned ones"""
+        if not PROC_AVAILABLE:
+            return
+        processes = _processes()
+        with self._lock:
+            browsers = list(self._browsers.values())
+        owned = set()
+        for browser in browsers:
+            if browser.quitting:
+                owned.update(browser.pids)
+                continue
+            if processes.get(browser.pid, (None, None))[1] != browser.start:
+                # chromedriver exited; anything it left behind is reaped as lost below
+                self._untrack(browser)
+                continue
+            tree = _descendants(browser.pid, processes)
+            browser.pids = {pid: processes[pid][1] for pid in tree}
+            if browser.ref() is None:
+                print(f"  🧹 Killing a browser whose driver was dropped without quit() ({len(tree)} processes)")
+                self._untrack(browser)
+                self._reap(browser.pids, "dropped")
+                owned.update(tree)
+                continue
+            browser.memory = sum(_memory_bytes(pid) for pid in tree)
+            if self.kill_rss and browser.memory > self.kill_rss:
+                print(f"  🧹 Killing a browser at {browser.memory // 2**20} MB (limit {self.kill_rss // 2**20} MB)")
+                self._untrack(browser)
+                self._reap(browser.pids, "watchdog")
+                owned.update(tree)
+                continue
+            over = "memory" if self.max_rss and browser.memory > self.max_rss else None
+            if over and browser.over_limit is None:
+                print(f"  📈 Browser at {browser.memory // 2**20} MB, recycling it after its current job")
+            browser.over_limit = over
+            owned.update(tree)
+        self.reap_orphans(processes, owned)
+
+    def reap_orphans(self, processes: dict = None, owned: set = None) -> int:
+        """
+        Kill browsers whose owning process is gone, and browsers of this process
+        that are no longer tracked. Returns how many processes were killed.
+        """
+        if not PROC_AVAILABLE:
+            return 0
+        processes = processes if processes is not None else _processes()
+        if owned is None:
+            with self._lock:
+                owned = {pid for b in self._browsers.values() for pid in _descendants(b.pid, processes)}
+        orphans, lost = {}, {}
+        me = os.getpid()
+        for pid, (_, start) in processes.items():
+            if pid == me or pid in owned:
+                continue
+            owner = _owner(pid)
+            if owner is None:
+                continue
+            if owner != self.token:
+                if not _alive(owner, processes):
+                    orphans[pid] = start
+            elif _age(start) > BROWSER_START_GRACE and _is_browser_root(pid):
+                # Killing chromedriver or Chrome's browser process takes its helpers down with it
+                lost[pid] = start
+        killed = self._reap(orphans, "orphan") + self._reap(lost, "lost")
+        if killed:
+            print(f"🧹 Reaped {killed} leftover browser process(es)")
+        return killed
+
+    def start(self):
+        """Reap what earlier processes left behind, then sweep every BROWSER_REAP_INTERVAL seconds"""
+        self.reap_orphans()
+        if self._thread is not None or not PROC_AVAILABLE:
+            return
+        self._stop.clear()
+        register_gauge("browser_processes", "Browsers started by this process and still running",
+                       lambda: self.stats()["live"])
+        register_gauge("browser_memory_bytes", "Memory of this process's browsers (PSS)",
+                       lambda: self.stats()["memory_bytes"])
+        self._thread = threading.Thread(target=self._loop, name="browser-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sweeping and kill any browser still tracked, so none outlives the process"""
+        self._stop.set()
+        with self._lock:
+            browsers = list(self._browsers.values())
+            self._browsers.clear()
+        for browser in browsers:
+            self._reap(self._tree(browser), "shutdown")
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(BROWSER_REAP_INTERVAL):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ Browser sweep failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            browsers = list(self._browsers.values())
+            counts = dict(self._counts)
+        return {
+            "live": len(browsers),
+            "memory_bytes": sum(b.memory for b in browsers),
+            "over_limit": sum(1 for b in browsers if b.over_limit),
+            **counts,
+        }
+
+
+SUPERVISOR = BrowserSupervisor()
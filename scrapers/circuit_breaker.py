@@ -0,0 +1,123 @@
+# scrapers/circuit_breaker.py
+#
+# Circuit breakers per selector. When the same step keeps failing scrape after
+# scrape (the site changed its markup, or a page stopped loading), its breaker
+# opens and new scrapes of the flows using it are refused for a cooldown instead
+# of each one burning a browser and minutes of timeouts. After the cooldown one
+# scrape is let through as a probe; if the step passes again the breaker closes.
+# State is per process; each worker keeps its own.
+import os
+import time
+import threading
+
+from .telemetry import register_gauge, current_flow
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))  # consecutive failed scrapes
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "300"))
+CIRCUIT_PROBE_RETRY_AFTER = 30
+
+
+class CircuitOpen(Exception):
+    """Raised instead of starting a scrape while a step it depends on keeps failing"""
+
+    def __init__(self, flow: str, step: str, retry_after: float):
+        super().__init__(f"'{step}' keeps failing for {flow}; new scrapes are paused for {retry_after:.0f}s")
+        self.flow = flow
+        self.step = step
+        self.retry_after = retry_after
+
+
+class _Breaker:
+    def __init__(self):
+        self.step = ""
+        self.flows = set()
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+
+class CircuitBreakers:
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, cooldown: float = CIRCUIT_COOLDOWN):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._breakers = {}  # selector -> _Breaker
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(step) -> str:
+        if step.locator is not None:
+            return f"{step.locator[0]}={step.locator[1]}"
+        return step.name
+
+    def record_failure(self, step, flow: str = None):
+        """A scrape gave up on `step`"""
+        flow = flow if flow is not None else current_flow()
+        with self._lock:
+            breaker = self._breakers.setdefault(self._key(step), _Breaker())
+            breaker.step = step.name
+            breaker.flows.add(flow)
+            breaker.failures += 1
+            # A failed probe reopens at once
+            if breaker.opened_at is not None or breaker.failures >= self.threshold:
+                if breaker.opened_at is None:
+                    print(f"🔌 Circuit open: '{step.name}' failed {breaker.failures} scrapes in a row, "
+                          f"pausing {flow} for {self.cooldown:.0f}s")
+                breaker.opened_at = time.monotonic()
+                breaker.probe_started = None
+
+    def record_success(self, step):
+        key = self._key(step)
+        if key not in self._breakers:
+            return
+        with self._lock:
+            breaker = self._breakers.pop(key, None)
+        if breaker is not None and breaker.opened_at is not None:
+            print(f"🔌 Circuit closed: '{step.name}' works again")
+
+    def check(self, flow: str):
+        """
+        Raise CircuitOpen if a breaker used by `flow` (or its sub-flows, such as
+        batches) is open. Once the cooldown has passed one scrape gets through.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for breaker in self._breakers.values():
+                if breaker.opened_at is None or not any(f == flow or f.startswith(flow + "/") for f in breaker.flows):
+                    continue
+                remaining = breaker.opened_at + self.cooldown - now
+                if remaining > 0:
+                    raise CircuitOpen(flow, breaker.step, remaining)
+                if breaker.probe_started is not None and now - breaker.probe_started < self.cooldown:
+                    raise CircuitOpen(flow, breaker.step, CIRCUIT_PROBE_RETRY_AFTER)
+                # This scrape is the probe; a probe that never reaches the step expires after a cooldown
+                breaker.probe_started = now
+
+    def status(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "step": breaker.step,
+                    "selector": key,
+                    "flows": sorted(breaker.flows),
+                    "failures": breaker.failures,
+                    "open": breaker.opened_at is not None,
+                    "retry_after": round(max(0.0, breaker.opened_at + self.cooldown - now), 1)
+                    if breaker.opened_at is not None else 0,
+                }
+                for key, breaker in self._breakers.items()
+            ]
+
+
+CIRCUITS = CircuitBreakers()
+
+
+def check_circuit(flow: str):
+    CIRCUITS.check(flow)
+
+
+register_gauge(
+    "scraper_circuit_open", "Steps whose circuit breaker is open",
+    lambda: [({"flow": ",".join(s["flows"]), "step": s["step"]}, 1) for s in CIRCUITS.status() if s["open"]],
+    ("flow", "step"),
+)
@@ -0,0 +1,288 @@
+# scrapers/download_capture.py
+#
+# Export capture without Chrome's download manager. Browser-side CSV exports
+# (ag-grid, FileSaver and the like) build a Blob, wrap it in a blob: URL and
+# click an <a download> link. A hook installed in the page keeps a reference
+# to those Blobs and swallows the click, so Chrome never writes the file. The
+# Blob is then read over the WebDriver connection in base64 chunks into a
+# spooled buffer that stays in memory up to DOWNLOAD_SPOOL_MAX_MB and only then
+# spills to an anonymous temp file. The result is written once, straight to
+# its output path, with its ETag computed on the way in.
+#
+# Exports the hook cannot see (a link to a server URL, a form post) still go to
+# the job's download directory, which is watched as a fallback.
+import os
+import time
+import base64
+import shutil
+import fnmatch
+import hashlib
+import tempfile
+
+from selenium.common.exceptions import JavascriptException, WebDriverException
+
+from .base_scraper import _completed_downloads, wait_for_download
+from .telemetry import span
+
+# "memory" captures exports in the page; "disk" lets Chrome save them to the job directory
+DOWNLOAD_CAPTURE = os.getenv("DOWNLOAD_CAPTURE", "memory").lower()
+DOWNLOAD_SPOOL_MAX_MB = int(os.getenv("DOWNLOAD_SPOOL_MAX_MB", "16"))
+DOWNLOAD_READ_CHUNK = 4 * 1024 * 1024  # bytes per round trip (base64 on the wire)
+DOWNLOAD_POLL_INTERVAL = 0.1
+
+HOOK_SCRIPT = """
+(function () {
+    if (window.__scraperDownloads) { window.__scraperDownloads.off = false; return; }
+    const state = window.__scraperDownloads = {blobs: new Map(), pending: {}, captured: [], seq: 0, off: false};
+    const MAX_TRACKED = 50;
+
+    const createObjectURL = URL.createObjectURL;
+    URL.createObjectURL = function (obj) {
+        const url = createObjectURL.apply(this, arguments);
+        if (obj instanceof Blob) {
+            state.blobs.set(url, obj);
+            // Pages create object URLs for images too; only the latest few can be exports
+            if (state.blobs.size > MAX_TRACKED) state.blobs.delete(state.blobs.keys().next().value);
+        }
+        return url;
+    };
+
+    function take(anchor) {
+        if (state.off) return false;
+        const href = anchor.href || '';
+        // Revoking the URL right after the click does not free a Blob still referenced here
+        const blob = state.blobs.get(href) || null;
+        if (!blob && !href.startsWith('data:')) return false;
+        const id = ++state.seq;
+        state.pending[id] = blob || fetch(href).then(r => r.blob());
+        state.captured.push({id: id, name: anchor.getAttribute('download') || '', size: blob ? blob.size : null});
+        return true;
+    }
+
+    const click = HTMLAnchorElement.prototype.click;
+    HTMLAnchorElement.prototype.click = function () {
+        if (!take(this)) return click.apply(this, arguments);
+    };
+    const dispatchEvent = EventTarget.prototype.dispatchEvent;
+    EventTarget.prototype.dispatchEvent = function (event) {
+        // FileSaver clicks a detached anchor by dispatching a synthetic event
+        if (this instanceof HTMLAnchorElement && event.type === 'click' && take(this)) return false;
+        return dispatchEvent.apply(this, arguments);
+    };
+    document.addEventListener('click', function (event) {
+        const anchor = event.target.closest && event.target.closest('a[download], a[href^="blob:"]');
+        if (anchor && take(anchor)) event.preventDefault();
+    }, true);
+})();
+"""
+
+TAKE_SCRIPT = """
+const state = window.__scraperDownloads;
+return state ? state.captured.splice(0) : null;
+"""
+
+READ_SCRIPT = """
+const [id, start, count, done] = arguments;
+const state = window.__scraperDownloads;
+Promise.resolve(state && state.pending[id]).then(function (blob) {
+    if (!blob) return done({error: 'capture ' + id + ' is gone (page reloaded?)'});
+    state.pending[id] = blob;
+    const reader = new FileReader();
+    reader.onload = function () {
+        const url = reader.result;
+        done({data: url.slice(url.indexOf(',') + 1), size: blob.size});
+    };
+    reader.onerror = function () { done({error: String(reader.error)}); };
+    reader.readAsDataURL(blob.slice(start, start + count));
+}, function (e) { done({error: String(e)}); });
+"""
+
+OFF_SCRIPT = """
+const state = window.__scraperDownloads;
+if (state) { state.off = true; state.captured = []; state.pending = {}; }
+"""
+
+RELEASE_SCRIPT = """
+const state = window.__scraperDownloads;
+if (state) { if (arguments[0] === null) state.pending = {}; else delete state.pending[arguments[0]]; }
+"""
+
+
+class DownloadCaptureError(Exception):
+    """A captured export could not be read back from the page"""
+
+
+class CapturedDownload:
+    """
+    One finished export: a spooled buffer read from the page, or a file Chrome
+    saved to the job directory (`path`) when the page bypassed the hook.
+    """
+
+    def __init__(self, name: str, buffer=None, path: str = None, size: int = 0, etag: str = None,
+                 spilled: bool = False):
+        self.name = name
+        self.buffer = buffer
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.spilled = spilled  # the buffer outgrew memory and went to a temp file
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.name or self.path or "")[1] or ".csv"
+
+    def save(self, dest_path: str, cleanup: bool = True):
+        """Write the export to `dest_path`: one pass from the buffer, or a rename of Chrome's file"""
+        if self.buffer is None:
+            if cleanup:
+                shutil.move(self.path, dest_path)
+            else:
+                shutil.copy2(self.path, dest_path)
+            return
+        partial_path = dest_path + ".part"
+        try:
+            self.buffer.seek(0)
+            with open(partial_path, "wb") as f:
+                shutil.copyfileobj(self.buffer, f, 1024 * 1024)
+            os.replace(partial_path, dest_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            self.close()
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+
+
+class DownloadCapture:
+    """
+    Arm before the export click, then `wait()` for the export:
+
+        with DownloadCapture(driver, job_dir) as capture:
+            run_steps(driver, steps, on_step)
+            download = capture.wait(timeout=20)
+
+    The hook survives navigations, so one capture serves every export of a
+    batch; `discard()` drops anything captured but not collected.
+    """
+
+    def __init__(self, driver, job_dir: str, pattern: str = "*.csv", enabled: bool = None,
+                 spool_max_bytes: int = DOWNLOAD_SPOOL_MAX_MB * 1024 * 1024):
+        self.driver = driver
+        self.job_dir = job_dir
+        self.pattern = pattern
+        self.enabled = DOWNLOAD_CAPTURE == "memory" if enabled is None else enabled
+        self.spool_max_bytes = spool_max_bytes
+        self._script_id = None
+        if self.enabled:
+            self.arm()
+
+    def arm(self):
+        """Install the hook in the current page and in every page loaded after it"""
+        try:
+            if self._script_id is None:
+                self._script_id = self.driver.execute_cdp_cmd(
+                    "Page.addScriptToEvaluateOnNewDocument", {"source": HOOK_SCRIPT}
+                ).get("identifier")
+            self.driver.execute_script(HOOK_SCRIPT)
+        except WebDriverException as e:
+            print(f"  ⚠️ Download capture unavailable, using the download directory: {str(e).strip()}")
+            self.enabled = False
+
+    def disarm(self):
+        """Let downloads through again; the leased browser outlives this export"""
+        if not self.enabled:
+            return
+        try:
+            if self._script_id is not None:
+                self.driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument",
+                                            {"identifier": self._script_id})
+            self.driver.execute_script(OFF_SCRIPT)
+        except WebDriverException:
+            pass
+        self._script_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.disarm()
+
+    def discard(self):
+        """Forget exports captured so far, so a late one is never handed to the next wait()"""
+        if self.enabled:
+            try:
+                self.driver.execute_script(TAKE_SCRIPT)
+                self.driver.execute_script(RELEASE_SCRIPT, None)
+            except WebDriverException:
+                pass
+
+    def wait(self, timeout: float = 20):
+        """The next export - captured in the page or saved by Chrome - or None after `timeout` seconds"""
+        if not self.enabled:
+            with span("Wait for download", capture="disk") as current:
+                path = wait_for_download(self.job_dir, pattern=self.pattern, timeout=timeout)
+                current.set(found=bool(path))
+            return CapturedDownload(os.path.basename(path), path=path, size=os.path.getsize(path)) if path else None
+
+        with span("Wait for download", capture="memory") as current:
+            deadline = time.monotonic() + timeout
+            while True:
+                entry = self._take()
+                if entry is not None:
+                    download = self._read(entry)
+                    current.set(found=True, bytes=download.size, spilled=download.spilled)
+                    return download
+                files = _completed_downloads(self.job_dir, self.pattern)
+                if files:
+                    path = max(files, key=os.path.getmtime)
+                    current.set(found=True, bytes=os.path.getsize(path), fallback=True)
+                    return CapturedDownload(os.path.basename(path), path=path, size=os.path.getsize(path))
+                if time.monotonic() >= deadline:
+                    current.set(found=False)
+                    return None
+                time.sleep(DOWNLOAD_POLL_INTERVAL)
+
+    def _take(self):
+        try:
+            entries = self.driver.execute_script(TAKE_SCRIPT)
+        except JavascriptException:
+            entries = None
+        if entries is None:
+            # A page that was not loaded through the browser (about:blank, a crash page) lost the hook
+            self.driver.execute_script(HOOK_SCRIPT)
+            return None
+        matching = [e for e in entries if not e["name"] or fnmatch.fnmatch(e["name"], self.pattern)]
+        wanted = matching[0] if matching else None
+        for entry in entries:
+            if entry is not wanted:
+                self.driver.execute_script(RELEASE_SCRIPT, entry["id"])
+        return wanted
+
+    def _read(self, entry: dict) -> CapturedDownload:
+        buffer = tempfile.SpooledTemporaryFile(max_size=self.spool_max_bytes)
+        digest = hashlib.sha256()
+        offset = 0
+        try:
+            while True:
+                part = self.driver.execute_async_script(READ_SCRIPT, entry["id"], offset, DOWNLOAD_READ_CHUNK)
+                if part.get("error"):
+                    raise DownloadCaptureError(f"Reading the captured export failed: {part['error']}")
+                data = base64.b64decode(part["data"])
+                buffer.write(data)
+                digest.update(data)
+                offset += len(data)
+                if not data or offset >= part["size"]:
+                    break
+        except BaseException:
+            buffer.close()
+            raise
+        finally:
+            self.driver.execute_script(RELEASE_SCRIPT, entry["id"])
+        if offset == 0:
+            buffer.close()
+            raise DownloadCaptureError("The captured export is empty")
+        print(f"  ✅ Captured {entry['name'] or 'export'} from the page ({offset} bytes)")
+        return CapturedDownload(entry["name"], buffer=buffer, size=offset, etag=digest.hexdigest()[:32],
+                                spilled=offset > self.spool_max_bytes)
@@ -0,0 +1,16 @@
+# scrapers/errors.py
+#
+# Exceptions the API side needs without importing Selenium.
+
+
+class ScrapeAborted(Exception):
+    """Raised from an `on_step` callback to stop a flow (cancellation, deadlines)"""
+
+
+def aborted(error: BaseException) -> bool:
+    """True if `error` is, or was raised while handling, a ScrapeAborted (scrapers wrap their errors)"""
+    while error is not None:
+        if isinstance(error, ScrapeAborted):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
@@ -0,0 +1,321 @@
+# scrapers/grid_extractor.py
+#
+# Bulk row extraction from an ag-grid table, for scrapers that have no export
+# button worth clicking. Each round trip is one execute_async_script call that
+# reads a whole chunk of rows: straight from the grid's row model when its API
+# can be reached (client-side, infinite and server-side row models - blocks
+# that are not loaded yet are requested and waited for inside the same call),
+# otherwise from the rendered DOM, scrolling the viewport to virtualise through
+# the rows. Server-side pagination is followed by clicking a "next page"
+# control between pages.
+#
+# Rows stream out chunk by chunk together with a GridCursor, so a caller can
+# write them as they arrive and resume from the last chunk after a failure.
+import os
+import time
+from dataclasses import dataclass
+
+from selenium.common.exceptions import (
+    JavascriptException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from .base_scraper import backoff_delay, grid_ready, network_idle
+from .telemetry import span
+
+GRID_CHUNK_SIZE = int(os.getenv("GRID_CHUNK_SIZE", "2000"))
+GRID_LOAD_WAIT = float(os.getenv("GRID_LOAD_WAIT", "15"))  # seconds one round trip waits for rows to load
+GRID_READ_RETRIES = int(os.getenv("GRID_READ_RETRIES", "3"))
+GRID_PAGE_TIMEOUT = 30
+
+READ_ERRORS = (JavascriptException, StaleElementReferenceException, TimeoutException)
+
+# ag-grid's own paging panel
+AG_GRID_NEXT_PAGE = (By.XPATH, "//div[contains(@class, 'ag-paging-button') and @ref='btNext']")
+
+READ_SCRIPT = """
+const [start, count, waitMs, done] = arguments;
+const deadline = Date.now() + waitMs;
+
+function findApi() {
+    const cached = window.__scraperGridApi;
+    if (cached && !(cached.isDestroyed && cached.isDestroyed())) return cached;
+    for (const el of document.querySelectorAll('.ag-root-wrapper, .ag-root, ag-grid-angular')) {
+        for (const c of [el.__agComponent, el.gridOptions]) {
+            if (!c) continue;
+            const api = typeof c.getDisplayedRowCount === 'function' ? c
+                : c.gridApi || c.api || (c.beans && c.beans.gridApi)
+                  || (c.gridOptionsService && c.gridOptionsService.api) || (c.gridOptions && c.gridOptions.api);
+            if (api && typeof api.getDisplayedRowCount === 'function') return window.__scraperGridApi = api;
+        }
+    }
+    return null;
+}
+
+function plain(value) {
+    if (value === undefined) return null;
+    return value instanceof Date ? value.toISOString() : value;
+}
+
+function readApi(api) {
+    const option = name => api.getGridOption ? api.getGridOption(name) : undefined;
+    const model = option('rowModelType') || (api.getModel && api.getModel().getType && api.getModel().getType()) || 'clientSide';
+    const paginated = api.getGridOption ? !!option('pagination')
+        : !!(api.paginationGetTotalPages && api.paginationGetTotalPages() > 1);
+    const columns = ((api.getAllDisplayedColumns && api.getAllDisplayedColumns()) || []).map(col => {
+        const def = col.getColDef ? col.getColDef() : (col.colDef || {});
+        const id = col.getColId ? col.getColId() : (def.colId || def.field);
+        return {col: col, id: id, field: def.field, header: def.headerName || def.field || id};
+    }).filter(c => c.id && !String(c.id).startsWith('ag-Grid-'));
+    const cell = (node, c) => plain(
+        api.getCellValue ? api.getCellValue({rowNode: node, colKey: c.col})
+        : api.getValue ? api.getValue(c.col, node)
+        : c.field ? c.field.split('.').reduce((o, k) => o == null ? o : o[k], node.data) : null
+    );
+    const lastKnown = () => model === 'clientSide' || !api.isLastRowIndexKnown || api.isLastRowIndexKnown();
+    const rows = [];
+    let index = start;
+
+    (function read() {
+        const total = api.getDisplayedRowCount();
+        while (rows.length < count && index < total) {
+            const node = api.getDisplayedRowAtIndex(index);
+            if (!node || node.stub || (!node.data && !node.group)) break;  // block still loading
+            if (node.data) rows.push(columns.length ? columns.map(c => cell(node, c)) : node.data);
+            index++;
+        }
+        const finished = index >= total && lastKnown();
+        if (rows.length >= count || finished || Date.now() > deadline) {
+            return done({
+                source: 'api', row_model: model, columns: columns.length ? columns.map(c => c.header) : null,
+                rows: rows, next: index, finished: finished, covers_pages: model === 'clientSide' && paginated
+            });
+        }
+        // Make the grid load the block holding `index`, then look again
+        if (api.ensureIndexVisible && total > 0) api.ensureIndexVisible(Math.min(index, total - 1), 'bottom');
+        setTimeout(read, 100);
+    })();
+}
+
+function readDom() {
+    const root = document.querySelector('.ag-root-wrapper');
+    if (!root) return done({error: 'No ag-grid on the page'});
+    const viewport = root.querySelector('.ag-body-viewport');
+    const headers = new Map();
+    root.querySelectorAll('.ag-header-cell[col-id]').forEach(el => {
+        const text = el.querySelector('.ag-header-cell-text');
+        headers.set(el.getAttribute('col-id'), (text ? text.textContent : el.textContent).trim() || el.getAttribute('col-id'));
+    });
+    const seen = new Map();
+    let lastSize = -1, stableTicks = 0, first = true;
+
+    function collect() {
+        const rowEls = root.querySelectorAll('.ag-row');
+        rowEls.forEach((el, position) => {
+            const index = el.hasAttribute('row-index') ? Number(el.getAttribute('row-index')) : position;
+            if (index < start) return;
+            const row = seen.get(index) || {};
+            el.querySelectorAll('.ag-cell').forEach((cellEl, k) => {
+                const id = cellEl.getAttribute('col-id') || String(k);
+                if (!headers.has(id)) headers.set(id, id);
+                row[id] = cellEl.textContent.trim();
+            });
+            seen.set(index, row);
+        });
+    }
+
+    (function read() {
+        if (first && start > 0 && viewport) {
+            const sample = root.querySelector('.ag-row');
+            viewport.scrollTop = start * ((sample && sample.offsetHeight) || 25);
+        }
+        first = false;
+        collect();
+        const rows = [];
+        let index = start;
+        while (seen.has(index) && rows.length < count) rows.push(seen.get(index++));
+        const loading = Array.from(root.querySelectorAll('.ag-overlay-loading-wrapper')).some(el => el.offsetParent !== null);
+        const atBottom = !viewport || viewport.scrollTop + viewport.clientHeight >= viewport.scrollHeight - 1;
+        stableTicks = seen.size === lastSize && !loading ? stableTicks + 1 : 0;
+        lastSize = seen.size;
+        const finished = atBottom && stableTicks >= 3 && !seen.has(index);
+        if (rows.length >= count || finished || Date.now() > deadline) {
+            const ids = Array.from(headers.keys());
+            return done({
+                source: 'dom', columns: ids.map(id => headers.get(id)),
+                rows: rows.map(row => ids.map(id => row[id] === undefined ? null : row[id])),
+                next: index, finished: finished, covers_pages: false
+            });
+        }
+        if (viewport && !atBottom && !loading) viewport.scrollTop += Math.max(viewport.clientHeight * 0.9, 50);
+        setTimeout(read, 100);
+    })();
+}
+
+try {
+    const api = findApi();
+    api ? readApi(api) : readDom();
+} catch (e) {
+    done({error: String(e && e.stack || e)});
+}
+"""
+
+FIRST_ROW_SCRIPT = """
+const row = document.querySelector('.ag-root-wrapper .ag-row');
+return row ? row.textContent : null;
+"""
+
+
+class GridExtractionError(Exception):
+    """Rows could not be read; `cursor` is where a retry can pick up"""
+
+    def __init__(self, message: str, cursor):
+        super().__init__(f"{message} (resume from cursor '{cursor}')")
+        self.cursor = cursor
+
+
+@dataclass(frozen=True)
+class GridCursor:
+    """Position in a grid: zero-based page of a paginated grid and row within it"""
+
+    page: int = 0
+    row: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.page}:{self.row}"
+
+    @classmethod
+    def parse(cls, value):
+        """From "page:row" (or a bare row number); empty means the start"""
+        if isinstance(value, cls):
+            return value
+        if not value:
+            return cls()
+        try:
+            page, _, row = str(value).rpartition(":")
+            return cls(int(page or 0), int(row))
+        except ValueError:
+            raise ValueError(f"Invalid grid cursor '{value}', expected 'page:row'") from None
+
+
+class GridExtractor:
+    """
+    Reads every row of the grid on the current page.
+
+    chunk_size -- rows per round trip
+    next_page  -- locator of the "next page" control for server-side
+                  pagination, or None for a single page/infinite scroll
+    max_rows   -- stop after this many rows
+    """
+
+    def __init__(self, chunk_size: int = GRID_CHUNK_SIZE, next_page=AG_GRID_NEXT_PAGE, max_rows: int = None,
+                 load_wait: float = GRID_LOAD_WAIT, retries: int = GRID_READ_RETRIES):
+        self.chunk_size = max(1, chunk_size)
+        self.next_page = next_page
+        self.max_rows = max_rows
+        self.load_wait = load_wait
+        self.retries = retries
+        self.columns = None
+        self.finished = False  # every row was read (not stopped by max_rows)
+
+    def chunks(self, driver, cursor=None):
+        """
+        Yield `(rows, cursor)` per round trip: row dicts keyed by column header,
+        and the cursor to resume after them. A resumed cursor skips `page`
+        pages first, so the grid must be freshly loaded and filtered as before.
+        """
+        cursor = GridCursor.parse(cursor)
+        self.finished = False
+        driver.set_script_timeout(self.load_wait + 10)
+        for _ in range(cursor.page):
+            if not self._turn_page(driver):
+                raise GridExtractionError(f"Grid has fewer than {cursor.page + 1} pages", cursor)
+        emitted = 0
+        while True:
+            limit = self.chunk_size
+            if self.max_rows is not None:
+                limit = min(limit, self.max_rows - emitted)
+                if limit <= 0:
+                    return
+            chunk = self._read(driver, cursor, limit)
+            rows = self._as_dicts(chunk)
+            cursor = GridCursor(cursor.page, chunk["next"])
+            emitted += len(rows)
+            if rows:
+                yield rows, cursor
+            if not chunk["finished"]:
+                continue
+            if chunk.get("covers_pages") or not self._turn_page(driver):
+                self.finished = True
+                return
+            cursor = GridCursor(cursor.page + 1, 0)
+
+    def rows(self, driver, cursor=None):
+        """Yield row dicts one at a time"""
+        for rows, _ in self.chunks(driver, cursor):
+            yield from rows
+
+    def _read(self, driver, cursor: GridCursor, count: int) -> dict:
+        for attempt in range(self.retries + 1):
+            try:
+                with span("Read grid rows", start=cursor.row) as current:
+                    chunk = driver.execute_async_script(READ_SCRIPT, cursor.row, count, int(self.load_wait * 1000))
+                    if chunk.get("error"):
+                        raise JavascriptException(chunk["error"])
+                    current.set(rows=len(chunk["rows"]), source=chunk["source"])
+                if chunk["rows"] or chunk["finished"]:
+                    return chunk
+                error = "no rows loaded"
+            except READ_ERRORS as e:
+                error = f"{type(e).__name__}: {str(e).strip()}"
+            if attempt < self.retries:
+                delay = backoff_delay(attempt)
+                print(f"  🔁 Re-reading grid at {cursor} in {delay:.1f}s ({attempt + 1}/{self.retries}): {error}")
+                time.sleep(delay)
+        raise GridExtractionError(f"Could not read grid rows: {error}", cursor)
+
+    def _as_dicts(self, chunk: dict) -> list:
+        columns = chunk.get("columns")
+        if columns is None:
+            return chunk["rows"]  # row objects straight from the row model
+        if self.columns is None:
+            self.columns = _unique(columns)
+        return [dict(zip(self.columns, row)) for row in chunk["rows"]]
+
+    def _turn_page(self, driver) -> bool:
+        """Click "next page" if there is an enabled one and wait for the new page's rows"""
+        if self.next_page is None:
+            return False
+        try:
+            button = driver.find_element(*self.next_page)
+        except NoSuchElementException:
+            return False
+        disabled = (button.get_attribute("disabled") is not None
+                    or button.get_attribute("aria-disabled") == "true"
+                    or "disabled" in (button.get_attribute("class") or ""))
+        if disabled:
+            return False
+        before = driver.execute_script(FIRST_ROW_SCRIPT)
+        with span("Next grid page"):
+            driver.execute_script("arguments[0].click();", button)
+            ready = [network_idle(), grid_ready()]
+            WebDriverWait(driver, GRID_PAGE_TIMEOUT, poll_frequency=0.2).until(
+                lambda d: d.execute_script(FIRST_ROW_SCRIPT) != before and all(c(d) for c in ready)
+            )
+        return True
+
+
+def _unique(columns: list) -> list:
+    """Column headers made unique, so duplicate header texts do not overwrite each other"""
+    seen = {}
+    unique = []
+    for name in columns:
+        name = str(name)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique.append(name if count == 0 else f"{name} ({count + 1})")
+    return unique
@@ -0,0 +1,496 @@
+# scrapers/smartscout/api_client.py
+#
+# Direct data-API export mode. The ag-grid tables are filled from JSON calls
+# made with the logged-in session; instead of driving the grid and clicking
+# "Export", we learn those calls once from a real browser (a fetch/XHR hook
+# records them), then replay them over a pooled HTTP session with the
+# filters applied in the request body. Templates are learned per account and
+# stored without credentials; those stay in memory only.
+import os
+import re
+import csv
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import session_cache
+from .driver_pool import get_driver_pool, credentials_digest
+from ..base_scraper import BaseScraper, run_steps
+from ..telemetry import span
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+TEMPLATES_PATH = PROJECT_ROOT / "data" / "api_templates.json"
+
+# Point replayed calls at another host, e.g. a local stand-in server
+API_URL_OVERRIDE = os.getenv("SMARTSCOUT_API_URL")
+API_PAGE_SIZE = int(os.getenv("SMARTSCOUT_API_PAGE_SIZE", "1000"))
+API_MAX_ROWS = int(os.getenv("SMARTSCOUT_API_MAX_ROWS", "100000"))
+API_TIMEOUT = int(os.getenv("SMARTSCOUT_API_TIMEOUT", "60"))
+
+# Row fields the UI filters act on (matched case-insensitively, ignoring punctuation)
+NICHE_FILTER_FIELD = os.getenv("SMARTSCOUT_NICHE_FILTER_FIELD", "subcategory")
+RANK_FILTER_FIELD = os.getenv("SMARTSCOUT_RANK_FILTER_FIELD", "latestrank")
+
+# Row field each flow's UI filter acts on. Both flows learn their call with the
+# search applied (Rank Maker's ASIN, Niche Finder's Subcategory filter text), so
+# replays send the search to the server instead of paging the whole grid
+FLOWS = {
+    "niche_finder": {"filter_field": NICHE_FILTER_FIELD},
+    "rank_maker": {"filter_field": RANK_FILTER_FIELD},
+}
+
+# Headers never persisted to disk or replayed verbatim
+VOLATILE_HEADERS = {"cookie", "content-length", "host", "connection", "accept-encoding"}
+SECRET_HEADERS = {"authorization", "x-auth-token", "x-access-token"}
+# Body and query fields holding credentials, also kept out of saved templates
+SECRET_FIELD_RE = re.compile(r"(token|secret|passw(or)?d|api_?key|authorization|session_?id)$", re.IGNORECASE)
+
+CAPTURE_SCRIPT = """
+(function() {
+    if (window.__scraperCapture) return;
+    const captured = window.__scraperCapture = [];
+    function record(url, method, headers, body, status, text) {
+        if (!text || captured.length >= 200) return;
+        const head = text.trimStart()[0];
+        if (head !== '{' && head !== '[') return;
+        captured.push({
+            url: new URL(url, location.href).href, method: (method || 'GET').toUpperCase(),
+            headers: headers, body: typeof body === 'string' ? body : null, status: status, text: text
+        });
+    }
+    const open = XMLHttpRequest.prototype.open;
+    const setHeader = XMLHttpRequest.prototype.setRequestHeader;
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.open = function(method, url) {
+        this.__capture = {method: method, url: url, headers: {}};
+        return open.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.setRequestHeader = function(name, value) {
+        if (this.__capture) this.__capture.headers[name] = value;
+        return setHeader.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.send = function(body) {
+        const c = this.__capture;
+        if (c) this.addEventListener('load', () => {
+            try {
+                const text = this.responseType === 'json' ? JSON.stringify(this.response)
+                    : (this.responseType === '' || this.responseType === 'text') ? this.responseText : null;
+                record(c.url, c.method, c.headers, body, this.status, text);
+            } catch (e) {}
+        });
+        return send.apply(this, arguments);
+    };
+    const origFetch = window.fetch;
+    if (origFetch) window.fetch = function(input, init) {
+        const req = input instanceof Request ? input : null;
+        const url = req ? req.url : String(input);
+        const method = (init && init.method) || (req && req.method) || 'GET';
+        const headers = {};
+        new Headers((init && init.headers) || (req && req.headers) || {}).forEach((v, k) => headers[k] = v);
+        const body = init && init.body;
+        return origFetch.apply(this, arguments).then(resp => {
+            resp.clone().text().then(t => record(url, method, headers, body, resp.status, t)).catch(() => {});
+            return resp;
+        });
+    };
+})();
+"""
+
+
+class SessionExpired(Exception):
+    """The replayed call was rejected; the browser session must be refreshed"""
+
+
+# --- Templates: the learned grid request per account and flow ---
+
+_templates_lock = threading.Lock()
+_secrets = {}        # (credentials digest, flow) -> secrets stripped from its template, memory only
+_http_sessions = {}  # credentials digest -> requests.Session
+_http_lock = threading.Lock()
+
+
+def load_template(flow: str, digest: str):
+    with _templates_lock:
+        try:
+            with open(TEMPLATES_PATH) as f:
+                return json.load(f).get(digest, {}).get(flow)
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            return None
+
+
+def save_template(flow: str, digest: str, template: dict):
+    """Persist an account's template (without secrets) so its later jobs can skip the browser"""
+    with _templates_lock:
+        try:
+            with open(TEMPLATES_PATH) as f:
+                templates = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            templates = {}
+        # Files from before templates were per account hold flows at the top level
+        templates = {k: v for k, v in templates.items() if k not in FLOWS}
+        templates.setdefault(digest, {})[flow] = template
+        TEMPLATES_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = TEMPLATES_PATH.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(templates, f, indent=2)
+        os.replace(tmp_path, TEMPLATES_PATH)
+
+
+def strip_secrets(value, path=()):
+    """Parsed JSON without its secret fields, plus the removed fields as (path, value) pairs"""
+    if isinstance(value, dict):
+        clean, removed = {}, []
+        for key, item in value.items():
+            if SECRET_FIELD_RE.search(str(key)) and not isinstance(item, (dict, list)):
+                removed.append((path + (key,), item))
+            else:
+                clean[key], found = strip_secrets(item, path + (key,))
+                removed += found
+        return clean, removed
+    if isinstance(value, list):
+        clean, removed = [], []
+        for index, item in enumerate(value):
+            item, found = strip_secrets(item, path + (index,))
+            clean.append(item)
+            removed += found
+        return clean, removed
+    return value, []
+
+
+def restore_secrets(value, removed: list):
+    """Put fields taken out by strip_secrets back into a parsed JSON body"""
+    for path, secret in removed:
+        try:
+            target = value
+            for key in path[:-1]:
+                target = target[key]
+            target[path[-1]] = secret
+        except (KeyError, IndexError, TypeError):
+            continue
+    return value
+
+
+def replace_search(value, old: str, new: str):
+    """Parsed JSON with every string equal to `old` (the search it was learned with) set to `new`"""
+    if isinstance(value, dict):
+        return {k: replace_search(v, old, new) for k, v in value.items()}
+    if isinstance(value, list):
+        return [replace_search(v, old, new) for v in value]
+    return new if value == old else value
+
+
+def _split_url(url: str):
+    """URL without secret query parameters, and the removed parameters"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    removed = [(k, v) for k, v in query if SECRET_FIELD_RE.search(k)]
+    kept = [(k, v) for k, v in query if not SECRET_FIELD_RE.search(k)]
+    return urlunsplit(parts._replace(query=urlencode(kept))), removed
+
+
+def _replay_url(url: str, old: str, new: str, removed: list) -> str:
+    """Template URL with the search swapped in path segments and query values, and its secrets restored"""
+    parts = urlsplit(url)
+    path = parts.path
+    if old and new is not None:
+        path = "/".join(new if segment == old else segment for segment in path.split("/"))
+    query = [(k, new if old and new is not None and v == old else v)
+             for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(path=path, query=urlencode(query + removed)))
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def find_field(rows: list, wanted: str):
+    """Actual key in `rows` whose normalized name contains `wanted`"""
+    wanted = _normalize(wanted)
+    for row in rows[:20]:
+        for key in row:
+            if wanted in _normalize(key):
+                return key
+    return None
+
+
+def extract_rows(payload):
+    """Largest list of row objects in a JSON payload (ag-grid responses nest it differently)"""
+    best = []
+    stack = [(payload, 0)]
+    while stack:
+        value, depth = stack.pop()
+        if isinstance(value, list):
+            if value and all(isinstance(item, dict) for item in value[:50]) and len(value) > len(best):
+                best = value
+        elif isinstance(value, dict) and depth < 3:
+            stack.extend((v, depth + 1) for v in value.values())
+    return best
+
+
+def pick_grid_call(calls: list, must_contain: str = None):
+    """The captured call that returned the grid rows"""
+    best, best_rows = None, -1
+    for call in calls:
+        if call.get("status") != 200:
+            continue
+        if must_contain and must_contain not in call["url"] and must_contain not in (call.get("body") or ""):
+            continue
+        try:
+            rows = extract_rows(json.loads(call["text"]))
+        except ValueError:
+            continue
+        if len(rows) > best_rows:
+            best, best_rows = call, len(rows)
+    return best
+
+
+# --- Capture: learn the grid call from a real browser ---
+
+def capture_grid_call(driver, steps: list, flow: str, digest: str, must_contain: str = None,
+                      on_step=None) -> dict:
+    """Run `steps` with the fetch/XHR hook installed and turn the grid call into a template"""
+    script = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": CAPTURE_SCRIPT})
+    try:
+        with span("Capture grid call"):
+            run_steps(driver, steps, on_step)
+            calls = driver.execute_script("return window.__scraperCapture || [];")
+    finally:
+        driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script["identifier"]})
+
+    call = pick_grid_call(calls, must_contain)
+    if call is None:
+        raise Exception(f"Could not identify the {flow} data call in {len(calls)} captured requests")
+
+    headers = {k: v for k, v in call["headers"].items() if k.lower() not in VOLATILE_HEADERS}
+    secret_headers = {k: v for k, v in headers.items() if k.lower() in SECRET_HEADERS}
+    url, secret_query = _split_url(call["url"])
+    body, secret_body = call.get("body"), []
+    try:
+        body_json = json.loads(body) if body else None
+    except ValueError:
+        body_json = None
+    if body_json is not None:
+        body_json, secret_body = strip_secrets(body_json)
+    template = {
+        "url": url,
+        "method": call["method"],
+        "headers": {k: v for k, v in headers.items() if k not in secret_headers},
+        # Non-JSON bodies cannot be searched for secrets, so they are not persisted
+        "body": body_json,
+        "search_value": must_contain,
+        "filter_field": find_field(extract_rows(json.loads(call["text"])), FLOWS[flow]["filter_field"]),
+        "captured_at": datetime.now().isoformat(),
+    }
+    if body and body_json is None:
+        template["raw_body"] = True
+    save_template(flow, digest, template)
+
+    _secrets[(digest, flow)] = {"headers": secret_headers, "query": secret_query, "body": secret_body,
+                                "raw_body": body if body_json is None else None}
+    session = _http_session(digest)
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+    print(f"  📡 Learned {flow} data call: {call['method']} {call['url']}")
+    return template
+
+
+# --- Replay: call the data endpoint directly ---
+
+def _http_session(digest: str) -> requests.Session:
+    """Pooled keep-alive HTTP session per account"""
+    with _http_lock:
+        session = _http_sessions.get(digest)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_sessions[digest] = session
+        return session
+
+
+def _target_url(url: str) -> str:
+    if not API_URL_OVERRIDE:
+        return url
+    base = urlsplit(API_URL_OVERRIDE)
+    parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+
+def fetch_rows(template: dict, session: requests.Session, secrets: dict,
+               search_value: str = None, filter_model: dict = None):
+    """
+    Replay the grid call, paging through ag-grid's startRow/endRow window when
+    present. Returns the rows and whether API_MAX_ROWS cut them short.
+    """
+    captured_value = template.get("search_value")
+    url = _replay_url(template["url"], captured_value, search_value, secrets.get("query", []))
+    body = secrets.get("raw_body")
+    body_json = None
+    if template.get("raw_body"):
+        if body is None:
+            # Only the browser that learned the call has its body
+            raise SessionExpired("request body of the learned call is not in memory")
+        if captured_value and search_value is not None:
+            body = body.replace(captured_value, search_value)
+    elif template.get("body") is not None:
+        body_json = restore_secrets(json.loads(json.dumps(template["body"])), secrets.get("body", []))
+        if captured_value and search_value is not None:
+            body_json = replace_search(body_json, captured_value, search_value)
+
+    if isinstance(body_json, dict) and filter_model:
+        if not isinstance(body_json.get("filterModel"), dict):
+            body_json["filterModel"] = {}
+        body_json["filterModel"].update(filter_model)
+    paged = isinstance(body_json, dict) and "startRow" in body_json and "endRow" in body_json
+
+    rows = []
+    while True:
+        if paged:
+            body_json["startRow"] = len(rows)
+            body_json["endRow"] = len(rows) + API_PAGE_SIZE
+        request_kwargs = {"json": body_json} if body_json is not None else {"data": body}
+        response = session.request(
+            template["method"], _target_url(url),
+            headers={**template.get("headers", {}), **secrets.get("headers", {})},
+            timeout=API_TIMEOUT, **request_kwargs,
+        )
+        if response.status_code in (401, 403):
+            raise SessionExpired(f"{response.status_code} from {template['url']}")
+        response.raise_for_status()
+
+        page = extract_rows(response.json())
+        rows.extend(page)
+        if not paged or len(page) < API_PAGE_SIZE:
+            return rows, False
+        if len(rows) >= API_MAX_ROWS:
+            return rows[:API_MAX_ROWS], True
+
+
+def filter_model(flow: str, field: str, search_text: str, max_rank: int = None):
+    """ag-grid filter model equivalent to the UI filter the browser flow sets"""
+    if not field:
+        return None
+    if flow == "rank_maker":
+        if max_rank is None:
+            return None
+        return {field: {"filterType": "number", "type": "lessThanOrEqual", "filter": max_rank}}
+    if not search_text:
+        return None
+    return {field: {"filterType": "text", "type": "contains", "filter": search_text}}
+
+
+def apply_filter(flow: str, field: str, rows: list, search_text: str, max_rank: int = None) -> list:
+    """Same predicate applied locally, in case the server ignored the filter model"""
+    if not field:
+        return rows
+    if flow == "rank_maker":
+        if max_rank is None:
+            return rows
+
+        def within(row):
+            try:
+                return float(row.get(field)) <= max_rank
+            except (TypeError, ValueError):
+                return False
+
+        return [r for r in rows if within(r)]
+    needle = (search_text or "").lower()
+    return [r for r in rows if needle in str(r.get(field, "")).lower()]
+
+
+def write_csv(rows: list, path: str):
+    """Write rows with the union of their keys as columns, in first-seen order"""
+    columns = []
+    seen = set()
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({
+                k: json.dumps(v) if isinstance(v, (dict, list)) else v
+                for k, v in row.items()
+            })
+
+
+def export_via_api(flow: str, capture_steps: list, username: str, password: str,
+                   search_text: str, max_rank: int = None, download_path: str = None,
+                   pool=None, on_step=None, profile=None) -> dict:
+    """
+    Export a grid's rows without the UI: replay the learned data call, learning
+    (or refreshing) it through a pooled browser only when needed.
+    """
+    if not username or not password:
+        raise ValueError("Username and password required for login")
+
+    digest = credentials_digest(username, password)
+    session = _http_session(digest)
+    if not session.cookies:
+        # Reuse a saved browser login if there is one
+        for cookie in session_cache.load_cookies(username, password) or []:
+            session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    template = load_template(flow, digest)
+    rows = None
+    truncated = False
+    for attempt in range(2):
+        if template is None or attempt == 1:
+            print(f"🌐 Learning {flow} data call through the browser...")
+            pool = pool or get_driver_pool()
+            with pool.lease(username, password, profile=profile) as driver:
+                template = capture_grid_call(
+                    driver, capture_steps, flow, digest,
+                    must_contain=search_text or None,
+                    on_step=on_step,
+                )
+        if on_step:
+            on_step("Calling data API")
+        try:
+            field = template.get("filter_field")
+            with span("Fetch rows") as current:
+                rows, truncated = fetch_rows(
+                    template, session, _secrets.get((digest, flow), {}),
+                    search_value=search_text,
+                    filter_model=filter_model(flow, field, search_text, max_rank),
+                )
+                current.set(rows=len(rows), truncated=truncated)
+            rows = apply_filter(flow, field, rows, search_text, max_rank)
+            break
+        except SessionExpired as e:
+            print(f"  ⚠️ API session rejected ({e}), refreshing through the browser")
+            session.cookies.clear()
+
+    if rows is None:
+        raise Exception(f"{flow} API export failed after refreshing the session")
+
+    scraper = BaseScraper(download_path)
+    file_path, file_name = scraper.output_path(flow, search_text, ".csv")
+    write_csv(rows, file_path)
+    print(f"  ✅ Wrote {len(rows)} rows to: {file_path}")
+    message = f"API export completed for '{search_text}'"
+    if truncated:
+        print(f"  ⚠️ Stopped at SMARTSCOUT_API_MAX_ROWS={API_MAX_ROWS}; the export is incomplete")
+        message += f" (truncated at {API_MAX_ROWS} rows)"
+
+    return {
+        "status": "success",
+        "message": message,
+        "file_path": file_path,
+        "file_name": file_name,
+        "file_size": os.path.getsize(file_path),
+        "row_count": len(rows),
+        "truncated": truncated,
+        "mode": "api",
+        "timestamp": datetime.now().isoformat(),
+    }
@@ -1,43 +1,58 @@
 # scrapper/smartscout/auth.py
 import os
-import pickle
 from pathlib import Path
+from urllib.parse import urlsplit
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from . import session_cache
+from ..base_scraper import download_prefs, resolve_chromedriver
+from ..browser_profiles import get_profile, apply_options, apply_blocking
+from ..browser_supervisor import SUPERVISOR
+from ..telemetry import span
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
-COOKIES_PATH = PROJECT_ROOT / "data" / "smartscout_cookies.pkl"
 
-def get_chrome_driver(headless=True, download_dir=None):
-    """Create a Chrome driver instance - SIMPLIFIED"""
+# Overridable so the scrapers can run against a local stand-in (see benchmarks/)
+BASE_URL = os.getenv("SMARTSCOUT_BASE_URL", "https://app.smartscout.com").rstrip("/")
+COOKIE_DOMAIN = urlsplit(BASE_URL).hostname
+SIGNIN_URL = f"{BASE_URL}/sessions/signin"
+HOME_URL = f"{BASE_URL}/app/home"
+
+# Only rendered for a logged-in user; used to confirm a restored session
+APP_SHELL_XPATH = "//mat-icon[@data-mat-icon-name='keyword-tools']"
+
+class LoginFailed(Exception):
+    """The sign-in form did not lead to the app (wrong credentials, throttling or a changed page)"""
+
+def get_chrome_driver(headless=True, download_dir=None, profile=None):
+    """Create a Chrome driver instance; headless mode, window and blocking come from the profile"""
+    profile = get_profile(profile)
     options = Options()
     
-    # Force visible for now
-    headless = False
-    
-    if headless:
-        options.add_argument("--headless")
-    
-    # MINIMAL options - let Chrome handle downloads naturally
-    options.add_argument("--start-maximized")
+    # The standard profile stays visible for now; "performance" runs headless
+    apply_options(options, profile)
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    if download_dir:
+        options.add_experimental_option("prefs", download_prefs(download_dir))
     
-    return webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()), 
+    driver = webdriver.Chrome(
+        service=Service(resolve_chromedriver(), env=SUPERVISOR.service_env()),
         options=options
     )
+    SUPERVISOR.track(driver)
+    apply_blocking(driver, profile)
+    return driver
 
 def login_and_save_cookies(driver, username, password):
     """Perform fresh login and save cookies for next time."""
     wait = WebDriverWait(driver, 20)
-    driver.get("https://app.smartscout.com/sessions/signin")
+    driver.get(SIGNIN_URL)
     
     wait.until(EC.presence_of_element_located((By.ID, "username")))
     
@@ -47,22 +62,84 @@ def login_and_save_cookies(driver, username, password):
     
     wait.until(EC.url_contains("/app/home"))
     
-    COOKIES_PATH.parent.mkdir(exist_ok=True)
-    pickle.dump(driver.get_cookies(), open(COOKIES_PATH, "wb"))
+    session_cache.save_cookies(username, password, driver.get_cookies())
+
+def session_alive(driver, timeout=10):
+    """Load /app/home and tell whether it shows the app shell rather than bouncing to sign-in."""
+    driver.get(HOME_URL)
+    
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: "/sessions/signin" in d.current_url
+            or d.find_elements(By.XPATH, APP_SHELL_XPATH)
+        )
+    except Exception:
+        pass
+    
+    return "/app/home" in driver.current_url and bool(driver.find_elements(By.XPATH, APP_SHELL_XPATH))
+
+def app_cookies(driver):
+    """The browser's cookies for the app's domain, from any page (CDP sees every domain)"""
+    cookies = driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+    return [c for c in cookies if COOKIE_DOMAIN == c["domain"].lstrip(".")
+            or COOKIE_DOMAIN.endswith("." + c["domain"].lstrip("."))]
+
+def restore_session(driver, username, password, timeout=10):
+    """Inject saved cookies and confirm /app/home loads without bouncing to sign-in."""
+    cookies = session_cache.load_cookies(username, password)
+    if not cookies:
+        return False
+    
+    # CDP accepts cookies for any domain, so no extra page load is needed first
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setCookies", {"cookies": [_to_cdp_cookie(c) for c in cookies]})
+    if session_alive(driver, timeout):
+        return True
+    
+    session_cache.invalidate(username)
+    return False
+
+def _to_cdp_cookie(cookie):
+    """Convert a Selenium cookie dict into a CDP Network.CookieParam"""
+    param = {
+        "name": cookie["name"],
+        "value": cookie["value"],
+        "domain": cookie.get("domain", COOKIE_DOMAIN),
+        "path": cookie.get("path", "/"),
+        "secure": cookie.get("secure", False),
+        "httpOnly": cookie.get("httpOnly", False),
+    }
+    if "expiry" in cookie:
+        param["expires"] = cookie["expiry"]
+    if cookie.get("sameSite") in ("Strict", "Lax", "None"):
+        param["sameSite"] = cookie["sameSite"]
+    return param
 
-def get_authenticated_driver(headless=False, username=None, password=None, download_dir=None):
+def get_authenticated_driver(headless=False, username=None, password=None, download_dir=None, profile=None):
     """Return a driver that is already logged in."""
-    driver = get_chrome_driver(headless=headless, download_dir=download_dir)
+    with span("Start driver", profile=get_profile(profile).name):
+        driver = get_chrome_driver(headless=headless, download_dir=download_dir, profile=profile)
     
     if not username or not password:
-        driver.quit()
+        SUPERVISOR.quit(driver)
         raise ValueError("Username and password required for login")
     
-    print("🔑 Performing fresh login...")
     try:
-        login_and_save_cookies(driver, username, password)
+        with span("Restore session") as current:
+            restored = restore_session(driver, username, password)
+            current.set(restored=restored)
+        if restored:
+            print("🍪 Reused saved session")
+            return driver
+        
+        print("🔑 Performing fresh login...")
+        with span("Login"):
+            try:
+                login_and_save_cookies(driver, username, password)
+            except Exception as e:
+                raise LoginFailed(f"Login failed for {username}: {e}") from e
     except Exception as e:
-        driver.quit()
+        SUPERVISOR.quit(driver)
         raise e
     
     return driver
\ No newline at end of file
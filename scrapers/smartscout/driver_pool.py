@@ -0,0 +1,430 @@
+# scrapers/smartscout/driver_pool.py
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from .auth import get_authenticated_driver, session_alive, app_cookies, SIGNIN_URL
+from .session_cache import credentials_digest
+from ..browser_profiles import get_profile, apply_blocking
+from ..browser_supervisor import SUPERVISOR
+from ..telemetry import span
+from ..tabs import TabbedBrowser
+from ..errors import aborted
+
+POOL_SIZE = int(os.getenv("SMARTSCOUT_POOL_SIZE", "3"))
+# Browsers across all accounts; when full, the least recently used idle browser of any account makes room
+POOL_MAX_BROWSERS = int(os.getenv("SMARTSCOUT_POOL_MAX_BROWSERS", str(POOL_SIZE * 2)))
+# An idle browser whose login was last confirmed longer ago is checked on the app before it is leased
+POOL_SESSION_CHECK_INTERVAL = int(os.getenv("SMARTSCOUT_POOL_SESSION_CHECK_INTERVAL", "300"))
+# Login cookies expiring sooner than this count as expired
+SESSION_EXPIRY_MARGIN = 60
+POOL_IDLE_TIMEOUT = int(os.getenv("SMARTSCOUT_POOL_IDLE_TIMEOUT", "900"))
+POOL_MAX_USES = int(os.getenv("SMARTSCOUT_POOL_MAX_USES", "25"))
+POOL_ACQUIRE_TIMEOUT = int(os.getenv("SMARTSCOUT_POOL_ACQUIRE_TIMEOUT", "600"))
+POOL_REAP_INTERVAL = 60
+# Jobs sharing one browser, each in its own tab; a tab costs far less memory than a Chrome process
+TABS_PER_BROWSER = int(os.getenv("SMARTSCOUT_TABS_PER_BROWSER", "1"))
+
+# Browsers started and logged in at startup, for the account named here
+PREWARM_BROWSERS = int(os.getenv("SMARTSCOUT_PREWARM_BROWSERS", "0"))
+PREWARM_USERNAME = os.getenv("SMARTSCOUT_PREWARM_USERNAME")
+PREWARM_PASSWORD = os.getenv("SMARTSCOUT_PREWARM_PASSWORD")
+PREWARM_PROFILE = os.getenv("SMARTSCOUT_PREWARM_PROFILE")  # defaults to BROWSER_PROFILE
+
+
+class PooledDriver:
+    """A logged-in browser owned by the pool, plus its usage bookkeeping"""
+
+    def __init__(self, driver, username: str, digest: str, profile=None):
+        self.driver = driver
+        self.username = username
+        self.digest = digest
+        self.profile = get_profile(profile)
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.uses = 0
+        self.leases = 0        # jobs currently using the browser (one per tab)
+        self.tabbed = None     # TabbedBrowser while leased in tab mode
+        self.broken = False    # a job failed in it; retired once its other tabs are done
+        self.verified_at = self.created_at  # last time the login was known to work
+        self.session_cookies = set()        # names of the app cookies the login came with
+
+
+class DriverPool:
+    """
+    Keeps up to `size` authenticated Chrome sessions per SmartScout username,
+    and at most `max_browsers` across all of them.
+
+    Jobs lease a browser with `lease()`; on return it is reset to a blank page
+    and kept warm for the next job instead of being quit. Browsers that are
+    unhealthy, idle longer than `idle_timeout` seconds, used `max_uses`
+    times or over the supervisor's memory or lifetime limit are retired.
+
+    With `tabs_per_browser` > 1 each lease gets a tab instead: idle browsers
+    are used first, then a leased browser with a free tab, and only then is
+    another browser started.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, idle_timeout: int = POOL_IDLE_TIMEOUT,
+                 max_uses: int = POOL_MAX_USES, driver_factory=None, tabs_per_browser: int = TABS_PER_BROWSER,
+                 max_browsers: int = POOL_MAX_BROWSERS):
+        self.size = max(1, size)
+        self.max_browsers = max(1, max_browsers)
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self.tabs_per_browser = max(1, tabs_per_browser)
+        self.driver_factory = driver_factory or get_authenticated_driver
+        self._idle = {}      # username -> [PooledDriver]
+        self._busy = {}      # username -> [PooledDriver] currently leased
+        self._counts = {}    # username -> live browsers (idle + leased)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._reaper = None
+
+    # --- leasing ---
+
+    def acquire(self, username: str, password: str, timeout: int = POOL_ACQUIRE_TIMEOUT,
+                profile=None) -> PooledDriver:
+        """Lease a healthy logged-in browser for `username` with the given profile, starting one if needed"""
+        with span("Lease browser") as current:
+            entry = self._acquire(username, password, timeout, profile)
+            current.set(reused=entry.uses > 1)
+            return entry
+
+    def _acquire(self, username: str, password: str, timeout: int, profile) -> PooledDriver:
+        if not username or not password:
+            raise ValueError("Username and password required for login")
+
+        digest = credentials_digest(username, password)
+        profile = get_profile(profile)
+        deadline = time.time() + timeout
+        self._ensure_reaper()
+
+        while True:
+            victim = None
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+
+                # Only sessions opened with the same credentials are reused, so a
+                # different password for the account always goes through a real login.
+                # Browsers are only shared between endpoints that use the same profile.
+                idle = self._idle.get(username, [])
+                entry = next(
+                    (e for e in reversed(idle) if e.digest == digest and e.profile == profile), None
+                )
+                shared = self._shareable_locked(username, digest, profile) if entry is None else None
+                if entry is not None:
+                    idle.remove(entry)
+                elif shared is not None:
+                    shared.leases += 1
+                    shared.uses += 1
+                    shared.last_used = time.time()
+                    return shared
+                elif self._counts.get(username, 0) < self.size:
+                    if sum(self._counts.values()) < self.max_browsers:
+                        self._counts[username] = self._counts.get(username, 0) + 1
+                        entry = False  # reserved a slot, start a browser below
+                    else:
+                        victim = self._least_recently_used_idle_locked()
+                        if victim is None:
+                            remaining = deadline - time.time()
+                            if remaining <= 0:
+                                raise TimeoutError(
+                                    f"No browser available for {username} within {timeout}s "
+                                    f"({self.max_browsers} browsers running across accounts)"
+                                )
+                            self._cond.wait(remaining)
+                            continue
+                elif idle:
+                    victim = idle.pop(0)  # make room by retiring a session for other credentials or profile
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No browser available for {username} within {timeout}s")
+                    self._cond.wait(remaining)
+                    continue
+
+            if victim is not None:
+                self._retire(victim)
+                continue
+
+            if entry is False:
+                try:
+                    driver = self.driver_factory(
+                        headless=False, username=username, password=password, profile=profile
+                    )
+                except Exception:
+                    self._forget(username)
+                    raise
+                entry = PooledDriver(driver, username, digest, profile)
+                entry.session_cookies = self._cookie_names(entry)
+                print(f"🌡️ Started warm {profile.name} browser for {username}")
+            elif not self._is_healthy(entry):
+                print(f"  ⚠️ Discarding unhealthy browser for {username}")
+                self._retire(entry)
+                continue
+
+            entry.uses += 1
+            entry.last_used = time.time()
+            with self._cond:
+                entry.leases = 1
+                self._busy.setdefault(username, []).append(entry)
+            return entry
+
+    def release(self, entry: PooledDriver, discard: bool = False, tab=None):
+        """Return a leased browser (or one tab of it); it is reset and kept warm unless retired"""
+        entry.last_used = time.time()
+        if tab is not None:
+            try:
+                entry.tabbed.close(tab)
+            except Exception as e:
+                print(f"  ⚠️ Could not close tab for {entry.username}: {e}")
+                discard = True
+        with self._cond:
+            entry.leases -= 1
+            entry.broken = entry.broken or discard
+            if entry.leases > 0:
+                # Other jobs are still running in its tabs
+                self._cond.notify_all()
+                return
+            busy = self._busy.get(entry.username, [])
+            if entry in busy:
+                busy.remove(entry)
+            discard, entry.broken, entry.tabbed = entry.broken, False, None
+
+        recycle = SUPERVISOR.over_limit(entry.driver)
+        if recycle:
+            print(f"  ♻️ Recycling browser for {entry.username}: over its {recycle} limit")
+        if discard or recycle or self._closed or entry.uses >= self.max_uses or not self._reset(entry):
+            self._retire(entry, recycle)
+            return
+        # The job got through, so the login worked until now
+        entry.verified_at = time.time()
+
+        with self._cond:
+            self._idle.setdefault(entry.username, []).append(entry)
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, username: str, password: str, profile=None):
+        """
+        Context manager yielding a logged-in driver (or tab). Failed jobs discard
+        their browser; cancelled ones hand it back for the next job.
+        """
+        entry = self.acquire(username, password, profile=profile)
+        tab = None
+        if self.tabs_per_browser > 1:
+            try:
+                tab = self._open_tab(entry)
+            except BaseException:
+                self.release(entry, discard=True)
+                raise
+        try:
+            yield tab or entry.driver
+        except BaseException as e:
+            self.release(entry, discard=not aborted(e), tab=tab)
+            raise
+        else:
+            self.release(entry, tab=tab)
+
+    def prewarm(self, username: str, password: str, count: int, profile=None) -> int:
+        """Start up to `count` browsers for the account in parallel and leave them idle; returns how many"""
+        count = min(count, self.size)
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix="prewarm") as executor:
+            futures = [
+                executor.submit(self.acquire, username, password, profile=profile) for _ in range(count)
+            ]
+        warmed = 0
+        for future in futures:
+            try:
+                self.release(future.result())
+                warmed += 1
+            except Exception as e:
+                print(f"  ⚠️ Prewarming a browser for {username} failed: {e}")
+        print(f"🔥 Prewarmed {warmed}/{count} browser(s) for {username} in {time.time() - started:.1f}s")
+        return warmed
+
+    # --- maintenance ---
+
+    def evict_idle(self):
+        """Quit browsers that have sat unused longer than the idle timeout or went over a supervisor limit"""
+        now = time.time()
+        expired = []
+        with self._cond:
+            for username, entries in self._idle.items():
+                keep = []
+                for entry in entries:
+                    recycle = SUPERVISOR.over_limit(entry.driver)
+                    if recycle or now - entry.last_used > self.idle_timeout:
+                        expired.append((entry, recycle))
+                    else:
+                        keep.append(entry)
+                self._idle[username] = keep
+
+        for entry, recycle in expired:
+            if recycle:
+                print(f"  ♻️ Recycling idle browser for {entry.username}: over its {recycle} limit")
+            else:
+                print(f"  💤 Evicting idle browser for {entry.username}")
+            self._retire(entry, recycle)
+
+    def close(self):
+        """Quit every idle browser and stop handing out new ones"""
+        with self._cond:
+            self._closed = True
+            entries = [e for entries in self._idle.values() for e in entries]
+            self._idle.clear()
+            self._cond.notify_all()
+
+        for entry in entries:
+            self._retire(entry)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                username: {
+                    "live": count,
+                    "idle": len(self._idle.get(username, [])),
+                    "tabs": sum(e.leases for e in self._busy.get(username, [])),
+                }
+                for username, count in self._counts.items() if count
+            }
+
+    # --- internals ---
+
+    def _shareable_locked(self, username: str, digest: str, profile):
+        """A leased browser with the same login and profile that has a free tab"""
+        if self.tabs_per_browser <= 1:
+            return None
+        candidates = [
+            e for e in self._busy.get(username, [])
+            if e.digest == digest and e.profile == profile and not e.broken and e.leases < self.tabs_per_browser
+            and not SUPERVISOR.over_limit(e.driver)
+        ]
+        # Fill the emptiest browser first, so tabs spread over the browsers already running
+        return min(candidates, key=lambda e: e.leases, default=None)
+
+    def _open_tab(self, entry: PooledDriver):
+        with self._cond:
+            if entry.tabbed is None:
+                entry.tabbed = TabbedBrowser(entry.driver, on_open=lambda tab: apply_blocking(tab, entry.profile))
+            tabbed = entry.tabbed
+        return tabbed.open()
+
+    def _least_recently_used_idle_locked(self):
+        """Take the idle browser, of any account, unused the longest"""
+        candidates = [e for entries in self._idle.values() for e in entries]
+        victim = min(candidates, key=lambda e: e.last_used, default=None)
+        if victim is not None:
+            self._idle[victim.username].remove(victim)
+        return victim
+
+    @staticmethod
+    def _cookie_names(entry: PooledDriver) -> set:
+        try:
+            return {c["name"] for c in app_cookies(entry.driver)}
+        except Exception:
+            return set()
+
+    def _cookies_current(self, entry: PooledDriver) -> bool:
+        """The login's app cookies are all still there and none is about to expire"""
+        try:
+            cookies = {c["name"]: c for c in app_cookies(entry.driver)}
+        except Exception:
+            return False
+        if not entry.session_cookies or not entry.session_cookies <= set(cookies):
+            return False
+        # CDP reports session cookies with expires -1
+        soon = time.time() + SESSION_EXPIRY_MARGIN
+        return all(cookies[name].get("expires", -1) <= 0 or cookies[name]["expires"] > soon
+                   for name in entry.session_cookies)
+
+    def _is_healthy(self, entry: PooledDriver) -> bool:
+        """
+        The browser answers and is still logged in. Its login cookies are checked
+        on every lease; the app itself is loaded (looking for its shell) when a
+        cookie went missing or expires soon, or the login was not confirmed
+        within the session check interval.
+        """
+        try:
+            handles = entry.driver.window_handles
+            if not handles or entry.driver.current_url.startswith(SIGNIN_URL):
+                return False
+            if self._cookies_current(entry) and time.time() - entry.verified_at < POOL_SESSION_CHECK_INTERVAL:
+                return True
+            with span("Check session"):
+                alive = session_alive(entry.driver)
+            if alive:
+                entry.verified_at = time.time()
+                entry.session_cookies = self._cookie_names(entry)
+            return alive
+        except Exception:
+            return False
+
+    def _reset(self, entry: PooledDriver) -> bool:
+        """Close extra tabs and park the remaining one on a blank page"""
+        driver = entry.driver
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            print(f"  ⚠️ Could not reset browser for {entry.username}: {e}")
+            return False
+
+    def _retire(self, entry: PooledDriver, recycled: str = None):
+        self._quit(entry, recycled)
+        self._forget(entry.username)
+
+    def _forget(self, username: str):
+        with self._cond:
+            self._counts[username] = max(0, self._counts.get(username, 0) - 1)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _quit(entry: PooledDriver, recycled: str = None):
+        # Bounded: a hung quit() ends with the browser's processes killed
+        SUPERVISOR.quit(entry.driver, recycled)
+
+    def _ensure_reaper(self):
+        if self._reaper is not None:
+            return
+        with self._cond:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, name="driver-pool-reaper", daemon=True)
+                self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._closed:
+            time.sleep(POOL_REAP_INTERVAL)
+            self.evict_idle()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def prewarm_from_env(pool: DriverPool) -> int:
+    """Prewarm SMARTSCOUT_PREWARM_BROWSERS browsers if an account is configured for it"""
+    if PREWARM_BROWSERS <= 0:
+        return 0
+    if not PREWARM_USERNAME or not PREWARM_PASSWORD:
+        print("⚠️ SMARTSCOUT_PREWARM_BROWSERS is set without SMARTSCOUT_PREWARM_USERNAME/PASSWORD; skipping prewarm")
+        return 0
+    return pool.prewarm(PREWARM_USERNAME, PREWARM_PASSWORD, PREWARM_BROWSERS, profile=PREWARM_PROFILE)
+
+
+def get_driver_pool() -> DriverPool:
+    """Process-wide pool shared by the SmartScout scrapers"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = DriverPool()
+        return _default_pool
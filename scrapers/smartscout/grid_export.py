@@ -0,0 +1,87 @@
+# scrapers/smartscout/grid_export.py
+#
+# Export of a SmartScout grid without the Export button: the flow's steps set
+# the page up, then the grid extractor reads the rows and they are appended to
+# the CSV chunk by chunk as they arrive.
+import os
+import csv
+import json
+from datetime import datetime
+
+from .driver_pool import get_driver_pool
+from ..base_scraper import BaseScraper, run_steps, FLOW_RESUME_ATTEMPTS
+from ..grid_extractor import GridExtractor, GridExtractionError, AG_GRID_NEXT_PAGE
+
+
+def _csv_value(value):
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+def run_grid_export(flow: str, steps: list, username: str, password: str, search_text: str = "",
+                    max_rows: int = None, cursor: str = None, next_page=AG_GRID_NEXT_PAGE,
+                    download_path: str = None, pool=None, on_step=None, profile=None) -> dict:
+    """
+    Run `steps` on a leased browser, then stream the grid's rows into a CSV.
+    If reading fails, the page is set up again and reading resumes at the
+    last cursor. With `cursor` the export starts where an earlier one stopped;
+    the result's `cursor` is set (and `truncated`) when `max_rows` cut the
+    export short.
+    """
+    if not username or not password:
+        raise ValueError("Username and password required for login")
+
+    scraper = BaseScraper(download_path)
+    file_path, file_name = scraper.output_path(flow, search_text, ".csv")
+    partial_path = file_path + ".part"
+
+    pool = pool or get_driver_pool()
+    if on_step:
+        on_step("Waiting for browser")
+    row_count = 0
+    last_cursor = cursor
+    try:
+        with pool.lease(username, password, profile=profile) as driver:
+            extractor = GridExtractor(next_page=next_page, max_rows=max_rows)
+            with open(partial_path, "w", newline="", encoding="utf-8") as f:
+                writer = None
+                for attempt in range(FLOW_RESUME_ATTEMPTS + 1):
+                    run_steps(driver, steps, on_step)
+                    if max_rows is not None:
+                        extractor.max_rows = max_rows - row_count
+                    try:
+                        for rows, last_cursor in extractor.chunks(driver, last_cursor):
+                            if writer is None:
+                                writer = csv.DictWriter(f, fieldnames=extractor.columns or list(rows[0]),
+                                                        extrasaction="ignore")
+                                writer.writeheader()
+                            writer.writerows({k: _csv_value(v) for k, v in row.items()} for row in rows)
+                            f.flush()
+                            row_count += len(rows)
+                            if on_step:
+                                on_step(f"Extracted {row_count} rows")
+                        break
+                    except GridExtractionError as e:
+                        if attempt == FLOW_RESUME_ATTEMPTS:
+                            raise
+                        last_cursor = e.cursor
+                        print(f"  ↩️ {e}; reloading the grid ({attempt + 1}/{FLOW_RESUME_ATTEMPTS})")
+                if writer is None and extractor.columns:
+                    csv.writer(f).writerow(extractor.columns)
+        os.replace(partial_path, file_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    print(f"  ✅ Extracted {row_count} rows to: {file_path}")
+
+    return {
+        "status": "success",
+        "message": f"Grid export completed for '{search_text or 'all'}'",
+        "file_path": file_path,
+        "file_name": file_name,
+        "file_size": os.path.getsize(file_path),
+        "row_count": row_count,
+        "cursor": None if extractor.finished else str(last_cursor),
+        "truncated": not extractor.finished,
+        "mode": "grid",
+        "timestamp": datetime.now().isoformat(),
+    }
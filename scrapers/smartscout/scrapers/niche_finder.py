@@ -1,184 +1,146 @@
 # scrapers/smartscout/scrapers/niche_finder.py
 import traceback
-import time
-import os
-import glob
-import shutil
 from datetime import datetime
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from ..auth import get_authenticated_driver  # Corrected relative import
+from ...base_scraper import (
+    BaseScraper, Step, run_steps, grid_ready, network_idle, row_count_stable, visible, input_value,
+    set_download_dir, remove_job_download_dir,
+)
+from ...circuit_breaker import check_circuit
+from ...download_capture import DownloadCapture
+from ..auth import BASE_URL
+from ..driver_pool import get_driver_pool
+from ...browser_profiles import profile_for
+from ...telemetry import traced
+from ..api_client import export_via_api
 
+ENDPOINT = "smartscout/niche-finder"
+# Plugin declaration, read by service/registry.py without importing this module
+SCRAPER = {
+    "name": "smartscout/niche-finder",
+    "summary": "Niche Finder subcategories matching a search",
+    "run": "run_niche_finder_export",
+    "params": {
+        "search_text": {"type": "str", "description": "Subcategory filter text"},
+        "mode": {"type": "str", "choices": ["browser", "api"], "default": "browser",
+                 "env": "SMARTSCOUT_EXPORT_MODE"},
+    },
+    "output": "csv",
+    "resources": ["browser", "account"],
+    "snapshots": True,
+}
+SUBCATEGORIES_URL = f"{BASE_URL}/app/subcategories"
+NICHE_FINDER_TAB = (By.XPATH, "//div[contains(@class, 'mat-tab-label-content') and contains(., 'Niche Finder')]")
+FILTERS_BUTTON = (By.XPATH, "//button[.//span[text()='Filters']]")
+SUBCATEGORY_GROUP = (By.XPATH, "//div[.//span[text()='Subcategory'] and contains(@class, 'ag-group-title-bar')]")
+FILTER_INPUT = (By.XPATH, "//input[contains(@class, 'ag-input-field-input') and @placeholder='Filter...']")
+EXCEL_SIDE_BUTTON = (By.XPATH, "//button[contains(@class, 'ag-side-button-button') and .//img[contains(@src, 'excel')]]")
+CSV_EXPORT_IMAGE = (By.XPATH, "//img[contains(@src, 'csv.ico') and @mattooltip='Export as CSV']")
 
-def setup_download_directory(download_path: str = None):
-    """Setup download directory and return path"""
-    if download_path is None:
-        # Use project downloads directory
-        download_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "downloads")
-    
-    os.makedirs(download_path, exist_ok=True)
-    return download_path
+# Steps after which the grid has loaded its filtered data (used to learn the API call)
+API_CAPTURE_STEPS = 5
 
 
-def get_latest_downloaded_file(download_dir: str, pattern: str = "*.csv", timeout: int = 20):
-    """Get the most recently downloaded CSV file with timeout"""
-    print(f"  Checking for files in: {download_dir}")
-    
-    # Get initial file count
-    files_before = set(glob.glob(os.path.join(download_dir, pattern)))
-    files_before = {f for f in files_before if not f.endswith('.crdownload')}
-    
-    start_time = time.time()
-    
-    while time.time() - start_time < timeout:
-        files_now = set(glob.glob(os.path.join(download_dir, pattern)))
-        files_now = {f for f in files_now if not f.endswith('.crdownload')}
-        
-        # Check if new file appeared
-        new_files = files_now - files_before
-        if new_files:
-            latest_file = max(new_files, key=os.path.getctime)
-            
-            # Verify file is complete (size not changing)
-            size1 = os.path.getsize(latest_file)
-            time.sleep(1)
-            size2 = os.path.getsize(latest_file)
-            
-            if size1 == size2 and size1 > 0:
-                return latest_file
-        
-        time.sleep(1)
-    
-    return None
+def click_unless_shown(target):
+    """Step action for a panel toggle: click only while `target` is hidden, as a second click would close it"""
+    def action(driver, element):
+        if not any(e.is_displayed() for e in driver.find_elements(*target)):
+            element.click()
+    return action
 
 
+def build_steps(search_text: str) -> list:
+    """
+    Niche Finder flow up to the CSV export click. The panel steps leave open
+    panels alone, so the flow can be resumed on a page an earlier export set up.
+    """
+    return [
+        Step("Loading page", action="get", value=SUBCATEGORIES_URL, ready=network_idle()),
+        Step("Opening Niche Finder tab", NICHE_FINDER_TAB, "click", ready=[network_idle(), grid_ready()],
+             checkpoint=visible(FILTERS_BUTTON)),
+        Step("Opening Filters panel", FILTERS_BUTTON, click_unless_shown(FILTER_INPUT), wait_for="clickable"),
+        Step("Expanding 'Subcategory' filter group", SUBCATEGORY_GROUP, click_unless_shown(FILTER_INPUT),
+             wait_for="clickable"),
+        Step(f"Filtering for '{search_text}'", FILTER_INPUT, "type", value=search_text,
+             ready=[network_idle(), row_count_stable()], checkpoint=input_value(FILTER_INPUT, search_text)),
+        Step("Opening Excel side panel", EXCEL_SIDE_BUTTON, click_unless_shown(CSV_EXPORT_IMAGE),
+             wait_for="clickable"),
+        Step("Clicking CSV export", CSV_EXPORT_IMAGE, "click"),
+    ]
+
+
+@traced(ENDPOINT)
 def run_niche_finder_export(
     search_text: str, 
     username: str, 
     password: str,
     download_path: str = None,
-    cleanup_downloads: bool = True  # Delete from Downloads folder after copying
+    cleanup_downloads: bool = True,  # Remove the job's download directory afterwards
+    pool=None,
+    mode: str = "browser",  # "api" replays the grid's data call instead of exporting through the UI
+    on_step=None,  # Called with each step name before it runs
+    profile=None  # Browser profile name; defaults to the one configured for the endpoint
 ) -> dict:
     """
     Full workflow - Downloads file and prepares it for API response
     """
-    # Get system Downloads folder (where Chrome actually downloads)
-    system_downloads = os.path.join(os.path.expanduser("~"), "Downloads")
-    
-    # Get desired output directory
-    output_path = setup_download_directory(download_path)
+    check_circuit(ENDPOINT)
+    profile = profile or profile_for(ENDPOINT)
+    if mode == "api":
+        return export_via_api(
+            "niche_finder", build_steps(search_text)[:API_CAPTURE_STEPS], username, password,
+            search_text, download_path=download_path, pool=pool,
+            on_step=on_step, profile=profile,
+        )
     
-    # Get authenticated driver WITHOUT custom download directory
-    driver = get_authenticated_driver(
-        headless=False, 
-        username=username, 
-        password=password,
-        download_dir=None
-    )
+    scraper = BaseScraper(download_path)
+    # Private download directory, so concurrent jobs never see each other's files
+    job_dir = scraper.create_job_download_dir()
     
-    wait = WebDriverWait(driver, 25)
-    downloaded_file = None
-    final_file_path = None
+    # Lease a warm, already logged-in driver from the pool
+    pool = pool or get_driver_pool()
+    if on_step:
+        on_step("Waiting for browser")
+    try:
+        with pool.lease(username, password, profile=profile) as driver:
+            return _run_export(driver, scraper, job_dir, search_text, cleanup_downloads, on_step)
+    finally:
+        if cleanup_downloads:
+            remove_job_download_dir(job_dir)
+
 
+def _run_export(driver, scraper, job_dir, search_text, cleanup_downloads, on_step=None) -> dict:
+    """Export steps, run against a leased driver"""
     try:
-        print("Step 1: Loading page...")
-        driver.get("https://app.smartscout.com/app/subcategories")
-        time.sleep(10)
-        
-        print("Step 2: Locating Niche Finder tab...")
-        niche_tab = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//div[contains(@class, 'mat-tab-label-content') and contains(., 'Niche Finder')]")
-            )
-        )
-        niche_tab.click()
-        time.sleep(10)
-        print("  ✅ Niche Finder tab clicked")
-        
-        print("Step 3: Opening Filters panel...")
-        filters_button = wait.until(
-            EC.element_to_be_clickable((By.XPATH, "//button[.//span[text()='Filters']]"))
-        )
-        filters_button.click()
-        time.sleep(10)
-        print("  ✅ Filters panel opened")
-        
-        print("Step 4: Clicking 'Subcategory' filter group...")
-        subcategory_header = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//div[.//span[text()='Subcategory'] and contains(@class, 'ag-group-title-bar')]")
-            )
-        )
-        subcategory_header.click()
-        time.sleep(10)
-        print("  ✅ Subcategory filter expanded")
-        
-        print("Step 5: Waiting for filter input field...")
-        filter_input = wait.until(
-            EC.visibility_of_element_located(
-                (By.XPATH, "//input[contains(@class, 'ag-input-field-input') and @placeholder='Filter...']")
-            )
-        )
-        
-        filter_input.clear()
-        time.sleep(1)
-        filter_input.send_keys(search_text)
-        print(f"  ✅ Typed into filter: '{search_text}'")
-        time.sleep(5)
-        
-        print("Step 6: Triggering export...")
-        
-        print("  Clicking Excel side button...")
-        excel_side_button = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//button[contains(@class, 'ag-side-button-button') and .//img[contains(@src, 'excel')]]")
-            )
-        )
-        excel_side_button.click()
-        time.sleep(5)
-        print("  ✅ Excel side button clicked")
-        
-        print("  Clicking CSV export image...")
-        csv_image = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//img[contains(@src, 'csv.ico') and @mattooltip='Export as CSV']")
-            )
-        )
-        csv_image.click()
-        print("  ✅ CSV export clicked")
-        
-        # Wait for download in system Downloads folder
-        print("Step 7: Waiting for download...")
-        downloaded_file = get_latest_downloaded_file(system_downloads, timeout=20)
+        # Exports the page builds itself are captured in memory; anything else lands in job_dir
+        set_download_dir(driver, job_dir)
+        steps = build_steps(search_text)
+        with DownloadCapture(driver, job_dir) as capture:
+            run_steps(driver, steps, on_step)
+            
+            if on_step:
+                on_step("Waiting for download")
+            print(f"Step {len(steps) + 1}: Waiting for download...")
+            download = capture.wait(timeout=20)
         
-        if not downloaded_file:
+        if not download:
             raise Exception("No CSV file was downloaded")
         
-        print(f"  ✅ File downloaded: {os.path.basename(downloaded_file)}")
-        
-        # Copy to output directory with custom name
-        new_filename = f"niche_finder_{search_text.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        final_file_path = os.path.join(output_path, new_filename)
-        shutil.copy2(downloaded_file, final_file_path)
-        print(f"  ✅ Copied to: {final_file_path}")
+        print(f"  ✅ File downloaded: {download.name}")
         
-        # Delete from Downloads folder if requested
-        if cleanup_downloads:
-            try:
-                os.remove(downloaded_file)
-                print(f"  🗑️ Removed from Downloads folder")
-            except Exception as e:
-                print(f"  ⚠️ Could not remove from Downloads: {e}")
-        
-        file_size = os.path.getsize(final_file_path)
+        # Write to output directory with custom name
+        final_file_path, new_filename = scraper.save_download(
+            download, "niche_finder", search_text, cleanup=cleanup_downloads
+        )
+        print(f"  ✅ Saved to: {final_file_path}")
         
         result = {
             "status": "success",
             "message": f"Export completed for '{search_text}'",
             "file_path": final_file_path,
             "file_name": new_filename,
-            "file_size": file_size,
+            "file_size": download.size,
+            "etag": download.etag,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -189,6 +151,3 @@ def run_niche_finder_export(
         print(error_msg)
         print(f"Traceback:\n{traceback.format_exc()}")
         raise Exception(error_msg) from e
-
-    finally:
-        driver.quit()
\ No newline at end of file
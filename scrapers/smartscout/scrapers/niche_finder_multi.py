@@ -0,0 +1,253 @@
+# scrapers/smartscout/scrapers/niche_finder_multi.py
+#
+# Niche Finder for a list of keywords as one scrape. Each session (one leased
+# browser) sets the Niche Finder page up once; for every further keyword the
+# flow resumes on that page and only re-applies the Subcategory filter and
+# exports. Sessions take keywords from a shared queue, so a slow keyword never
+# holds the others up. Every export is read row by row from its capture buffer
+# straight into the merge - no per-keyword file is written - and a subcategory
+# found by several keywords is kept once, tagged with all of them.
+import io
+import os
+import csv
+import threading
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from ...base_scraper import BaseScraper, run_steps, set_download_dir, remove_job_download_dir
+from ...circuit_breaker import check_circuit
+from ...errors import ScrapeAborted
+from ...download_capture import DownloadCapture
+from ...browser_profiles import profile_for
+from ...telemetry import traced, span
+from ..driver_pool import get_driver_pool
+from .niche_finder import build_steps, ENDPOINT as NICHE_FINDER
+
+ENDPOINT = "smartscout/niche-finder/multi"
+# Plugin declaration, read by service/registry.py without importing this module
+SCRAPER = {
+    "name": "smartscout/niche-finder/multi",
+    "summary": "Niche Finder subcategories for several keywords, merged and tagged",
+    "run": "run_niche_finder_multi_export",
+    "params": {
+        "keywords": {"type": "list[str]", "min_length": 1, "max_length": 50,
+                     "description": "Subcategory filter texts, exported one after another"},
+        "sessions": {"type": "int", "default": 1, "ge": 1, "le": 10, "cache": False,
+                     "description": "Browsers the keywords are spread over"},
+    },
+    "output": "csv",
+    "resources": ["browser", "account"],
+}
+KEYWORDS_COLUMN = "matched_keywords"
+KEYWORD_SEPARATOR = "; "
+# Columns identifying a subcategory, as Niche Finder has named them over time
+SUBCATEGORY_COLUMNS = ("subcategory", "sub category", "niche", "niche name", "name")
+CATEGORY_COLUMNS = ("category", "category name")
+
+
+def _find_column(columns: list, candidates: tuple):
+    lowered = {c.strip().lower(): c for c in columns}
+    return next((lowered[name] for name in candidates if name in lowered), None)
+
+
+class NicheMerge:
+    """Rows of several Niche Finder exports, one per subcategory, tagged with the keywords that found it"""
+
+    def __init__(self):
+        self.columns = []
+        self.row_counts = {}  # keyword -> rows in its export
+        self._rows = {}       # subcategory key -> (first row seen, [keywords])
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, keyword: str, download) -> int:
+        """Merge one captured export; returns how many rows it had"""
+        if download.buffer is not None:
+            download.buffer.seek(0)
+            f = io.TextIOWrapper(download.buffer, encoding="utf-8-sig", newline="")
+        else:
+            f = open(download.path, newline="", encoding="utf-8-sig")
+        count = 0
+        try:
+            reader = csv.DictReader(f)
+            columns = reader.fieldnames or []
+            subcategory = _find_column(columns, SUBCATEGORY_COLUMNS)
+            category = _find_column(columns, CATEGORY_COLUMNS)
+            with self._lock:
+                self.columns += [c for c in columns if c not in self.columns and c != KEYWORDS_COLUMN]
+                for row in reader:
+                    count += 1
+                    if subcategory:
+                        # The same subcategory name can appear under more than one category
+                        key = ((row.get(category) or "").strip().lower() if category else "",
+                               (row.get(subcategory) or "").strip().lower())
+                    else:
+                        key = tuple(row.get(c) for c in columns)
+                    entry = self._rows.setdefault(key, (row, []))
+                    if keyword not in entry[1]:
+                        entry[1].append(keyword)
+                self.row_counts[keyword] = count
+        finally:
+            f.close()
+            if download.path and os.path.exists(download.path):
+                os.remove(download.path)
+        return count
+
+    def write(self, file_path: str):
+        """The merged rows as CSV, in the order they were first seen"""
+        partial_path = file_path + ".part"
+        try:
+            with open(partial_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=self.columns + [KEYWORDS_COLUMN], extrasaction="ignore")
+                writer.writeheader()
+                for row, keywords in self._rows.values():
+                    writer.writerow({**row, KEYWORDS_COLUMN: KEYWORD_SEPARATOR.join(keywords)})
+            os.replace(partial_path, file_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+
+def _unique_keywords(keywords: list) -> list:
+    seen = set()
+    unique = []
+    for keyword in keywords:
+        keyword = keyword.strip()
+        if keyword and keyword.lower() not in seen:
+            seen.add(keyword.lower())
+            unique.append(keyword)
+    return unique
+
+
+@traced(ENDPOINT)
+def run_niche_finder_multi_export(
+    keywords: list,
+    username: str,
+    password: str,
+    sessions: int = 1,  # Browsers the keywords are spread over
+    download_path: str = None,
+    pool=None,
+    on_step=None,
+    profile=None
+) -> dict:
+    """
+    Export Niche Finder for every keyword and merge the exports into one CSV
+    with a `matched_keywords` column. Keywords that fail are reported in
+    `failed_keywords`; the scrape only fails if all of them do.
+    """
+    check_circuit(ENDPOINT)
+    keywords = _unique_keywords(keywords)
+    if not keywords:
+        raise ValueError("At least one keyword is required")
+    if not username or not password:
+        raise ValueError("Username and password required for login")
+
+    profile = profile or profile_for(NICHE_FINDER)
+    pool = pool or get_driver_pool()
+    scraper = BaseScraper(download_path)
+    merged = NicheMerge()
+    failed = {}
+    queue = iter(enumerate(keywords))
+    queue_lock = threading.Lock()
+
+    def next_keyword():
+        with queue_lock:
+            return next(queue, None)
+
+    def session():
+        job_dir = scraper.create_job_download_dir()
+        try:
+            if on_step:
+                on_step("Waiting for browser")
+            with pool.lease(username, password, profile=profile) as driver, \
+                    DownloadCapture(driver, job_dir) as capture:
+                page_ready = False
+                while (item := next_keyword()) is not None:
+                    index, keyword = item
+                    page_ready = _export_keyword(driver, capture, job_dir, index, keyword, page_ready,
+                                                 merged, failed, on_step)
+        finally:
+            remove_job_download_dir(job_dir)
+
+    sessions = max(1, min(sessions, len(keywords), pool.size * pool.tabs_per_browser))
+    started = datetime.now()
+    if sessions == 1:
+        session()
+    else:
+        # Each session thread carries the scrape's trace, so its steps are spans of this scrape
+        with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="niche-session") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, session) for _ in range(sessions)]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        aborted = next((e for e in errors if isinstance(e, ScrapeAborted)), None)
+        if aborted is not None:
+            raise aborted
+        if errors:
+            if not merged.row_counts and not failed:
+                raise errors[0]
+            # Sessions that could not start leave their share to the others; whatever is left failed
+            while (item := next_keyword()) is not None:
+                failed[item[1]] = f"Not exported: {errors[0]}"
+
+    if not merged.row_counts:
+        raise Exception(f"Every keyword failed: {failed}")
+
+    file_path, file_name = scraper.output_path("niche_finder_multi", f"{len(keywords)}_keywords", ".csv")
+    merged.write(file_path)
+    total = sum(merged.row_counts.values())
+    print(f"  ✅ Merged {total} rows from {len(merged.row_counts)} keyword(s) into {len(merged)} "
+          f"subcategories: {file_path}")
+
+    return {
+        "status": "success",
+        "message": f"Niche Finder export completed for {len(merged.row_counts)}/{len(keywords)} keywords",
+        "file_path": file_path,
+        "file_name": file_name,
+        "file_size": os.path.getsize(file_path),
+        "row_count": len(merged),
+        "duplicates_removed": total - len(merged),
+        "keywords": {k: merged.row_counts[k] for k in keywords if k in merged.row_counts},
+        "failed_keywords": failed,
+        "sessions": sessions,
+        "seconds": round((datetime.now() - started).total_seconds(), 2),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def _export_keyword(driver, capture, job_dir, index, keyword, page_ready, merged, failed, on_step) -> bool:
+    """
+    Filter and export one keyword into the merge; returns whether the page is
+    left set up for the next one. On a reused page a failure is retried once
+    on a freshly loaded one before the keyword is given up.
+    """
+    def keyword_step(name):
+        if on_step:
+            on_step(f"[{keyword}] {name}")
+
+    for fresh in ((False, True) if page_ready else (True,)):
+        try:
+            with span(f"Keyword '{keyword}'", fresh=fresh):
+                # Fresh directory per keyword, so a late file from a failed one is never misattributed
+                keyword_dir = os.path.join(job_dir, str(index))
+                os.makedirs(keyword_dir, exist_ok=True)
+                set_download_dir(driver, keyword_dir)
+                capture.job_dir = keyword_dir
+                capture.discard()
+                run_steps(driver, build_steps(keyword), keyword_step, resume=not fresh)
+
+                keyword_step("Waiting for download")
+                download = capture.wait(timeout=20)
+                if not download:
+                    raise Exception("No CSV file was downloaded")
+                rows = merged.add(keyword, download)
+            print(f"  ✅ {keyword}: {rows} rows")
+            return True
+        except ScrapeAborted:
+            raise
+        except Exception as e:
+            print(f"  ❌ {keyword}: {e}")
+            if fresh:
+                failed[keyword] = str(e)
+    return False
@@ -1,224 +1,169 @@
 # scrapers/smartscout/scrapers/rank_maker.py
 import traceback
-import time
 import os
-import glob
-import shutil
+import re
 from datetime import datetime
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.keys import Keys
-from ..auth import get_authenticated_driver  # Corrected relative import
-
-
-def setup_download_directory(download_path: str = None):
-    """Setup download directory and return path"""
-    if download_path is None:
-        # Get absolute path of project root
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        download_path = os.path.join(project_root, "downloads")
-    
-    os.makedirs(download_path, exist_ok=True)
-    return os.path.abspath(download_path)
+from ...base_scraper import (
+    BaseScraper, Step, run_steps, network_idle, row_count_stable, present, input_value,
+    set_download_dir, remove_job_download_dir,
+)
+from ...circuit_breaker import check_circuit
+from ...errors import ScrapeAborted
+from ...download_capture import DownloadCapture
+from ..auth import HOME_URL
+from ..driver_pool import get_driver_pool
+from ...browser_profiles import profile_for
+from ...telemetry import traced, trace, record_export
+from ..api_client import export_via_api
 
+ENDPOINT = "smartscout/rank-maker"
+ASIN_RE = re.compile(r"^[A-Z0-9]{10}$")
+# Plugin declaration, read by service/registry.py without importing this module
+SCRAPER = {
+    "name": "smartscout/rank-maker",
+    "summary": "Rank Maker keywords for an ASIN, filtered by latest rank",
+    "run": "run_keyword_tools_export",
+    "params": {
+        "search_text": {"type": "str", "description": "ASIN to search"},
+        "max_rank": {"type": "int", "default": 65, "description": "Upper bound of the Latest Rank filter"},
+        "mode": {"type": "str", "choices": ["browser", "api"], "default": "browser",
+                 "env": "SMARTSCOUT_EXPORT_MODE"},
+    },
+    "output": "csv",
+    "resources": ["browser", "account"],
+    "snapshots": True,
+}
+KEYWORD_TOOLS_MENU = (By.XPATH, "//mat-icon[@data-mat-icon-name='keyword-tools']/parent::div")
+RANK_MAKER_SUBMENU = (By.XPATH, "//div[contains(@class, 'submenu-item')]//div[@class='name' and text()='Rank Maker']")
+ASIN_SEARCH_INPUT = (By.XPATH, "//input[@placeholder='Search ASIN' and @name='asin']")
+RESULTS_GRID = (By.XPATH, "//div[contains(@class, 'ag-root-wrapper')]")
+FILTERS_BUTTON = (By.XPATH, "//button[@ref='eToggleButton' and contains(@class, 'ag-side-button-button')]//span[text()='Filters']")
+LATEST_RANK_GROUP = (By.XPATH, "//div[contains(@class, 'ag-group-title-bar') and .//span[text()='Latest Rank']]")
+MAX_RANK_INPUT = (By.XPATH, "//input[@formcontrolname='max' and @type='number']")
+EXPORT_AS_BUTTON = (By.XPATH, "//button[contains(@class, 'btn-wrapper secondary')]//span[text()='Export as']")
+CSV_MENU_ITEM = (By.XPATH, "//button[@mat-menu-item]//mat-icon[@svgicon='csv']/parent::button")
 
-def get_latest_downloaded_file(download_dir: str, pattern: str = "*.csv", timeout: int = 20):
-    """Get the most recently downloaded CSV file with timeout"""
-    print(f"  Checking for files in: {download_dir}")
-    
-    # Get initial file count
-    files_before = set(glob.glob(os.path.join(download_dir, pattern)))
-    files_before = {f for f in files_before if not f.endswith('.crdownload')}
-    
-    start_time = time.time()
-    
-    while time.time() - start_time < timeout:
-        files_now = set(glob.glob(os.path.join(download_dir, pattern)))
-        files_now = {f for f in files_now if not f.endswith('.crdownload')}
-        
-        # Check if new file appeared
-        new_files = files_now - files_before
-        if new_files:
-            latest_file = max(new_files, key=os.path.getctime)
-            
-            # Verify file is complete (size not changing)
-            size1 = os.path.getsize(latest_file)
-            time.sleep(1)
-            size2 = os.path.getsize(latest_file)
-            
-            if size1 == size2 and size1 > 0:
-                return latest_file
-        
-        time.sleep(1)
-    
-    return None
+# Steps after which the grid has loaded its data (used to learn the API call)
+API_CAPTURE_STEPS = 5
+
+
+def navigation_steps() -> list:
+    """Home -> Keyword Tools -> Rank Maker"""
+    return [
+        Step("Loading home page", action="get", value=HOME_URL, ready=network_idle()),
+        Step("Opening Keyword Tools menu", KEYWORD_TOOLS_MENU, "click"),
+        Step("Opening Rank Maker", RANK_MAKER_SUBMENU, "click", ready=network_idle(),
+             checkpoint=present(ASIN_SEARCH_INPUT)),
+    ]
+
+
+def search_steps(search_text: str) -> list:
+    return [
+        Step(f"Searching for ASIN '{search_text}'", ASIN_SEARCH_INPUT, "type_submit", value=search_text,
+             wait_for="present"),
+        # Either the results table or "No results found" - carry on in both cases
+        Step("Waiting for search results", RESULTS_GRID, ready=[network_idle(), row_count_stable()],
+             optional=True, retries=0, checkpoint=input_value(ASIN_SEARCH_INPUT, search_text)),
+    ]
+
+
+def filter_steps(max_rank: int) -> list:
+    return [
+        Step("Opening Filters panel", FILTERS_BUTTON, "click"),
+        # JS click in case the group header is obscured
+        Step("Expanding 'Latest Rank' filter group", LATEST_RANK_GROUP, "js_click"),
+        Step(f"Setting max rank value to {max_rank}", MAX_RANK_INPUT, "type", value=max_rank,
+             wait_for="present", ready=[network_idle(), row_count_stable()],
+             checkpoint=input_value(MAX_RANK_INPUT, max_rank)),
+    ]
 
 
+def export_steps() -> list:
+    return [
+        Step("Opening 'Export as' menu", EXPORT_AS_BUTTON, "click"),
+        Step("Clicking CSV option", CSV_MENU_ITEM, "click"),
+    ]
+
+
+def build_steps(search_text: str, max_rank: int) -> list:
+    """Rank Maker flow up to the CSV export click"""
+    return navigation_steps() + search_steps(search_text) + filter_steps(max_rank) + export_steps()
+
+
+@traced(ENDPOINT)
 def run_keyword_tools_export(
     search_text: str, 
     username: str, 
     password: str,
     download_path: str = None,
-    cleanup_downloads: bool = True,
-    max_rank: int = 65  # Default value for Latest Rank filter
+    cleanup_downloads: bool = True,  # Remove the job's download directory afterwards
+    max_rank: int = 65,  # Default value for Latest Rank filter
+    pool=None,
+    mode: str = "browser",  # "api" replays the grid's data call instead of exporting through the UI
+    on_step=None,  # Called with each step name before it runs
+    profile=None  # Browser profile name; defaults to the one configured for the endpoint
 ) -> dict:
     """
     Full workflow for Keyword Tools/Rank Maker export
     """
-    # Get system Downloads folder (where Chrome actually downloads)
-    system_downloads = os.path.join(os.path.expanduser("~"), "Downloads")
-    
-    # Get desired output directory
-    output_path = setup_download_directory(download_path)
+    check_circuit(ENDPOINT)
+    profile = profile or profile_for(ENDPOINT)
+    if mode == "api":
+        return export_via_api(
+            "rank_maker", build_steps(search_text, max_rank)[:API_CAPTURE_STEPS], username, password,
+            search_text, max_rank=max_rank, download_path=download_path, pool=pool,
+            on_step=on_step, profile=profile,
+        )
     
-    # Get authenticated driver WITHOUT custom download directory
-    driver = get_authenticated_driver(
-        headless=False, 
-        username=username, 
-        password=password,
-        download_dir=None
-    )
+    scraper = BaseScraper(download_path)
+    # Private download directory, so concurrent jobs never see each other's files
+    job_dir = scraper.create_job_download_dir()
     
-    wait = WebDriverWait(driver, 25)
-    downloaded_file = None
+    # Lease a warm, already logged-in driver from the pool
+    pool = pool or get_driver_pool()
+    if on_step:
+        on_step("Waiting for browser")
+    try:
+        with pool.lease(username, password, profile=profile) as driver:
+            return _run_export(driver, scraper, job_dir, search_text, cleanup_downloads, max_rank, on_step)
+    finally:
+        if cleanup_downloads:
+            remove_job_download_dir(job_dir)
 
+
+def _run_export(driver, scraper, job_dir, search_text, cleanup_downloads, max_rank, on_step=None) -> dict:
+    """Export steps, run against a leased driver"""
     try:
-        print("Step 1: Loading home page...")
-        driver.get("https://app.smartscout.com/app/home")
-        time.sleep(10)
-        
-        print("Step 2: Clicking Keyword Tools menu item...")
-        keyword_tools_menu = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//mat-icon[@data-mat-icon-name='keyword-tools']/parent::div")
-            )
-        )
-        keyword_tools_menu.click()
-        time.sleep(10)
-        print("  ✅ Keyword Tools menu clicked")
-        
-        print("Step 3: Clicking Rank Maker submenu...")
-        rank_maker = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//div[contains(@class, 'submenu-item')]//div[@class='name' and text()='Rank Maker']")
-            )
-        )
-        rank_maker.click()
-        time.sleep(10)
-        print("  ✅ Rank Maker clicked")
-        
-        print("Step 4: Searching for ASIN...")
-        search_input = wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//input[@placeholder='Search ASIN' and @name='asin']")
-            )
-        )
-        search_input.clear()
-        time.sleep(1)
-        search_input.send_keys(search_text)
-        print(f"  ✅ Entered ASIN: '{search_text}'")
-        
-        # Press Enter or wait for search to complete
-        search_input.send_keys(Keys.RETURN)
-        print("  ✅ Search submitted, waiting for results...")
-        
-        # Wait for either the results table or "No results found"
-        try:
-            wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'ag-root-wrapper')]")))
-            print("  ✅ Search results loaded")
-        except:
-            print("  ⚠️ Results table not found within timeout, proceeding anyway...")
+        # Exports the page builds itself are captured in memory; anything else lands in job_dir
+        set_download_dir(driver, job_dir)
+        steps = build_steps(search_text, max_rank)
+        with DownloadCapture(driver, job_dir) as capture:
+            run_steps(driver, steps, on_step)
             
-        time.sleep(5)
-        
-        print("Step 5: Opening Filters panel...")
-        filters_button = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//button[@ref='eToggleButton' and contains(@class, 'ag-side-button-button')]//span[text()='Filters']")
-            )
-        )
-        filters_button.click()
-        time.sleep(5)
-        print("  ✅ Filters panel opened")
-        
-        print("Step 6: Expanding 'Latest Rank' filter group...")
-        time.sleep(5)  # Wait for panel to settle
-        latest_rank_header = wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//div[contains(@class, 'ag-group-title-bar') and .//span[text()='Latest Rank']]")
-            )
-        )
-        # Try to click using JS in case it's obscured
-        driver.execute_script("arguments[0].scrollIntoView(true);", latest_rank_header)
-        time.sleep(1)
-        driver.execute_script("arguments[0].click();", latest_rank_header)
-        
-        time.sleep(5)
-        print("  ✅ Latest Rank filter expanded")
-        
-        print(f"Step 7: Setting max rank value to {max_rank}...")
-        max_input = wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//input[@formcontrolname='max' and @type='number']")
-            )
-        )
-        max_input.clear()
-        time.sleep(1)
-        max_input.send_keys(str(max_rank))
-        print(f"  ✅ Max rank set to: {max_rank}")
-        time.sleep(3)
-        
-        print("Step 8: Clicking 'Export as' button...")
-        export_button = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//button[contains(@class, 'btn-wrapper secondary')]//span[text()='Export as']")
-            )
-        )
-        export_button.click()
-        time.sleep(3)
-        print("  ✅ Export as button clicked")
+            if on_step:
+                on_step("Waiting for download")
+            print(f"Step {len(steps) + 1}: Waiting for download...")
+            download = capture.wait(timeout=20)
         
-        print("Step 9: Clicking CSV option...")
-        csv_button = wait.until(
-            EC.element_to_be_clickable(
-                (By.XPATH, "//button[@mat-menu-item]//mat-icon[@svgicon='csv']/parent::button")
-            )
-        )
-        csv_button.click()
-        print("  ✅ CSV export clicked")
-        
-        # Wait for download in system Downloads folder
-        print("Step 10: Waiting for download...")
-        downloaded_file = get_latest_downloaded_file(system_downloads, timeout=20)
-        
-        if not downloaded_file:
+        if not download:
             raise Exception("No CSV file was downloaded")
         
-        print(f"  ✅ File downloaded: {os.path.basename(downloaded_file)}")
-        
-        # Copy to output directory with custom name
-        new_filename = f"rank_maker_{search_text.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        final_file_path = os.path.join(output_path, new_filename)
-        shutil.copy2(downloaded_file, final_file_path)
-        print(f"  ✅ Copied to: {final_file_path}")
+        print(f"  ✅ File downloaded: {download.name}")
         
-        # Delete from Downloads folder if requested
-        if cleanup_downloads:
-            try:
-                os.remove(downloaded_file)
-                print(f"  🗑️ Removed from Downloads folder")
-            except Exception as e:
-                print(f"  ⚠️ Could not remove from Downloads: {e}")
-        
-        file_size = os.path.getsize(final_file_path)
+        # Write to output directory with custom name
+        final_file_path, new_filename = scraper.save_download(
+            download, "rank_maker", search_text, cleanup=cleanup_downloads
+        )
+        print(f"  ✅ Saved to: {final_file_path}")
         
         result = {
             "status": "success",
             "message": f"Rank Maker export completed for ASIN '{search_text}' with max rank {max_rank}",
             "file_path": final_file_path,
             "file_name": new_filename,
-            "file_size": file_size,
+            "file_size": download.size,
+            "etag": download.etag,
             "timestamp": datetime.now().isoformat(),
             "asin": search_text,
             "max_rank": max_rank
@@ -234,8 +179,7 @@ def run_keyword_tools_export(
         try:
             # Capture error screenshot
             screenshot_name = f"rank_maker_error_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            os.makedirs(output_path, exist_ok=True)
-            screenshot_path = os.path.join(output_path, screenshot_name)
+            screenshot_path = os.path.join(scraper.download_dir, screenshot_name)
             driver.save_screenshot(screenshot_path)
             print(f"Captured error screenshot: {screenshot_path}")
         except:
@@ -243,5 +187,90 @@ def run_keyword_tools_export(
             
         raise Exception(error_msg) from e
 
+
+def run_keyword_tools_batch(
+    asins: list,
+    username: str,
+    password: str,
+    download_path: str = None,
+    max_rank: int = 65,
+    pool=None,
+    on_step=None,
+    profile=None
+):
+    """
+    Export many ASINs in one browser session, yielding one result dict per ASIN
+    as it finishes. Rank Maker is opened and the max rank filter set once; only
+    search -> export repeats per ASIN. A failed ASIN yields an error result and
+    the page is rebuilt before the next one, so the rest of the batch carries on.
+    """
+    check_circuit(ENDPOINT)
+    scraper = BaseScraper(download_path)
+    batch_dir = scraper.create_job_download_dir()
+    pool = pool or get_driver_pool()
+    if on_step:
+        on_step("Waiting for browser")
+    
+    try:
+        with pool.lease(username, password, profile=profile or profile_for(ENDPOINT)) as driver, \
+                DownloadCapture(driver, batch_dir) as capture:
+            page_ready = False
+            for asin in asins:
+                asin = asin.strip().upper()
+                if not ASIN_RE.match(asin):
+                    # Never joined into a path (it names the per-ASIN directory); the page stays as it is
+                    yield {"status": "error", "asin": asin, "max_rank": max_rank,
+                           "error": f"Invalid ASIN: {asin!r}", "seconds": 0}
+                    continue
+                started = datetime.now()
+                try:
+                    with trace(f"{ENDPOINT}/batch", mode="browser"):
+                        steps = search_steps(asin)
+                        if not page_ready:
+                            steps = navigation_steps() + steps + filter_steps(max_rank)
+                        steps += export_steps()
+                        
+                        # Fresh directory per ASIN, so a late file from a failed ASIN is never misattributed
+                        asin_dir = os.path.join(batch_dir, asin)
+                        os.makedirs(asin_dir, exist_ok=True)
+                        set_download_dir(driver, asin_dir)
+                        capture.job_dir = asin_dir
+                        capture.discard()
+                        run_steps(driver, steps, on_step)
+                        page_ready = True
+                        
+                        if on_step:
+                            on_step(f"Waiting for download ({asin})")
+                        download = capture.wait(timeout=20)
+                        if not download:
+                            raise Exception("No CSV file was downloaded")
+                        
+                        final_file_path, new_filename = scraper.save_download(download, "rank_maker", asin)
+                    record_export(f"{ENDPOINT}/batch", final_file_path)
+                    print(f"  ✅ {asin}: saved to {final_file_path}")
+                    record = {
+                        "status": "success",
+                        "asin": asin,
+                        "max_rank": max_rank,
+                        "file_path": final_file_path,
+                        "file_name": new_filename,
+                        "file_size": download.size,
+                        "etag": download.etag,
+                        "seconds": round((datetime.now() - started).total_seconds(), 2),
+                    }
+                except ScrapeAborted:
+                    raise
+                except Exception as e:
+                    print(f"  ❌ {asin}: {e}")
+                    page_ready = False
+                    record = {
+                        "status": "error",
+                        "asin": asin,
+                        "max_rank": max_rank,
+                        "error": str(e),
+                        "seconds": round((datetime.now() - started).total_seconds(), 2),
+                    }
+                # Yielded outside the span, so the consumer never runs inside it
+                yield record
     finally:
-        driver.quit()
\ No newline at end of file
+        remove_job_download_dir(batch_dir)
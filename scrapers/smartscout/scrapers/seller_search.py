@@ -0,0 +1,63 @@
+# scrapers/smartscout/scrapers/seller_search.py
+from selenium.webdriver.common.by import By
+from ...base_scraper import Step, grid_ready, network_idle, row_count_stable, present, input_value
+from ..auth import BASE_URL
+from ..grid_export import run_grid_export
+from ...browser_profiles import profile_for
+from ...circuit_breaker import check_circuit
+from ...telemetry import traced
+
+ENDPOINT = "smartscout/seller-search"
+# Plugin declaration, read by service/registry.py without importing this module
+SCRAPER = {
+    "name": "smartscout/seller-search",
+    "summary": "Seller Search results, read straight from the grid",
+    "run": "run_seller_search_export",
+    "params": {
+        "search_text": {"type": "str", "default": "", "description": "Seller name or ID to search; empty for all"},
+        "max_rows": {"type": "int", "default": 10000, "ge": 1, "description": "Stop after this many rows"},
+        "cursor": {"type": "str", "default": "", "description": "Continue from an earlier export's cursor"},
+    },
+    "output": "csv",
+    "resources": ["browser", "account"],
+}
+SELLERS_URL = f"{BASE_URL}/app/sellers"
+RESULTS_GRID = (By.XPATH, "//div[contains(@class, 'ag-root-wrapper')]")
+SEARCH_INPUT = (By.XPATH, "//input[contains(@placeholder, 'Search')]")
+# The app's own paginator, or ag-grid's paging panel
+NEXT_PAGE = (By.XPATH, "//button[contains(@class, 'mat-paginator-navigation-next')]"
+                       " | //div[contains(@class, 'ag-paging-button') and @ref='btNext']")
+
+
+def build_steps(search_text: str) -> list:
+    """Seller Search page, searched and loaded, ready for the extractor"""
+    steps = [
+        Step("Loading Seller Search", action="get", value=SELLERS_URL, ready=[network_idle(), grid_ready()],
+             checkpoint=present(RESULTS_GRID)),
+    ]
+    if search_text:
+        steps.append(Step(f"Searching sellers for '{search_text}'", SEARCH_INPUT, "type_submit", value=search_text,
+                          ready=[network_idle(), row_count_stable()],
+                          checkpoint=input_value(SEARCH_INPUT, search_text)))
+    return steps
+
+
+@traced(ENDPOINT)
+def run_seller_search_export(
+    username: str,
+    password: str,
+    search_text: str = "",
+    max_rows: int = 10000,
+    cursor: str = "",  # "page:row" where an earlier, cut-short export stopped
+    download_path: str = None,
+    pool=None,
+    on_step=None,
+    profile=None
+) -> dict:
+    """Seller Search rows streamed from the grid into a CSV"""
+    check_circuit(ENDPOINT)
+    return run_grid_export(
+        "seller_search", build_steps(search_text), username, password, search_text=search_text,
+        max_rows=max_rows, cursor=cursor or None, next_page=NEXT_PAGE, download_path=download_path,
+        pool=pool, on_step=on_step, profile=profile or profile_for(ENDPOINT),
+    )
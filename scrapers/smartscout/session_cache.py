@@ -0,0 +1,86 @@
+# scrapers/smartscout/session_cache.py
+import os
+import time
+import pickle
+import hashlib
+import hmac
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+SESSIONS_DIR = PROJECT_ROOT / "data" / "sessions"
+SESSION_TTL = int(os.getenv("SMARTSCOUT_SESSION_TTL", str(6 * 60 * 60)))
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def credentials_digest(username: str, password: str) -> str:
+    """Stable fingerprint of a credential pair (the password itself is never stored)"""
+    return hashlib.sha256(f"{username}\0{password}".encode("utf-8")).hexdigest()
+
+
+def _lock_for(username: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(username.lower(), threading.Lock())
+
+
+def _session_path(username: str) -> Path:
+    """One pickle per account, named by a hash so emails never hit the filesystem"""
+    key = hashlib.sha256(username.lower().encode("utf-8")).hexdigest()[:32]
+    return SESSIONS_DIR / f"{key}.pkl"
+
+
+def _password_hash(password: str, salt: bytes) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 100_000)
+
+
+def load_cookies(username: str, password: str, ttl: int = SESSION_TTL):
+    """Return saved cookies for the account, or None if missing, expired or for other credentials"""
+    path = _session_path(username)
+    with _lock_for(username):
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"  ⚠️ Ignoring unreadable session cache {path.name}: {e}")
+            return None
+
+    if time.time() - entry.get("saved_at", 0) > ttl:
+        return None
+    # Cookies are only handed out to a caller who knows the password they were issued for
+    if not hmac.compare_digest(_password_hash(password, entry["salt"]), entry["password_hash"]):
+        return None
+    return entry["cookies"]
+
+
+def save_cookies(username: str, password: str, cookies: list):
+    """Atomically write the account's cookies; safe to call from several threads"""
+    path = _session_path(username)
+    salt = os.urandom(16)
+    entry = {
+        "saved_at": time.time(),
+        "salt": salt,
+        "password_hash": _password_hash(password, salt),
+        "cookies": cookies,
+    }
+
+    with _lock_for(username):
+        SESSIONS_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        # Session cookies log in as the account, so only the owner may read them
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
+def invalidate(username: str):
+    """Forget the account's saved session, e.g. after it failed validation"""
+    with _lock_for(username):
+        try:
+            os.remove(_session_path(username))
+        except FileNotFoundError:
+            pass
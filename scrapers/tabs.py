@@ -0,0 +1,90 @@
+# scrapers/tabs.py
+#
+# Several jobs in one browser. A TabbedBrowser hands out tabs of one WebDriver
+# session; each tab is a driver object of its own that the step engine, the
+# grid extractor and the download capture use exactly like a whole browser.
+#
+# WebDriver has one "current window" per session, so every command a tab
+# sends takes the browser's lock and first switches to that tab if another one
+# was active. Jobs run in their own threads and spend most of their time
+# waiting on readiness conditions between commands; the lock is free while
+# they wait, so the tabs' flows interleave command by command. One long
+# command (an async script waiting on the page) holds the session for its
+# duration - chromedriver runs a session's commands one at a time anyway.
+import copy
+import threading
+
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+
+
+class TabbedBrowser:
+    """Tabs of one authenticated browser, each leased to a different job"""
+
+    def __init__(self, driver, on_open=None):
+        self.driver = driver
+        self.on_open = on_open  # called with each new tab, e.g. to apply URL blocking
+        self.lock = threading.RLock()
+        self.home = driver.current_window_handle
+        self.active = self.home
+        self._tabs = {}  # handle -> tab driver
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self._tabs)
+
+    def open(self):
+        """A driver bound to a tab of its own; the first reuses the window the browser started with"""
+        with self.lock:
+            if self.home not in self._tabs:
+                handle = self.home
+            else:
+                self._switch(self.home)
+                self.driver.switch_to.new_window("tab")
+                handle = self.active = self.driver.current_window_handle
+            tab = _tab_driver(self, handle)
+            self._tabs[handle] = tab
+        if self.on_open and handle != self.home:
+            self.on_open(tab)
+        return tab
+
+    def close(self, tab):
+        """Close a job's tab; the home tab is parked on a blank page instead"""
+        with self.lock:
+            self._tabs.pop(tab.handle, None)
+            self._switch(tab.handle)
+            if tab.handle == self.home:
+                self.driver.get("about:blank")
+            else:
+                self.driver.close()
+                self.driver.switch_to.window(self.home)
+                self.active = self.home
+
+    def _switch(self, handle: str):
+        if self.active != handle:
+            self.driver.switch_to.window(handle)
+            self.active = handle
+
+
+def _tab_driver(browser: TabbedBrowser, handle: str):
+    """A shallow copy of the browser's driver whose commands all run in one tab"""
+    tab = copy.copy(browser.driver)
+    # Elements and switch_to route their commands through the driver they belong to
+    tab._switch_to = SwitchTo(tab)
+    tab.handle = handle
+    tab.shares_browser = True
+    base_execute = type(browser.driver).execute
+
+    def execute(driver_command, params=None):
+        with browser.lock:
+            if browser.active != handle:
+                base_execute(tab, Command.SWITCH_TO_WINDOW, {"handle": handle})
+                browser.active = handle
+            return base_execute(tab, driver_command, params)
+
+    def quit():
+        browser.close(tab)
+
+    tab.execute = execute
+    tab.quit = quit
+    return tab
@@ -0,0 +1,320 @@
+# scrapers/telemetry.py
+#
+# Timed spans around scraper steps, a small in-process metrics registry
+# rendered in the Prometheus text format, and optional export of the spans as
+# OTLP/JSON lines (readable by the OpenTelemetry collector's otlpjsonfile
+# receiver). Each process keeps its own metrics; workers serve them on
+# --metrics-port.
+import os
+import json
+import time
+import threading
+import functools
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")  # e.g. data/traces.jsonl
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "unified-scraper")
+
+STEP_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+SCRAPE_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1200)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+
+# --- Metrics ---
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value) -> list:
+        return [f"{self.name}{self._format_labels(key)} {value}"]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = STEP_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_value(self, key, value) -> list:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': le})} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Read when metrics are rendered: `fn()` returns a number or a list of (labels, value)"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn, labels: tuple = ()):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+
+    def render(self) -> list:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        samples = value if isinstance(value, list) else [({}, value)]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, sample in samples:
+            lines.append(f"{self.name}{self._format_labels(self._key(labels))} {sample}")
+        return lines
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def register_gauge(name: str, help_text: str, fn, labels: tuple = ()) -> Gauge:
+    with _registry_lock:
+        _registry[name] = Gauge(name, help_text, fn, labels)
+        return _registry[name]
+
+
+def register_runtime_gauges(executor=None, pool=None, accounts=None):
+    """Gauges for a process's scrape executor backlog, its browser pool and per-account admission"""
+    if executor is not None:
+        # Submitted work not yet picked up by a thread
+        register_gauge("scraper_executor_queue_depth", "Scrapes waiting for an executor thread",
+                       lambda: executor._work_queue.qsize())
+    if pool is not None:
+        def browsers():
+            stats = pool.stats().values()
+            live = sum(s["live"] for s in stats)
+            idle = sum(s["idle"] for s in stats)
+            return [({"state": "leased"}, live - idle), ({"state": "idle"}, idle)]
+        register_gauge("browsers", "Live pooled browsers by state", browsers, ("state",))
+        register_gauge("browser_tabs", "Jobs running in tabs of shared browsers",
+                       lambda: sum(s.get("tabs", 0) for s in pool.stats().values()))
+    if accounts is not None:
+        register_gauge("account_queue_depth", "Scrapes waiting for their account's turn",
+                       lambda: accounts.gauge_samples("queued"), ("account",))
+        register_gauge("account_in_flight", "Scrapes running per account",
+                       lambda: accounts.gauge_samples("in_flight"), ("account",))
+        register_gauge("account_concurrency_limit", "Adaptive concurrency limit per account",
+                       lambda: accounts.gauge_samples("limit"), ("account",))
+
+
+def render_metrics() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+STEP_SECONDS = _register(Histogram(
+    "scraper_step_seconds", "Duration of scraper steps", ("flow", "step", "outcome"), STEP_BUCKETS
+))
+STEPS_TOTAL = _register(Counter(
+    "scraper_steps_total", "Scraper steps by outcome", ("flow", "step", "outcome")
+))
+SCRAPE_SECONDS = _register(Histogram(
+    "scrape_seconds", "End-to-end duration of scrapes", ("endpoint", "mode", "outcome"), SCRAPE_BUCKETS
+))
+EXPORT_BYTES = _register(Histogram(
+    "export_file_bytes", "Size of exported files", ("endpoint",), SIZE_BUCKETS
+))
+BROWSERS_REAPED = _register(Counter(
+    "browser_processes_reaped_total", "Browser processes killed by the supervisor", ("reason",)
+))
+BROWSERS_RECYCLED = _register(Counter(
+    "browsers_recycled_total", "Browsers retired for going over a memory or lifetime limit", ("reason",)
+))
+
+
+# --- Spans ---
+
+_current = contextvars.ContextVar("telemetry_span", default=None)
+_export_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, name: str, attributes: dict, parent=None, root: bool = False):
+        self.name = name
+        self.root = root
+        self.attributes = dict(attributes)
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.flow = attributes.get("flow") or (parent.flow if parent else "")
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.outcome = "ok"
+        self.error = None
+
+    @property
+    def seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, _root: bool = False, **attributes):
+    """
+    Time a block as a span of the current trace. Records its duration and
+    outcome ("ok", "error", or "aborted" for ScrapeAborted-style stops).
+    """
+    parent = _current.get()
+    current = Span(name, attributes, parent, root=_root)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        # Matched by name: base_scraper imports this module, not the other way round
+        aborted = any(cls.__name__ == "ScrapeAborted" for cls in type(e).__mro__)
+        current.outcome = "aborted" if aborted else "error"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        _record(current)
+
+
+def current_flow() -> str:
+    """Endpoint of the scrape running in this context, or "" outside one"""
+    current = _current.get()
+    return current.flow if current else ""
+
+
+def trace(endpoint: str, mode: str = ""):
+    """Root span of one scrape; its duration also feeds the end-to-end latency histogram"""
+    return span(endpoint, _root=True, flow=endpoint, mode=mode)
+
+
+def traced(endpoint: str):
+    """Decorator running a scrape function inside a root span and recording its file's size"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace(endpoint, mode=kwargs.get("mode", "browser")):
+                result = fn(*args, **kwargs)
+            if isinstance(result, dict) and result.get("file_path"):
+                record_export(endpoint, result["file_path"])
+            return result
+        return wrapper
+    return decorate
+
+
+def record_export(endpoint: str, file_path: str):
+    try:
+        EXPORT_BYTES.observe(os.path.getsize(file_path), endpoint=endpoint)
+    except OSError:
+        pass
+
+
+def _record(current: Span):
+    if current.root:
+        SCRAPE_SECONDS.observe(
+            current.seconds, endpoint=current.flow, mode=current.attributes.get("mode", ""), outcome=current.outcome
+        )
+    else:
+        STEP_SECONDS.observe(current.seconds, flow=current.flow, step=current.name, outcome=current.outcome)
+        STEPS_TOTAL.inc(flow=current.flow, step=current.name, outcome=current.outcome)
+    if TRACE_EXPORT_PATH:
+        try:
+            _export(current)
+        except OSError as e:
+            print(f"⚠️ Could not export span: {e}")
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _export(current: Span):
+    """Append the span as one OTLP/JSON `resourceSpans` line"""
+    attributes = dict(current.attributes, outcome=current.outcome)
+    record = {
+        "traceId": current.trace_id,
+        "spanId": current.span_id,
+        "name": current.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(current.start_ns),
+        "endTimeUnixNano": str(current.end_ns),
+        "attributes": [_attribute(k, v) for k, v in attributes.items()],
+        "status": {"code": 2, "message": current.error} if current.outcome == "error" else {"code": 1},
+    }
+    if current.parent is not None:
+        record["parentSpanId"] = current.parent.span_id
+    line = json.dumps({
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                _attribute("service.name", SERVICE_NAME), _attribute("process.pid", os.getpid())
+            ]},
+            "scopeSpans": [{"scope": {"name": "scrapers.telemetry"}, "spans": [record]}],
+        }]
+    })
+    with _export_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(TRACE_EXPORT_PATH)), exist_ok=True)
+        with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
@@ -0,0 +1,351 @@
+# service/accounts.py
+#
+# Per-account admission in front of the scraper executor. Each SmartScout
+# username gets a token bucket (scrape starts per minute) and a concurrency
+# limit that adapts AIMD-style: it creeps up while scrapes are fast and healthy
+# and halves on slow scrapes, timeouts and failed logins. Queued work is handed
+# to the executor round-robin across accounts, so one busy account cannot
+# starve the others. Limits are per process; each worker keeps its own.
+import os
+import math
+import time
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, Future
+
+from selenium.common.exceptions import TimeoutException
+
+from scrapers.smartscout.auth import LoginFailed
+from service.jobs import QueueFull, caused_by
+from service.credentials import account_id
+
+# Defaults to what the account's browsers can run: pool size x tabs per browser
+ACCOUNT_MAX_CONCURRENCY = int(os.getenv("ACCOUNT_MAX_CONCURRENCY", str(
+    int(os.getenv("SMARTSCOUT_POOL_SIZE", "3")) * int(os.getenv("SMARTSCOUT_TABS_PER_BROWSER", "1"))
+)))
+ACCOUNT_INITIAL_CONCURRENCY = float(os.getenv("ACCOUNT_INITIAL_CONCURRENCY", "2"))
+ACCOUNT_RATE_PER_MINUTE = float(os.getenv("ACCOUNT_RATE_PER_MINUTE", "6"))
+ACCOUNT_BURST = int(os.getenv("ACCOUNT_BURST", "3"))
+ACCOUNT_LATENCY_TARGET = float(os.getenv("ACCOUNT_LATENCY_TARGET", "180"))  # slower scrapes count as congestion
+ACCOUNT_BACKOFF = float(os.getenv("ACCOUNT_BACKOFF", "0.5"))
+ACCOUNT_LOGIN_COOLDOWN = float(os.getenv("ACCOUNT_LOGIN_COOLDOWN", "60"))  # no new starts after a failed login
+ACCOUNT_IDLE_FORGET = 3600
+# Synchronous scrapes waiting for a slot, across accounts; more are refused with 429
+SCRAPE_QUEUE_LIMIT = int(os.getenv("SCRAPE_QUEUE_LIMIT", "20"))
+RETRY_AFTER_MAX = 300
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        if self.rate <= 0:
+            return True  # unlimited
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def drain(self, now: float):
+        self._refill(now)
+        self.tokens = 0.0
+
+
+class AccountState:
+    def __init__(self, username: str, limit: float, rate_per_minute: float, burst: int):
+        self.username = username
+        self.id = account_id(username)
+        self.limit = limit
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.queue = deque()  # (future, fn, args, kwargs)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_active = time.monotonic()
+        self.completed = self.failed = self.login_failures = self.timeouts = self.slow = 0
+        self.latency_ewma = None
+
+    @property
+    def concurrency(self) -> int:
+        return max(1, int(self.limit))
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        return {
+            "account": self.id,
+            "limit": round(self.limit, 2),
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queued": len(self.queue),
+            "tokens": round(self.bucket.tokens, 2),
+            "paused_for": round(max(0.0, self.paused_until - now), 1),
+            "latency_ewma": round(self.latency_ewma, 2) if self.latency_ewma is not None else None,
+            "completed": self.completed,
+            "failed": self.failed,
+            "slow": self.slow,
+            "timeouts": self.timeouts,
+            "login_failures": self.login_failures,
+        }
+
+
+class AccountScheduler:
+    """
+    Queues work per account and submits it to `executor` when the account has a
+    free slot and a token and fewer than `capacity` tasks are running overall.
+    Accounts with ready work are served round-robin. Sheddable submissions are
+    refused with QueueFull once `queue_limit` tasks are waiting.
+    """
+
+    def __init__(self, executor, capacity: int, max_concurrency: int = ACCOUNT_MAX_CONCURRENCY,
+                 initial_concurrency: float = ACCOUNT_INITIAL_CONCURRENCY,
+                 rate_per_minute: float = ACCOUNT_RATE_PER_MINUTE, burst: int = ACCOUNT_BURST,
+                 latency_target: float = ACCOUNT_LATENCY_TARGET, backoff: float = ACCOUNT_BACKOFF,
+                 login_cooldown: float = ACCOUNT_LOGIN_COOLDOWN, queue_limit: int = SCRAPE_QUEUE_LIMIT):
+        self.executor = executor
+        self.capacity = max(1, capacity)
+        self.queue_limit = queue_limit
+        self.max_concurrency = max(1, max_concurrency)
+        self.initial_concurrency = min(max(1.0, initial_concurrency), self.max_concurrency)
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.login_cooldown = login_cooldown
+        self._accounts = {}   # username (lowercased) -> AccountState
+        self._ring = deque()  # usernames with queued work, in serving order
+        self._running = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._dispatch_loop, name="account-scheduler", daemon=True)
+        self._thread.start()
+
+    # --- submission ---
+
+    def submit(self, username: str, fn, *args, **kwargs) -> Future:
+        return self._submit(username, fn, args, kwargs)
+
+    def _submit(self, username: str, fn, args, kwargs, shed: bool = False) -> Future:
+        future = Future()
+        key = (username or "").strip().lower()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Account scheduler is shut down")
+            if shed:
+                self._drop_cancelled_locked()
+                queued = sum(len(s.queue) for s in self._accounts.values())
+                if queued >= self.queue_limit:
+                    raise QueueFull(f"Scrape queue is full ({queued} waiting)", self._retry_after_locked(queued))
+            state = self._accounts.get(key)
+            if state is None:
+                state = self._accounts[key] = AccountState(
+                    key, self.initial_concurrency, self.rate_per_minute, self.burst
+                )
+            state.queue.append((future, fn, args, kwargs))
+            state.last_active = time.monotonic()
+            if key not in self._ring:
+                self._ring.append(key)
+            self._cond.notify_all()
+        return future
+
+    def executor_for(self, username: str, shed: bool = False):
+        """
+        Executor-like view whose `submit(fn, ...)` queues under `username`; with
+        `shed` it raises QueueFull instead of queueing past the limit.
+        """
+        return _AccountExecutor(self, username, shed)
+
+    def shutdown(self, cancel_futures: bool = True):
+        """
+        Stop dispatching. Queued work is cancelled, or with `cancel_futures=False`
+        started first as limits allow; running work finishes on the executor.
+        """
+        with self._cond:
+            if cancel_futures:
+                for state in self._accounts.values():
+                    while state.queue:
+                        state.queue.popleft()[0].cancel()
+            else:
+                while any(state.queue for state in self._accounts.values()):
+                    self._cond.wait()
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    # --- dispatch ---
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._closed:
+                wait = self._dispatch_locked()
+                self._forget_idle_locked()
+                self._cond.wait(timeout=wait)
+
+    def _dispatch_locked(self):
+        """Start every task that may start now; returns seconds until a throttled one could"""
+        next_ready = None
+        progressed = True
+        while progressed and self._running < self.capacity and self._ring:
+            progressed = False
+            # One task per account per pass keeps the share even
+            for _ in range(len(self._ring)):
+                if self._running >= self.capacity:
+                    break
+                key = self._ring.popleft()
+                state = self._accounts[key]
+                now = time.monotonic()
+                while state.queue and state.queue[0][0].cancelled():
+                    state.queue.popleft()  # cancelled while queued
+                if not state.queue:
+                    continue  # leaves the ring until new work arrives
+                self._ring.append(key)
+                if state.in_flight >= state.concurrency:
+                    continue
+                if now < state.paused_until:
+                    next_ready = _earliest(next_ready, state.paused_until - now)
+                    continue
+                if not state.bucket.take(now):
+                    next_ready = _earliest(next_ready, state.bucket.wait_time(now))
+                    continue
+                future, fn, args, kwargs = state.queue.popleft()
+                progressed = True
+                if future.set_running_or_notify_cancel():
+                    self._start_locked(state, future, fn, args, kwargs)
+        return next_ready
+
+    def _start_locked(self, state: AccountState, future: Future, fn, args, kwargs):
+        state.in_flight += 1
+        self._running += 1
+        started = time.monotonic()
+
+        def run():
+            return fn(*args, **kwargs)
+
+        def finished(work):
+            error = work.exception() if not work.cancelled() else None
+            with self._cond:
+                state.in_flight -= 1
+                self._running -= 1
+                self._adapt_locked(state, time.monotonic() - started, error)
+                self._cond.notify_all()
+            if work.cancelled():
+                future.set_exception(CancelledError())
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(work.result())
+
+        try:
+            self.executor.submit(run).add_done_callback(finished)
+        except BaseException as e:
+            state.in_flight -= 1
+            self._running -= 1
+            future.set_exception(e)
+
+    # --- adaptation ---
+
+    def _adapt_locked(self, state: AccountState, seconds: float, error):
+        """AIMD: +1/limit per healthy scrape, x backoff on congestion signals"""
+        state.last_active = time.monotonic()
+        if error is None:
+            state.completed += 1
+            state.latency_ewma = seconds if state.latency_ewma is None else 0.8 * state.latency_ewma + 0.2 * seconds
+        else:
+            state.failed += 1
+
+        if error is not None and caused_by(error, LoginFailed):
+            state.login_failures += 1
+            state.paused_until = time.monotonic() + self.login_cooldown
+            state.bucket.drain(time.monotonic())
+            self._decrease(state, "login failed")
+        elif error is not None and caused_by(error, (TimeoutException, TimeoutError)):
+            state.timeouts += 1
+            self._decrease(state, "timed out")
+        elif error is None and seconds > self.latency_target:
+            state.slow += 1
+            self._decrease(state, f"took {seconds:.0f}s")
+        elif error is None:
+            state.limit = min(self.max_concurrency, state.limit + 1 / state.limit)
+
+    def _decrease(self, state: AccountState, reason: str):
+        before = state.concurrency
+        state.limit = max(1.0, state.limit * self.backoff)
+        if state.concurrency < before:
+            print(f"🐢 Account {state.id}: {reason}, concurrency {before} -> {state.concurrency}")
+
+    def _drop_cancelled_locked(self):
+        """Forget queued work whose waiters have gone, so it no longer counts against the limit"""
+        for state in self._accounts.values():
+            if any(item[0].cancelled() for item in state.queue):
+                state.queue = deque(item for item in state.queue if not item[0].cancelled())
+
+    def _retry_after_locked(self, queued: int) -> int:
+        """Seconds until the queue has likely drained enough to admit another scrape"""
+        latencies = [s.latency_ewma for s in self._accounts.values() if s.latency_ewma is not None]
+        per_scrape = sum(latencies) / len(latencies) if latencies else self.latency_target / 3
+        return int(min(RETRY_AFTER_MAX, max(1, math.ceil((queued - self.queue_limit + 1) * per_scrape / self.capacity))))
+
+    def _forget_idle_locked(self):
+        cutoff = time.monotonic() - ACCOUNT_IDLE_FORGET
+        for key in [k for k, s in self._accounts.items()
+                    if not s.queue and not s.in_flight and s.last_active < cutoff]:
+            del self._accounts[key]
+
+    # --- status ---
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return sum(len(s.queue) for s in self._accounts.values())
+
+    def concurrency_of(self, username: str) -> int:
+        """An account's current concurrency limit (the starting one before its first scrape)"""
+        with self._cond:
+            state = self._accounts.get((username or "").strip().lower())
+            return state.concurrency if state is not None else max(1, int(self.initial_concurrency))
+
+    def saturated_accounts(self) -> set:
+        """Ids of accounts whose running and waiting work already fills their concurrency limit"""
+        with self._cond:
+            return {s.id for s in self._accounts.values() if s.in_flight + len(s.queue) >= s.concurrency}
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "running": self._running,
+                "accounts": [s.status() for s in self._accounts.values()],
+            }
+
+    def gauge_samples(self, field: str) -> list:
+        """(labels, value) pairs of one status field per account, for metrics gauges"""
+        return [({"account": s["account"]}, s[field]) for s in self.stats()["accounts"]]
+
+
+class _AccountExecutor:
+    def __init__(self, scheduler: AccountScheduler, username: str, shed: bool = False):
+        self.scheduler = scheduler
+        self.username = username
+        self.shed = shed
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.scheduler._submit(self.username, fn, args, kwargs, shed=self.shed)
+
+
+def _earliest(current, candidate: float) -> float:
+    candidate = max(0.05, candidate)
+    return candidate if current is None else min(current, candidate)
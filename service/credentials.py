@@ -0,0 +1,84 @@
+# service/credentials.py
+#
+# Encryption of the SmartScout logins that queued jobs and watchlist entries
+# keep until they run. The SQLite stores only hold Fernet tokens; the key comes
+# from CREDENTIALS_KEY, or is generated once into a file readable only by its
+# owner, which the API and worker processes of one host share.
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+from cryptography.fernet import Fernet, InvalidToken
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CREDENTIALS_KEY = os.getenv("CREDENTIALS_KEY")
+CREDENTIALS_KEY_PATH = Path(os.getenv("CREDENTIALS_KEY_PATH", PROJECT_ROOT / "data" / "credentials.key"))
+
+_fernet = None
+_fernet_lock = threading.Lock()
+
+
+class CredentialsError(Exception):
+    """Stored credentials could not be decrypted (the key changed or is missing)"""
+
+
+def account_id(username: str) -> str:
+    """Short hash naming an account in metrics, status output and the job table, so emails are not exposed"""
+    return hashlib.sha256((username or "").strip().lower().encode("utf-8")).hexdigest()[:12]
+
+
+def _load_key() -> bytes:
+    if CREDENTIALS_KEY:
+        return CREDENTIALS_KEY.encode("utf-8")
+    try:
+        return CREDENTIALS_KEY_PATH.read_bytes().strip()
+    except FileNotFoundError:
+        pass
+    CREDENTIALS_KEY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CREDENTIALS_KEY_PATH.with_suffix(f".{os.getpid()}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(Fernet.generate_key())
+    try:
+        # Linking fails if another process created the key first; theirs wins
+        os.link(tmp_path, CREDENTIALS_KEY_PATH)
+        print(f"🔑 Generated credentials key: {CREDENTIALS_KEY_PATH}")
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+    return CREDENTIALS_KEY_PATH.read_bytes().strip()
+
+
+def _cipher() -> Fernet:
+    global _fernet
+    with _fernet_lock:
+        if _fernet is None:
+            _fernet = Fernet(_load_key())
+        return _fernet
+
+
+def seal(credentials: dict) -> str:
+    """Encrypted form of a credentials dict, the only form that is stored"""
+    return _cipher().encrypt(json.dumps(credentials).encode("utf-8")).decode("ascii")
+
+
+def unseal(token: str) -> dict:
+    """Credentials dict back from `seal()`; rows written before encryption are still read"""
+    if token.lstrip().startswith("{"):
+        return json.loads(token)
+    try:
+        return json.loads(_cipher().decrypt(token.encode("ascii")))
+    except InvalidToken:
+        raise CredentialsError("Stored credentials cannot be decrypted; was CREDENTIALS_KEY changed?")
+
+
+def seal_plaintext_rows(conn, table: str):
+    """Encrypt the `credentials` column of rows an earlier version stored in the clear"""
+    rows = conn.execute(f"SELECT id, credentials FROM {table} WHERE credentials LIKE '{{%'").fetchall()
+    for row in rows:
+        conn.execute(f"UPDATE {table} SET credentials = ? WHERE id = ?", (seal(json.loads(row[1])), row[0]))
+    if rows:
+        print(f"🔒 Encrypted stored credentials of {len(rows)} {table} row(s)")
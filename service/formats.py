@@ -0,0 +1,406 @@
+# service/formats.py
+#
+# Output-format layer for export files. The CSV is read row by row and
+# re-encoded on the fly, so large exports are never held in memory, with
+# optional column projection, row predicates and response compression.
+import re
+import csv
+import json
+import zlib
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+try:
+    import zstandard
+except ImportError:  # zstd encoding is optional
+    zstandard = None
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+}
+ACCEPT_ALIASES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "json",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+BATCH_ROWS = 5000
+CHUNK_BYTES = 64 * 1024
+
+PREDICATE_RE = re.compile(r"^\s*(.+?)\s*(<=|>=|!=|=|<|>|~)\s*(.*?)\s*$")
+# Plain decimals only: optional sign, digits (optionally grouped by thousands commas), optional fraction.
+# A leading zero ("0316769487") marks an identifier, not a number.
+NUMBER_RE = re.compile(r"^[+-]?(?:0|[1-9]\d{0,2}(?:,\d{3})+|[1-9]\d*)(?:\.\d+)?$")
+# Columns that hold codes, never numbers, whatever their values look like
+IDENTIFIER_RE = re.compile(r"(?:^|[\s_])(?:asin|upc|ean|isbn|gtin|sku|id)s?$", re.IGNORECASE)
+CAMEL_IDENTIFIER_RE = re.compile(r"[a-z](?:Asin|Upc|Ean|Isbn|Gtin|Sku|Id)s?$")
+
+
+class FormatError(ValueError):
+    """Unsupported format, unknown column or malformed predicate"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class Predicate:
+    column: str
+    op: str
+    value: str
+
+    def matches(self, row: dict) -> bool:
+        actual = row.get(self.column)
+        if self.op == "~":
+            return self.value.lower() in (actual or "").lower()
+        number = _to_number(actual)
+        target = _to_number(self.value)
+        if number is not None and target is not None:
+            actual, expected = number, target
+        else:
+            actual, expected = (actual or ""), self.value
+            if self.op not in ("=", "!="):
+                return False  # ordering only makes sense for numbers
+        return {
+            "=": actual == expected,
+            "!=": actual != expected,
+            "<": actual < expected,
+            "<=": actual <= expected,
+            ">": actual > expected,
+            ">=": actual >= expected,
+        }[self.op]
+
+
+@dataclass
+class OutputOptions:
+    format: str = "csv"
+    columns: Optional[List[str]] = None
+    predicates: List[Predicate] = field(default_factory=list)
+    encoding: str = "identity"
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+    @property
+    def is_passthrough(self) -> bool:
+        """The stored CSV can be sent as-is"""
+        return self.format == "csv" and not self.columns and not self.predicates and self.encoding == "identity"
+
+    def variant(self) -> str:
+        """Stable description of the transformation, for ETags"""
+        return json.dumps([
+            self.format, self.columns, [(p.column, p.op, p.value) for p in self.predicates], self.encoding
+        ])
+
+
+def parse_predicate(text: str) -> Predicate:
+    """Parse `column<op>value`, e.g. `Latest Rank<=10` or `Subcategory~faucet`"""
+    match = PREDICATE_RE.match(text)
+    if not match or not match.group(1):
+        raise FormatError(f"Invalid filter '{text}', expected column<op>value with op in = != < <= > >= ~")
+    return Predicate(*match.groups())
+
+
+def negotiate_format(explicit: str = None, accept: str = "") -> str:
+    """`format=` wins; otherwise the first supported type in the Accept header; CSV by default"""
+    if explicit:
+        fmt = explicit.lower()
+        if fmt not in MEDIA_TYPES:
+            raise FormatError(f"Unsupported format '{explicit}'", status_code=406)
+    else:
+        fmt = "csv"
+        for media_range in _by_quality(accept):
+            if media_range in ACCEPT_ALIASES:
+                fmt = ACCEPT_ALIASES[media_range]
+                break
+    if fmt == "parquet" and pa is None:
+        raise FormatError("Parquet output requires pyarrow", status_code=406)
+    return fmt
+
+
+def negotiate_encoding(accept_encoding: str = "") -> str:
+    accepted = set(_by_quality(accept_encoding))
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def output_options(query: dict, headers: dict) -> OutputOptions:
+    """Build options from `format`, `columns` and repeated `where` query parameters plus headers"""
+    columns = query.get("columns")
+    return OutputOptions(
+        format=negotiate_format(query.get("format"), headers.get("accept", "")),
+        columns=[c.strip() for c in columns.split(",") if c.strip()] if columns else None,
+        predicates=[parse_predicate(p) for p in query.get("where", [])],
+        encoding=negotiate_encoding(headers.get("accept-encoding", "")),
+    )
+
+
+def _by_quality(header: str) -> list:
+    """Values of an Accept-style header ordered by q, dropping q=0"""
+    items = []
+    for position, part in enumerate(header.split(",")):
+        value, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0
+        if value and quality > 0:
+            items.append((-quality, position, value.lower()))
+    return [value for _, _, value in sorted(items)]
+
+
+def _to_number(value):
+    """int/float for a plain decimal string (see NUMBER_RE), None for anything else"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not NUMBER_RE.match(text):
+        return None
+    text = text.replace(",", "")
+    return float(text) if "." in text else int(text)
+
+
+def _is_identifier(column: str) -> bool:
+    column = column.strip()
+    return bool(IDENTIFIER_RE.search(column) or CAMEL_IDENTIFIER_RE.search(column))
+
+
+def _typed(value, column: str):
+    """CSV string -> int/float when it is a plain decimal outside identifier columns, None when empty"""
+    if value == "" or value is None:
+        return None
+    number = None if _is_identifier(column) else _to_number(value)
+    return value if number is None else number
+
+
+def _json(columns, row) -> str:
+    # Numbers come from NUMBER_RE, so NaN/Infinity never reach the encoder; refuse them if they do
+    return json.dumps({c: _typed(row[c], c) for c in columns}, allow_nan=False)
+
+
+# --- Reading ---
+
+def iter_rows(file_path: str, options: OutputOptions):
+    """Yield (columns, row iterator) for the CSV at `file_path`, applying projection and predicates"""
+    f = open(file_path, newline="", encoding="utf-8-sig")
+    reader = csv.DictReader(f)
+    header = reader.fieldnames or []
+    try:
+        columns = _selected_columns(header, options)
+    except FormatError:
+        f.close()
+        raise
+
+    def rows():
+        with f:
+            yield from _select(reader, columns, options)
+
+    return columns, rows()
+
+
+def _selected_columns(header: list, options: OutputOptions) -> list:
+    columns = options.columns or header
+    unknown = [c for c in columns + [p.column for p in options.predicates] if c not in header]
+    if unknown:
+        raise FormatError(f"Unknown column(s): {', '.join(unknown)}")
+    return columns
+
+
+def _select(rows, columns: list, options: OutputOptions):
+    for row in rows:
+        if all(p.matches(row) for p in options.predicates):
+            yield {c: row.get(c) for c in columns}
+
+
+# --- Encoders: each yields bytes ---
+
+def encode_csv(columns, rows):
+    buffer = _TextBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row[c] for c in columns])
+        if buffer.size >= CHUNK_BYTES:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def encode_ndjson(columns, rows):
+    chunk = []
+    size = 0
+    for row in rows:
+        line = _json(columns, row) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(chunk).encode("utf-8")
+            chunk, size = [], 0
+    yield "".join(chunk).encode("utf-8")
+
+
+def encode_json(columns, rows):
+    yield b"["
+    first = True
+    chunk = []
+    size = 0
+    for row in rows:
+        item = ("" if first else ",") + _json(columns, row)
+        first = False
+        chunk.append(item)
+        size += len(item)
+        if size >= CHUNK_BYTES:
+            yield "".join(chunk).encode("utf-8")
+            chunk, size = [], 0
+    yield ("".join(chunk) + "]").encode("utf-8")
+
+
+def encode_parquet(columns, rows):
+    """
+    One row group per BATCH_ROWS rows. Column types are fixed by the first
+    batch; a later value that does not fit its column's type fails the export.
+    """
+    sink = _ByteSink()
+    writer = None
+    kinds = None
+    batch = []
+
+    def flush():
+        nonlocal writer, kinds
+        if writer is None:
+            kinds = _column_kinds(columns, batch)
+            schema = pa.schema([(c, pa.float64() if kinds[c] else pa.string()) for c in columns])
+            writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        data = {c: [_conform(row[c], c, kinds[c]) for row in batch] for c in columns}
+        writer.write_table(pa.table(data, schema=writer.schema))
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            flush()
+            yield sink.drain()
+    if batch or writer is None:
+        flush()
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson, "json": encode_json, "parquet": encode_parquet}
+
+
+def _column_kinds(columns, rows) -> dict:
+    """True for columns whose non-empty values are all numeric (identifier columns never are)"""
+    kinds = {}
+    for c in columns:
+        values = [row[c] for row in rows if row[c] not in ("", None)]
+        kinds[c] = bool(values) and not _is_identifier(c) and all(_to_number(v) is not None for v in values)
+    return kinds
+
+
+def _conform(value, column: str, numeric: bool):
+    if value in ("", None):
+        return None
+    if numeric:
+        number = _to_number(value)
+        if number is None:
+            raise FormatError(
+                f"Column '{column}' was numeric in the first {BATCH_ROWS} rows but has the value "
+                f"'{value}'; request csv, ndjson or json for this export", status_code=500,
+            )
+        return float(number)
+    return str(value)
+
+
+class _TextBuffer:
+    """Write target for csv.writer that hands back UTF-8 chunks"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+
+    def drain(self) -> bytes:
+        data = "".join(self.parts).encode("utf-8")
+        self.parts, self.size = [], 0
+        return data
+
+
+class _ByteSink:
+    """Minimal writable file for ParquetWriter whose contents can be drained as they grow"""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+# --- Compression ---
+
+def compress(chunks, encoding: str):
+    if encoding == "identity":
+        yield from (c for c in chunks if c)
+        return
+    if encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    else:
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def render(file_path: str, options: OutputOptions):
+    """Byte stream of the export in the requested format, projection, filter and encoding"""
+    columns, rows = iter_rows(file_path, options)
+    return compress(ENCODERS[options.format](columns, rows), options.encoding)
+
+
+def render_rows(header: list, rows, options: OutputOptions):
+    """Like `render`, for rows that are already dicts (e.g. a snapshot delta)"""
+    columns = _selected_columns(header, options)
+    return compress(ENCODERS[options.format](columns, _select(rows, columns, options)), options.encoding)
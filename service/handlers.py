@@ -0,0 +1,95 @@
+# service/handlers.py
+#
+# Job handlers shared by the API's in-process runner and worker processes.
+# Each takes `(params, credentials, on_step)` and returns a result dict.
+# Scraper modules are imported when a handler first runs, not here.
+import os
+import csv
+import json
+import time
+
+from service.registry import load_scrapers
+from service.snapshots import record_snapshot
+
+
+def read_csv_rows(file_path: str) -> list:
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def rank_maker_batch_records(params: dict, credentials: dict, pool, on_step, snapshots=None):
+    """Per-ASIN NDJSON records (rows inlined, file removed), then a summary record"""
+    from scrapers.smartscout.scrapers.rank_maker import run_keyword_tools_batch
+    started = time.time()
+    succeeded = failed = 0
+    for result in run_keyword_tools_batch(
+        params["asins"],
+        credentials["username"],
+        credentials["password"],
+        max_rank=params["max_rank"],
+        pool=pool,
+        on_step=on_step
+    ):
+        if result["status"] == "success":
+            succeeded += 1
+            record_snapshot(snapshots, "smartscout/rank-maker",
+                            {"search_text": result["asin"], "max_rank": params["max_rank"]}, result)
+            file_path = result.pop("file_path")
+            result["rows"] = read_csv_rows(file_path)
+            result["row_count"] = len(result["rows"])
+            os.remove(file_path)
+        else:
+            failed += 1
+        yield result
+    yield {
+        "summary": {
+            "total": len(params["asins"]),
+            "succeeded": succeeded,
+            "failed": failed,
+            "seconds": round(time.time() - started, 2)
+        }
+    }
+
+
+def scraper_handler(spec, pool, snapshots=None, accounts=None):
+    """Handler running a registered scraper with the job's params and credentials"""
+
+    def handle(params: dict, credentials: dict, on_step):
+        kwargs = {name: params[name] for name in spec.params if name in params}
+        if spec.needs_account:
+            kwargs.update(username=credentials["username"], password=credentials["password"])
+            if "sessions" in kwargs and accounts is not None:
+                # Parallel browsers of one scrape stay within what the account is currently allowed
+                kwargs["sessions"] = min(kwargs["sessions"], accounts.concurrency_of(credentials["username"]))
+        if spec.needs_browser:
+            kwargs["pool"] = pool
+        result = spec.load()(on_step=on_step, **kwargs)
+        if spec.snapshots:
+            result = record_snapshot(snapshots, spec.name, params, result)
+        return result
+
+    return handle
+
+
+def build_handlers(pool, snapshots=None, scrapers=None, accounts=None) -> dict:
+    """
+    Handlers keyed by endpoint, leasing browsers from `pool` and recording
+    results in `snapshots`; `accounts` (an AccountScheduler) caps sessions
+    """
+    handlers = {
+        name: scraper_handler(spec, pool, snapshots, accounts)
+        for name, spec in (scrapers if scrapers is not None else load_scrapers()).items()
+    }
+
+    def rank_maker_batch(params: dict, credentials: dict, on_step):
+        # Lines are flushed as ASINs finish so the API can stream the file while it grows;
+        # a retried job appends, so readers that already saw earlier lines keep their place
+        output_path = params["output_path"]
+        with open(output_path, "a", encoding="utf-8") as f:
+            for record in rank_maker_batch_records(params, credentials, pool, on_step, snapshots):
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+        return {"file_path": output_path, "file_name": os.path.basename(output_path)}
+
+    handlers["smartscout/rank-maker/batch"] = rank_maker_batch
+    return handlers
@@ -0,0 +1,573 @@
+# service/jobs.py
+#
+# Asynchronous scrape jobs. Requests are stored in SQLite, picked up by a
+# runner that feeds the scraper executor, and their results are kept on disk
+# until they expire, so a dropped HTTP connection or a restart loses nothing.
+#
+# The queue is shared: the API can run jobs itself or only enqueue them for
+# separate worker processes (worker.py), which heartbeat into the same store.
+import abc
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import importlib
+import threading
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+from scrapers.errors import ScrapeAborted
+from service.result_cache import result_details
+from service.credentials import CredentialsError, account_id, seal, unseal, seal_plaintext_rows
+
+PROJECT_ROOT = Path(__file__).parent.parent
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH", PROJECT_ROOT / "data" / "jobs.sqlite3"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", str(24 * 60 * 60)))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+WORKER_HEARTBEAT_INTERVAL = int(os.getenv("WORKER_HEARTBEAT_INTERVAL", "5"))
+WORKER_STALE_AFTER = int(os.getenv("WORKER_STALE_AFTER", "30"))
+JOB_JANITOR_INTERVAL = 15
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED, EXPIRED = (
+    "queued", "running", "succeeded", "failed", "cancelled", "expired"
+)
+TERMINAL_STATES = (SUCCEEDED, FAILED, CANCELLED, EXPIRED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    params TEXT NOT NULL,
+    credentials TEXT,
+    account TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    progress TEXT,
+    error TEXT,
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, priority DESC, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    capacity INTEGER NOT NULL,
+    current_jobs TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+class QueueFull(Exception):
+    """The job queue is at its configured depth"""
+
+    def __init__(self, message: str, retry_after: int = 30):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobCancelled(ScrapeAborted):
+    """Raised inside a running job once cancellation was requested"""
+
+
+class QueueBackend(abc.ABC):
+    """
+    Interface of a job queue shared by the API and its workers. JobStore is the
+    SQLite implementation; another backend (e.g. on a database reachable from
+    several hosts) is selected with JOB_QUEUE_BACKEND=package.module:ClassName.
+    """
+
+    # producer side
+    @abc.abstractmethod
+    def enqueue(self, endpoint: str, params: dict, credentials: dict, priority: int = 0) -> str:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get(self, job_id: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def cancel(self, job_id: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def queue_depth(self) -> int:
+        raise NotImplementedError
+
+    # worker side
+    @abc.abstractmethod
+    def claim(self, worker_id: str = None, busy_accounts=()):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_progress(self, job_id: str, step: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def finish(self, job_id: str, state: str, result: dict = None, error: str = None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def heartbeat(self, worker_id: str, capacity: int, current_jobs: list):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def remove_worker(self, worker_id: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def workers(self) -> list:
+        raise NotImplementedError
+
+    # housekeeping
+    @abc.abstractmethod
+    def requeue_stale(self) -> int:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def expire_results(self) -> int:
+        raise NotImplementedError
+
+
+class JobStore(QueueBackend):
+    """SQLite-backed job table; every call uses its own connection, so it is thread-safe"""
+
+    def __init__(self, path: Path = JOBS_DB_PATH, queue_limit: int = JOB_QUEUE_LIMIT):
+        self.path = Path(path)
+        self.queue_limit = queue_limit
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "worker_id" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN worker_id TEXT")
+            if "account" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN account TEXT")
+                for row in conn.execute("SELECT id, credentials FROM jobs WHERE state = ?", (QUEUED,)).fetchall():
+                    try:
+                        username = unseal(row["credentials"]).get("username") if row["credentials"] else None
+                    except CredentialsError:
+                        username = None
+                    conn.execute("UPDATE jobs SET account = ? WHERE id = ?", (account_id(username), row["id"]))
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_account ON jobs (state, account)")
+            seal_plaintext_rows(conn, "jobs")
+        # Rows hold (encrypted) credentials until the job finishes
+        os.chmod(self.path, 0o600)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # --- producer side ---
+
+    def enqueue(self, endpoint: str, params: dict, credentials: dict, priority: int = 0) -> str:
+        job_id = uuid.uuid4().hex
+        with self._transaction() as conn:
+            depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+            if depth >= self.queue_limit:
+                raise QueueFull(f"Job queue is full ({depth} queued)")
+            conn.execute(
+                "INSERT INTO jobs (id, endpoint, params, credentials, account, priority, state, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, endpoint, json.dumps(params), seal(credentials), account_id(credentials.get("username")),
+                 priority, QUEUED, time.time()),
+            )
+        return job_id
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _to_dict(row) if row else None
+
+    def cancel(self, job_id: str):
+        """Cancel a queued job now, or flag a running one to stop at its next step"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, expires_at = ?, credentials = NULL WHERE id = ? AND state = ?",
+                (CANCELLED, now, now + JOB_RESULT_TTL, job_id, QUEUED),
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = ?", (job_id, RUNNING))
+        return self.get(job_id)
+
+    def queue_depth(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    # --- worker side ---
+
+    def claim(self, worker_id: str = None, busy_accounts=()):
+        """
+        Atomically move the next queued job to running on `worker_id`. Within a
+        priority, the account with the fewest running jobs goes first (oldest
+        job first among equals), so one account's backlog cannot take every
+        worker; accounts in `busy_accounts` (already at their limit) are skipped.
+        """
+        busy = list(busy_accounts)
+        skip = f"AND COALESCE(account, '') NOT IN ({', '.join('?' * len(busy))})" if busy else ""
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE state = ? {skip} ORDER BY priority DESC, "
+                "(SELECT COUNT(*) FROM jobs AS running WHERE running.state = ? AND running.account = jobs.account), "
+                "created_at LIMIT 1",
+                (QUEUED, *busy, RUNNING),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, started_at = ?, attempts = attempts + 1, progress = NULL, "
+                "worker_id = ? WHERE id = ?",
+                (RUNNING, time.time(), worker_id, row["id"]),
+            )
+        try:
+            job = _to_dict(row, include_credentials=True)
+        except CredentialsError as e:
+            self.finish(row["id"], FAILED, error=str(e))
+            return None
+        job["state"] = RUNNING
+        job["worker_id"] = worker_id
+        return job
+
+    def set_progress(self, job_id: str, step: str):
+        """Record the current step; returns True if the job should stop"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (step, job_id))
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def finish(self, job_id: str, state: str, result: dict = None, error: str = None,
+               result_ttl: int = JOB_RESULT_TTL):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ?, expires_at = ?, "
+                "credentials = NULL WHERE id = ?",
+                (state, json.dumps(result) if result else None, error, now, now + result_ttl, job_id),
+            )
+
+    def heartbeat(self, worker_id: str, capacity: int, current_jobs: list):
+        """Record that a worker is alive, how many jobs it can run and which it is running"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, host, pid, capacity, current_jobs, started_at, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                "capacity = excluded.capacity, current_jobs = excluded.current_jobs, last_seen = excluded.last_seen",
+                (worker_id, socket.gethostname(), os.getpid(), capacity, json.dumps(current_jobs), now, now),
+            )
+
+    def remove_worker(self, worker_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def workers(self, stale_after: int = WORKER_STALE_AFTER) -> list:
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM workers ORDER BY started_at").fetchall()
+        workers = []
+        for row in rows:
+            worker = dict(row)
+            worker["current_jobs"] = json.loads(worker["current_jobs"])
+            worker["alive"] = now - worker["last_seen"] <= stale_after
+            workers.append(worker)
+        return workers
+
+    def requeue_stale(self, stale_after: int = WORKER_STALE_AFTER, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+        """
+        Put jobs whose worker stopped heartbeating back in the queue, or fail them
+        once they have been interrupted too often; forget workers gone for good.
+        """
+        now = time.time()
+        cutoff = now - stale_after
+        orphaned = (
+            "state = ? AND (worker_id IS NULL OR worker_id NOT IN "
+            "(SELECT id FROM workers WHERE last_seen > ?))"
+        )
+        with self._transaction() as conn:
+            conn.execute(
+                f"UPDATE jobs SET state = ?, error = 'Interrupted too many times', finished_at = ?, "
+                f"expires_at = ?, credentials = NULL WHERE {orphaned} AND attempts >= ?",
+                (FAILED, now, now + JOB_RESULT_TTL, RUNNING, cutoff, max_attempts),
+            )
+            count = conn.execute(
+                f"UPDATE jobs SET state = ?, started_at = NULL, worker_id = NULL WHERE {orphaned}",
+                (QUEUED, RUNNING, cutoff),
+            ).rowcount
+            conn.execute("DELETE FROM workers WHERE last_seen <= ?", (now - 10 * stale_after,))
+        return count
+
+    def expire_results(self) -> int:
+        """
+        Delete the files of jobs past their expiry: results of succeeded jobs,
+        which are marked expired, and what failed or cancelled jobs left behind
+        (such as a batch's partial NDJSON output), which keep their state.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, state, params, result FROM jobs WHERE state IN (?, ?, ?) AND expires_at <= ?",
+                (SUCCEEDED, FAILED, CANCELLED, now),
+            ).fetchall()
+            for row in rows:
+                result, params = json.loads(row["result"] or "{}"), json.loads(row["params"])
+                for path in {result.get("file_path"), params.get("output_path")} - {None}:
+                    if os.path.exists(path):
+                        try:
+                            os.remove(path)
+                        except OSError as e:
+                            print(f"⚠️ Could not delete {path}: {e}")
+                if row["state"] == SUCCEEDED:
+                    conn.execute("UPDATE jobs SET state = ? WHERE id = ?", (EXPIRED, row["id"]))
+                else:
+                    conn.execute("UPDATE jobs SET expires_at = NULL WHERE id = ?", (row["id"],))
+        return len(rows)
+
+
+def load_queue_backend(spec: str = JOB_QUEUE_BACKEND) -> QueueBackend:
+    """`sqlite` for the local JobStore, or `package.module:ClassName` for another backend"""
+    if spec == "sqlite":
+        return JobStore()
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"JOB_QUEUE_BACKEND must be 'sqlite' or 'module:ClassName', got '{spec}'")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def wait_for_job(store: QueueBackend, job_id: str, poll: float = 0.5, on_step=None) -> dict:
+    """
+    Block until a job reaches a terminal state and return it. `on_step` is
+    called on every poll; if it raises, the job is cancelled.
+    """
+    while True:
+        if on_step:
+            try:
+                on_step("Waiting for worker")
+            except BaseException:
+                store.cancel(job_id)
+                raise
+        job = store.get(job_id)
+        if job is None:
+            raise RuntimeError(f"Job {job_id} disappeared")
+        if job["state"] in TERMINAL_STATES:
+            return job
+        time.sleep(poll)
+
+
+def run_via_queue(store: QueueBackend, endpoint: str, params: dict, credentials: dict, on_step=None,
+                  priority: int = 0) -> dict:
+    """Run a job on whichever worker claims it and return its result, for synchronous callers"""
+    job = wait_for_job(store, store.enqueue(endpoint, params, credentials, priority=priority), on_step=on_step)
+    if job["state"] != SUCCEEDED:
+        raise RuntimeError(job["error"] or f"Job {job['id']} {job['state']}")
+    return job["result"]
+
+
+def caused_by(error: BaseException, kind) -> bool:
+    """True if `error` or anything it was raised from is a `kind` (scrapers wrap their errors)"""
+    while error is not None:
+        if isinstance(error, kind):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _to_dict(row, include_credentials: bool = False) -> dict:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    credentials = job.pop("credentials")
+    if include_credentials:
+        job["credentials"] = unseal(credentials) if credentials else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def job_status(job: dict) -> dict:
+    """Public view of a job: state, progress step and timings"""
+    now = time.time()
+    started, finished = job["started_at"], job["finished_at"]
+    result = job["result"] or {}
+    return {
+        "job_id": job["id"],
+        "endpoint": job["endpoint"],
+        "state": job["state"],
+        "progress": job["progress"],
+        "priority": job["priority"],
+        "attempts": job["attempts"],
+        "worker_id": job.get("worker_id"),
+        "cancel_requested": job["cancel_requested"],
+        "error": job["error"],
+        "timings": {
+            "created_at": job["created_at"],
+            "started_at": started,
+            "finished_at": finished,
+            "queued_seconds": round((started or finished or now) - job["created_at"], 3),
+            "run_seconds": round((finished or now) - started, 3) if started else None,
+        },
+        "result": {
+            "file_name": result.get("file_name"),
+            "file_size": result.get("file_size"),
+            "expires_at": job["expires_at"],
+            **result_details(result),
+        } if job["state"] == SUCCEEDED else None,
+    }
+
+
+class JobRunner:
+    """
+    Feeds queued jobs into a thread pool without ever holding more than its
+    worker count, so jobs and synchronous requests share the same slots. Runs
+    inside the API or in a worker process, heartbeating under `worker_id`.
+
+    `handlers` maps an endpoint name to `fn(params, credentials, on_step) -> result dict`.
+    """
+
+    def __init__(self, store: QueueBackend, executor, workers: int, handlers: dict, worker_id: str = None):
+        self.store = store
+        self.executor = executor
+        self.handlers = handlers
+        self.capacity = workers
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._slots = threading.Semaphore(workers)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._closed = threading.Event()
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        self._heartbeat()
+        loops = (
+            (self._dispatch_loop, "job-dispatcher"),
+            (self._heartbeat_loop, "job-heartbeat"),
+            (self._janitor_loop, "job-janitor"),
+        )
+        for target, name in loops:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"👷 Worker {self.worker_id} running up to {self.capacity} job(s)")
+
+    def stop(self):
+        """Stop claiming jobs; running ones finish on the executor"""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def deregister(self):
+        """Stop heartbeating and drop the worker row, once the executor has drained"""
+        self._closed.set()
+        self.store.remove_worker(self.worker_id)
+
+    def notify(self):
+        """Wake the dispatcher after a job was enqueued"""
+        self._wakeup.set()
+
+    def current_jobs(self) -> list:
+        with self._running_lock:
+            return sorted(self._running)
+
+    def _dispatch_loop(self):
+        while not self._stopped.is_set():
+            self._slots.acquire()
+            self._wakeup.clear()
+            job = None
+            if not self._stopped.is_set():
+                # Jobs of accounts whose limit is already full would only wait in the scheduler, holding a slot
+                busy = self.executor.saturated_accounts() if hasattr(self.executor, "saturated_accounts") else ()
+                job = self.store.claim(self.worker_id, busy_accounts=busy)
+            if job is None:
+                self._slots.release()
+                # Other processes enqueue without notifying us, so poll as well
+                self._wakeup.wait(timeout=1)
+                continue
+            with self._running_lock:
+                self._running.add(job["id"])
+            executor = self.executor
+            if hasattr(executor, "executor_for"):
+                # An AccountScheduler queues the job under its account's limits
+                executor = executor.executor_for((job["credentials"] or {}).get("username"))
+            future = executor.submit(self._run, job)
+            future.add_done_callback(partial(self._done, job["id"]))
+
+    def _done(self, job_id: str, _future):
+        with self._running_lock:
+            self._running.discard(job_id)
+        self._slots.release()
+        # The account may have room again for a job that was skipped
+        self._wakeup.set()
+
+    def _run(self, job: dict):
+        job_id = job["id"]
+
+        def on_step(step: str):
+            if self.store.set_progress(job_id, step):
+                raise JobCancelled(f"Job {job_id} was cancelled")
+
+        try:
+            handler = self.handlers[job["endpoint"]]
+            on_step("Starting")
+            result = handler(job["params"], job["credentials"] or {}, on_step)
+            self.store.finish(job_id, SUCCEEDED, result=result)
+            print(f"✅ Job {job_id} finished")
+        except Exception as e:
+            if caused_by(e, JobCancelled):
+                self.store.finish(job_id, CANCELLED, error="Cancelled")
+                print(f"🛑 Job {job_id} cancelled")
+            else:
+                self.store.finish(job_id, FAILED, error=str(e))
+                print(f"❌ Job {job_id} failed: {e}")
+
+    def _heartbeat(self):
+        self.store.heartbeat(self.worker_id, self.capacity, self.current_jobs())
+
+    def _heartbeat_loop(self):
+        # Keeps beating while stopped jobs drain, so they are not re-queued under us
+        while not self._closed.wait(WORKER_HEARTBEAT_INTERVAL):
+            try:
+                self._heartbeat()
+            except Exception as e:
+                print(f"⚠️ Worker heartbeat failed: {e}")
+
+    def _janitor_loop(self):
+        while not self._stopped.wait(JOB_JANITOR_INTERVAL):
+            try:
+                requeued = self.store.requeue_stale()
+                if requeued:
+                    print(f"♻️ Re-queued {requeued} job(s) from unresponsive workers")
+                expired = self.store.expire_results()
+                if expired:
+                    print(f"🗑️ Expired {expired} job result(s)")
+            except Exception as e:
+                print(f"⚠️ Job janitor failed: {e}")
@@ -0,0 +1,193 @@
+# service/registry.py
+#
+# Scraper plugins. Every module under scrapers/<site>/scrapers/ that declares a
+# SCRAPER dict becomes an endpoint (sync scrape plus background job) without a
+# hand-written route. The declaration is read from the module's source, so the
+# module itself - and Selenium with it - is only imported the first time the
+# scraper runs. API-only replicas (SCRAPER_DISPATCH=workers) never load it.
+#
+#   SCRAPER = {
+#       "name": "smartscout/rank-maker",      # endpoint path and job name
+#       "summary": "Rank Maker keywords for an ASIN",
+#       "run": "run_keyword_tools_export",    # called with params, credentials, pool and on_step
+#       "params": {
+#           "search_text": {"type": "str"},
+#           "max_rank": {"type": "int", "default": 65, "ge": 1},
+#           "mode": {"type": "str", "choices": ["browser", "api"], "default": "browser",
+#                    "env": "SMARTSCOUT_EXPORT_MODE"},
+#           "sessions": {"type": "int", "default": 1, "cache": False},  # same result either way
+#       },
+#       "output": "csv",                      # returns {"file_path", "file_name", ...}
+#       "resources": ["browser", "account"],  # pooled browser; per-request login
+#       "snapshots": True,                    # kept in the snapshot history; with search_text, watchable
+#   }
+#
+# The SCRAPER dict must be a literal: no names, calls or f-strings.
+import os
+import ast
+import sys
+import functools
+import importlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Literal
+
+from pydantic import Field, create_model
+
+SCRAPERS_ROOT = Path(__file__).parent.parent / "scrapers"
+
+PARAM_TYPES = {"str": str, "int": int, "float": float, "bool": bool, "list[str]": List[str]}
+PARAM_CONSTRAINTS = ("ge", "le", "gt", "lt", "min_length", "max_length")
+OUTPUTS = ("csv",)
+RESOURCES = ("browser", "account")
+
+
+class RegistryError(Exception):
+    """A scraper module's SCRAPER declaration is invalid"""
+
+
+@dataclass
+class ScraperSpec:
+    name: str
+    module: str
+    run: str
+    params: dict = field(default_factory=dict)
+    output: str = "csv"
+    resources: tuple = ()
+    snapshots: bool = False
+    summary: str = ""
+
+    @property
+    def needs_browser(self) -> bool:
+        return "browser" in self.resources
+
+    @property
+    def needs_account(self) -> bool:
+        return "account" in self.resources
+
+    @property
+    def watchable(self) -> bool:
+        """Searches of scrapers with a snapshot history can be put on the watchlist"""
+        return self.snapshots and "search_text" in self.params
+
+    @property
+    def loaded(self) -> bool:
+        return self.module in sys.modules
+
+    def load(self):
+        """The scraper function; its module is imported on first use"""
+        return getattr(importlib.import_module(self.module), self.run)
+
+    def cache_params(self, params: dict) -> dict:
+        """Parameters that distinguish one result from another in the cache"""
+        return {name: params.get(name) for name, spec in self.params.items() if spec.get("cache", True)}
+
+    @functools.cached_property
+    def request_model(self) -> type:
+        fields = {name: _field(spec) for name, spec in self.params.items()}
+        if self.needs_account:
+            fields.update(username=(str, ...), password=(str, ...))
+        return create_model(_model_name(self.name, "Request"), **fields)
+
+    @functools.cached_property
+    def job_model(self) -> type:
+        return create_model(
+            _model_name(self.name, "JobRequest"), __base__=self.request_model,
+            priority=(int, Field(0, description="Higher runs first")),
+        )
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "summary": self.summary,
+            "params": self.params,
+            "output": self.output,
+            "resources": list(self.resources),
+            "snapshots": self.snapshots,
+            "loaded": self.loaded,
+        }
+
+
+def _field(spec: dict):
+    kind = PARAM_TYPES[spec.get("type", "str")]
+    if "choices" in spec:
+        kind = Literal[tuple(spec["choices"])]
+    default = spec.get("default", ...)
+    if spec.get("env") and os.getenv(spec["env"]) is not None:
+        default = os.getenv(spec["env"])
+        if spec.get("type") in ("int", "float"):
+            default = PARAM_TYPES[spec["type"]](default)
+    constraints = {key: spec[key] for key in PARAM_CONSTRAINTS if key in spec}
+    return (kind, Field(default, description=spec.get("description"), **constraints))
+
+
+def _model_name(name: str, suffix: str) -> str:
+    return "".join(part.capitalize() for part in name.replace("-", "/").split("/")) + suffix
+
+
+def read_declaration(path: Path):
+    """The module's SCRAPER literal, read from its source without importing it (None if absent)"""
+    tree = ast.parse(path.read_text(encoding="utf-8"), str(path))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "SCRAPER" for target in node.targets
+        ):
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError as e:
+                raise RegistryError(f"{path}: SCRAPER must be a literal dict") from e
+    return None
+
+
+def _spec(declaration: dict, module: str, path: Path) -> ScraperSpec:
+    if not isinstance(declaration, dict) or not declaration.get("name") or not declaration.get("run"):
+        raise RegistryError(f"{path}: SCRAPER needs at least 'name' and 'run'")
+    output = declaration.get("output", "csv")
+    if output not in OUTPUTS:
+        raise RegistryError(f"{path}: output must be one of {', '.join(OUTPUTS)}, got '{output}'")
+    resources = tuple(declaration.get("resources", ()))
+    unknown = [r for r in resources if r not in RESOURCES]
+    if unknown:
+        raise RegistryError(f"{path}: unknown resources {unknown}; expected {', '.join(RESOURCES)}")
+    params = declaration.get("params", {})
+    for name, spec in params.items():
+        if spec.get("type", "str") not in PARAM_TYPES:
+            raise RegistryError(f"{path}: parameter '{name}' has unknown type '{spec.get('type')}'")
+    return ScraperSpec(
+        name=declaration["name"].strip("/"),
+        module=module,
+        run=declaration["run"],
+        params=params,
+        output=output,
+        resources=resources,
+        snapshots=bool(declaration.get("snapshots", False)),
+        summary=declaration.get("summary", ""),
+    )
+
+
+def discover(root: Path = SCRAPERS_ROOT) -> dict:
+    """ScraperSpecs keyed by name, for every module under <root>/<site>/scrapers/ declaring one"""
+    specs = {}
+    for path in sorted(root.glob("*/scrapers/*.py")):
+        if path.name == "__init__.py":
+            continue
+        declaration = read_declaration(path)
+        if declaration is None:
+            continue
+        module = ".".join((root.name,) + path.relative_to(root).with_suffix("").parts)
+        spec = _spec(declaration, module, path)
+        if spec.name in specs:
+            raise RegistryError(f"Scraper '{spec.name}' is declared by both {specs[spec.name].module} and {module}")
+        specs[spec.name] = spec
+    return specs
+
+
+def watchable_endpoints(specs: dict) -> tuple:
+    return tuple(name for name, spec in specs.items() if spec.watchable)
+
+
+@functools.lru_cache(maxsize=None)
+def load_scrapers() -> dict:
+    specs = discover()
+    print(f"🧩 Registered scrapers: {', '.join(specs) or 'none'}")
+    return specs
@@ -0,0 +1,300 @@
+# service/result_cache.py
+#
+# Content-addressed cache of export files. Identical requests within an
+# endpoint's TTL are served from disk, and concurrent identical requests share
+# one in-flight scrape instead of each starting a browser. An in-flight scrape
+# that every waiter has abandoned is cancelled at its next step. A file still
+# being sent to a client is only deleted once that response has finished.
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+from scrapers.errors import ScrapeAborted
+
+PROJECT_ROOT = Path(__file__).parent.parent
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", PROJECT_ROOT / "data" / "result_cache"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "900"))
+
+
+def parse_ttls(spec: str) -> dict:
+    """Per-endpoint TTLs from "smartscout/niche-finder=3600,smartscout/rank-maker=600" """
+    ttls = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, seconds = item.partition("=")
+        ttls[endpoint.strip()] = int(seconds)
+    return ttls
+
+
+RESULT_CACHE_TTLS = parse_ttls(os.getenv("RESULT_CACHE_TTLS", ""))
+
+# Scraper result fields that tell how complete an export is; kept with the file for clients
+RESULT_DETAILS = ("cursor", "truncated", "keywords", "failed_keywords")
+
+
+def result_details(result: dict) -> dict:
+    """The RESULT_DETAILS a scraper result carries"""
+    return {name: result[name] for name in RESULT_DETAILS if name in result}
+
+
+def cache_key(endpoint: str, params: dict, account: str) -> str:
+    """Address of a result: the endpoint, its normalized parameters and the account digest"""
+    normalized = {
+        k: v.strip().lower() if isinstance(v, str) else v
+        for k, v in sorted(params.items())
+    }
+    payload = json.dumps([endpoint, normalized, account], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_etag(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ResultCache:
+    """
+    Size-bounded LRU of result files on disk, one `<key>.json` metadata file
+    next to each `<key>.<ext>` data file.
+    """
+
+    def __init__(self, directory: Path = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_MB * 1024 * 1024,
+                 default_ttl: int = RESULT_CACHE_TTL, ttls: dict = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = RESULT_CACHE_TTLS if ttls is None else ttls
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future resolving to a cache entry
+        self._waiters = {}   # key -> [waiting callers, cancel Event, executor future]
+        self._entries = {}   # key -> entry, ordered by last access
+        self._leases = {}    # data file -> responses still sending it
+        self._doomed = set() # leased data files to delete when their last lease ends
+        self._load()
+
+    def ttl_for(self, endpoint: str) -> int:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    # --- lookups ---
+
+    def get(self, key: str):
+        """Fresh entry for `key`, marking it most recently used"""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() >= entry["expires_at"] or not os.path.exists(entry["file_path"]):
+            self._remove_locked(key)
+            return None
+        self._entries[key] = self._entries.pop(key)
+        return entry
+
+    def submit(self, key: str, endpoint: str, compute, executor, refresh: bool = False, ttl: int = None):
+        """
+        Return `(future, hit)`. A cached entry resolves immediately; otherwise the
+        first caller submits `compute(on_step)` to `executor` and every concurrent
+        caller for the same key gets the same future. `refresh` skips the cached
+        entry (an in-flight scrape is still shared) and `ttl` overrides the
+        endpoint's TTL. A caller that stops waiting calls `abandon()`.
+        """
+        with self._lock:
+            entry = None if refresh else self._get_locked(key)
+            if entry is not None:
+                future = Future()
+                future.set_result(entry)
+                return future, True
+            future = self._inflight.get(key)
+            if future is not None and not self._waiters[key][1].is_set():
+                self._waiters[key][0] += 1
+                return future, False
+            # A scrape being cancelled is left to finish aborting; this caller starts a fresh one
+            future = self._inflight[key] = Future()
+            # A running future cannot be cancelled by one impatient waiter
+            future.set_running_or_notify_cancel()
+            cancelled = threading.Event()
+            waiters = self._waiters[key] = [1, cancelled, None]
+
+        def on_step(step: str):
+            if cancelled.is_set():
+                raise ScrapeAborted("Nobody is waiting for this scrape any more")
+
+        def finish(work):
+            try:
+                error = work.exception()
+                if error is None:
+                    future.set_result(self.put(key, endpoint, work.result(), ttl))
+                else:
+                    future.set_exception(error)
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+                        del self._waiters[key]
+
+        try:
+            work = waiters[2] = executor.submit(compute, on_step)
+        except BaseException:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+                    del self._waiters[key]
+            raise
+        work.add_done_callback(finish)
+        return future, False
+
+    def abandon(self, key: str, future: Future):
+        """
+        A caller of `submit()` stopped waiting (client gone, deadline passed).
+        Once nobody waits, the scrape is dropped from its queue or stopped at
+        its next step, and its browser goes back to the pool.
+        """
+        with self._lock:
+            if self._inflight.get(key) is not future:
+                return
+            waiters = self._waiters[key]
+            waiters[0] -= 1
+            if waiters[0] > 0:
+                return
+            waiters[1].set()
+            work = waiters[2]
+        if work is not None and not work.cancel():
+            print(f"🛑 Nobody waits for scrape {key[:12]} any more; stopping it at its next step")
+
+    # --- leases ---
+
+    def lease(self, entry: dict) -> bool:
+        """
+        Keep `entry`'s file on disk while a response sends it: eviction defers
+        the delete until the matching `release()`. False if the file is gone.
+        """
+        path = entry["file_path"]
+        with self._lock:
+            if not os.path.exists(path):
+                return False
+            self._leases[path] = self._leases.get(path, 0) + 1
+            return True
+
+    def release(self, entry: dict):
+        path = entry["file_path"]
+        with self._lock:
+            count = self._leases.pop(path, 1) - 1
+            if count > 0:
+                self._leases[path] = count
+            elif path in self._doomed:
+                self._doomed.discard(path)
+                _unlink(path)
+
+    # --- storage ---
+
+    def put(self, key: str, endpoint: str, result: dict, ttl: int = None) -> dict:
+        """Move a scraper result's file into the cache and index it"""
+        source = result["file_path"]
+        ext = os.path.splitext(source)[1] or ".bin"
+        # A new name per result, so a refresh never overwrites a file that is being sent
+        file_path = str(self.directory / f"{key}-{uuid.uuid4().hex[:8]}{ext}")
+        shutil.move(source, file_path)
+
+        now = time.time()
+        entry = {
+            "key": key,
+            "endpoint": endpoint,
+            "file_path": file_path,
+            "file_name": result["file_name"],
+            "file_size": os.path.getsize(file_path),
+            # Captured exports were hashed on the way in; saves reading the file again
+            "etag": result.get("etag") or file_etag(file_path),
+            "created_at": now,
+            "expires_at": now + (self.ttl_for(endpoint) if ttl is None else ttl),
+            "snapshot_id": result.get("snapshot_id"),
+            "details": result_details(result),
+        }
+        tmp_path = self.directory / f"{key}.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self.directory / f"{key}.json")
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._discard_file_locked(previous["file_path"])
+            self._entries[key] = entry
+            self._evict_locked()
+        return entry
+
+    def _evict_locked(self):
+        """Drop expired entries, then least recently used ones until under the size bound"""
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if now >= e["expires_at"]]:
+            self._remove_locked(key)
+        total = sum(e["file_size"] for e in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries[key]["file_size"]
+            self._remove_locked(key)
+
+    def _remove_locked(self, key: str):
+        entry = self._entries.pop(key, None)
+        _unlink(self.directory / f"{key}.json")
+        if entry:
+            self._discard_file_locked(entry["file_path"])
+
+    def _discard_file_locked(self, path: str):
+        """Delete a data file now, or once the responses sending it are done"""
+        if self._leases.get(path):
+            self._doomed.add(path)
+        else:
+            _unlink(path)
+
+    def _load(self):
+        """Rebuild the index from disk, oldest first, discarding orphans and expired entries"""
+        entries = []
+        for meta in self.directory.glob("*.json"):
+            try:
+                with open(meta) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                meta.unlink(missing_ok=True)
+        for entry in sorted(entries, key=lambda e: e["created_at"]):
+            self._entries[entry["key"]] = entry
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if not os.path.exists(e["file_path"])]:
+                self._remove_locked(key)
+            self._evict_locked()
+            # Data files whose delete was deferred when the process stopped
+            indexed = {os.path.abspath(e["file_path"]) for e in self._entries.values()}
+            for path in self.directory.iterdir():
+                if path.suffix not in (".json", ".tmp") and path.is_file() and str(path.absolute()) not in indexed:
+                    path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e["file_size"] for e in self._entries.values()),
+                "inflight": len(self._inflight),
+                "leased": sum(self._leases.values()),
+                "waiters": sum(w[0] for w in self._waiters.values()),
+            }
@@ -0,0 +1,407 @@
+# service/scheduler.py
+#
+# Prefetch of watched ASINs and niches. A watchlist of searches with cron-like
+# schedules is kept in SQLite; due entries are scraped during off-peak windows,
+# a few at a time, and their results are stored in the result cache so daytime
+# requests for the same search are answered without a browser.
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from service.registry import load_scrapers, watchable_endpoints
+from service.credentials import CredentialsError, seal, unseal, seal_plaintext_rows
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+WATCHLIST_DB_PATH = Path(os.getenv("WATCHLIST_DB_PATH", PROJECT_ROOT / "data" / "watchlist.sqlite3"))
+SCHEDULER_WINDOWS = os.getenv("SCHEDULER_WINDOWS", "01:00-06:00")  # local time; empty means any time
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "1"))
+SCHEDULER_TICK = int(os.getenv("SCHEDULER_TICK", "30"))
+WATCH_DEFAULT_SCHEDULE = os.getenv("WATCH_DEFAULT_SCHEDULE", "0 2 * * *")
+WATCH_RESULT_TTL = int(os.getenv("WATCH_RESULT_TTL", str(24 * 60 * 60)))
+
+RUNNING, SUCCEEDED, FAILED = "running", "succeeded", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist (
+    id TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    search_text TEXT NOT NULL,
+    max_rank INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    result_ttl INTEGER NOT NULL,
+    credentials TEXT NOT NULL,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    next_run_at REAL,
+    last_run_at REAL,
+    last_status TEXT,
+    last_error TEXT,
+    last_seconds REAL,
+    last_snapshot_id INTEGER,
+    runs INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS watchlist_due ON watchlist (enabled, next_run_at);
+"""
+
+
+class ScheduleError(ValueError):
+    """Malformed cron expression or off-peak window"""
+
+
+# --- Schedules ---
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+CRON_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+
+
+class CronSchedule:
+    """
+    Five-field cron expression (minute hour day month weekday) with `*`, lists,
+    ranges and `/step`, plus @hourly/@daily/@weekly/@monthly. Weekday 0 and 7 are
+    Sunday; as in cron, a restricted day and weekday match if either does.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = CRON_ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ScheduleError(f"Invalid schedule '{expression}', expected 5 cron fields")
+        parsed = [self._parse(text, name, low, high) for text, (name, low, high) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(text: str, name: str, low: int, high: int) -> set:
+        values = set()
+        for part in text.split(","):
+            base, _, step = part.partition("/")
+            try:
+                step = int(step) if step else 1
+                if base == "*":
+                    start, end = low, high
+                elif "-" in base:
+                    start, end = (int(v) for v in base.split("-", 1))
+                else:
+                    start = int(base)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ScheduleError(f"Invalid {name} field '{text}'")
+            if step < 1 or not low <= start <= end <= high:
+                raise ScheduleError(f"Invalid {name} field '{text}', values must be within {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, when: datetime) -> bool:
+        day = when.day in self.days
+        weekday = (when.isoweekday() % 7) in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp: float) -> float:
+        """First matching minute strictly after `timestamp` (local time)"""
+        when = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = when + timedelta(days=366 * 5)
+        while when < limit:
+            if when.month not in self.months:
+                when = (when.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(when):
+                when = (when + timedelta(days=1)).replace(hour=0, minute=0)
+            elif when.hour not in self.hours:
+                when = (when + timedelta(hours=1)).replace(minute=0)
+            elif when.minute not in self.minutes:
+                when += timedelta(minutes=1)
+            else:
+                return when.timestamp()
+        raise ScheduleError(f"Schedule '{self.expression}' never runs")
+
+
+def parse_windows(spec: str) -> list:
+    """Off-peak windows from "01:00-06:00,22:30-23:59" as (start, end) minutes of the day"""
+    windows = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            start, end = (datetime.strptime(t.strip(), "%H:%M") for t in item.split("-"))
+        except ValueError:
+            raise ScheduleError(f"Invalid window '{item}', expected HH:MM-HH:MM")
+        windows.append((start.hour * 60 + start.minute, end.hour * 60 + end.minute))
+    return windows
+
+
+def in_windows(windows: list, timestamp: float = None) -> bool:
+    """True inside any window (one ending before it starts spans midnight); no windows means always"""
+    if not windows:
+        return True
+    now = datetime.fromtimestamp(timestamp or time.time())
+    minute = now.hour * 60 + now.minute
+    return any(
+        start <= minute < end if start <= end else (minute >= start or minute < end)
+        for start, end in windows
+    )
+
+
+# --- Watchlist ---
+
+class WatchlistStore:
+    """SQLite-backed watchlist; entries keep the credentials their scrapes run with, encrypted"""
+
+    def __init__(self, path: Path = WATCHLIST_DB_PATH, endpoints: tuple = None):
+        self.path = Path(path)
+        # Endpoints entries may watch; by default every watchable scraper in the registry
+        self.endpoints = tuple(endpoints) if endpoints is not None else watchable_endpoints(load_scrapers())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            seal_plaintext_rows(conn, "watchlist")
+        os.chmod(self.path, 0o600)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def add(self, endpoint: str, search_text: str, credentials: dict, max_rank: int = 65, mode: str = "browser",
+            schedule: str = WATCH_DEFAULT_SCHEDULE, result_ttl: int = WATCH_RESULT_TTL, enabled: bool = True) -> dict:
+        if endpoint not in self.endpoints:
+            raise ScheduleError(f"Unknown endpoint '{endpoint}', expected one of {', '.join(self.endpoints)}")
+        now = time.time()
+        entry_id = uuid.uuid4().hex
+        next_run = CronSchedule(schedule).next_after(now)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO watchlist (id, endpoint, search_text, max_rank, mode, schedule, result_ttl, credentials, "
+                "enabled, created_at, updated_at, next_run_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry_id, endpoint, search_text.strip(), max_rank, mode, schedule, result_ttl,
+                 seal(credentials), int(enabled), now, now, next_run),
+            )
+        return self.get(entry_id)
+
+    def get(self, entry_id: str, include_credentials: bool = False):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM watchlist WHERE id = ?", (entry_id,)).fetchone()
+        return _to_dict(row, include_credentials) if row else None
+
+    def list(self, endpoint: str = None) -> list:
+        query, args = "SELECT * FROM watchlist", []
+        if endpoint:
+            query += " WHERE endpoint = ?"
+            args.append(endpoint)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY created_at", args).fetchall()
+        return [_to_dict(row) for row in rows]
+
+    def update(self, entry_id: str, **changes):
+        """Change an entry's fields; a new schedule or re-enabling recomputes the next run"""
+        entry = self.get(entry_id)
+        if entry is None:
+            return None
+        columns = {k: v for k, v in changes.items() if v is not None}
+        if columns.get("endpoint", entry["endpoint"]) not in self.endpoints:
+            raise ScheduleError(f"Unknown endpoint '{columns['endpoint']}'")
+        if "credentials" in columns:
+            columns["credentials"] = seal(columns["credentials"])
+        if "search_text" in columns:
+            columns["search_text"] = columns["search_text"].strip()
+        if "enabled" in columns:
+            columns["enabled"] = int(columns["enabled"])
+        if "schedule" in columns or columns.get("enabled"):
+            columns["next_run_at"] = CronSchedule(columns.get("schedule", entry["schedule"])).next_after(time.time())
+        if columns:
+            columns["updated_at"] = time.time()
+            assignments = ", ".join(f"{name} = ?" for name in columns)
+            with self._connect() as conn:
+                conn.execute(f"UPDATE watchlist SET {assignments} WHERE id = ?", (*columns.values(), entry_id))
+        return self.get(entry_id)
+
+    def delete(self, entry_id: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM watchlist WHERE id = ?", (entry_id,)).rowcount > 0
+
+    def claim_due(self, now: float, limit: int) -> list:
+        """
+        Entries whose run is due, advanced to their next run in the same
+        transaction so several API processes never prefetch the same entry twice.
+        """
+        if limit <= 0:
+            return []
+        claimed = []
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT * FROM watchlist WHERE enabled = 1 AND next_run_at <= ? ORDER BY next_run_at LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                for row in rows:
+                    next_run = CronSchedule(row["schedule"]).next_after(now)
+                    try:
+                        entry = _to_dict(row, include_credentials=True)
+                    except CredentialsError as e:
+                        conn.execute(
+                            "UPDATE watchlist SET next_run_at = ?, last_status = ?, last_error = ?, "
+                            "failures = failures + 1 WHERE id = ?",
+                            (next_run, FAILED, str(e), row["id"]),
+                        )
+                        continue
+                    conn.execute(
+                        "UPDATE watchlist SET next_run_at = ?, last_status = ? WHERE id = ?",
+                        (next_run, RUNNING, row["id"]),
+                    )
+                    claimed.append(entry)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return claimed
+
+    def mark_running(self, entry_id: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE watchlist SET last_status = ? WHERE id = ?", (RUNNING, entry_id))
+
+    def record_run(self, entry_id: str, status: str, started_at: float, error: str = None, snapshot_id: int = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE watchlist SET last_run_at = ?, last_status = ?, last_error = ?, last_seconds = ?, "
+                "last_snapshot_id = COALESCE(?, last_snapshot_id), runs = runs + 1, failures = failures + ? "
+                "WHERE id = ?",
+                (started_at, status, error, round(time.time() - started_at, 3), snapshot_id,
+                 int(status == FAILED), entry_id),
+            )
+
+
+def _to_dict(row, include_credentials: bool = False) -> dict:
+    entry = dict(row)
+    sealed = entry.pop("credentials")
+    if include_credentials:
+        entry["credentials"] = unseal(sealed)
+    else:
+        try:
+            entry["username"] = unseal(sealed).get("username")
+        except CredentialsError:
+            entry["username"] = None
+    entry["enabled"] = bool(entry["enabled"])
+    return entry
+
+
+# --- Scheduler ---
+
+class Scheduler:
+    """
+    Checks the watchlist every `tick` seconds and, inside the off-peak windows,
+    hands due entries to `prefetch(entry)` on at most `concurrency` threads.
+    Entries due outside a window wait for the next one.
+    """
+
+    def __init__(self, store: WatchlistStore, prefetch, concurrency: int = SCHEDULER_CONCURRENCY,
+                 windows: str = SCHEDULER_WINDOWS, tick: int = SCHEDULER_TICK):
+        self.store = store
+        self.prefetch = prefetch
+        self.concurrency = max(1, concurrency)
+        self.windows = parse_windows(windows)
+        self.tick_seconds = tick
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="prefetch")
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+        windows = ", ".join(f"{s // 60:02d}:{s % 60:02d}-{e // 60:02d}:{e % 60:02d}" for s, e in self.windows)
+        print(f"🗓️ Scheduler started ({len(self.store.list())} watched, windows: {windows or 'any time'})")
+
+    def stop(self):
+        """Stop claiming entries and wait for running prefetches"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def in_window(self, timestamp: float = None) -> bool:
+        return in_windows(self.windows, timestamp)
+
+    def running(self) -> list:
+        with self._lock:
+            return list(self._running)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"⚠️ Scheduler tick failed: {e}")
+            self._stop.wait(self.tick_seconds)
+
+    def tick(self):
+        if not self.in_window():
+            return
+        with self._lock:
+            free = self.concurrency - len(self._running)
+        for entry in self.store.claim_due(time.time(), free):
+            self._submit(entry)
+
+    def run_now(self, entry_id: str) -> bool:
+        """
+        Prefetch an entry immediately, outside the windows; False if unknown or
+        already running. Raises CredentialsError if its login cannot be decrypted.
+        """
+        entry = self.store.get(entry_id, include_credentials=True)
+        if entry is None:
+            return False
+        # Checked and claimed at once, so two concurrent calls cannot both start it
+        with self._lock:
+            if entry_id in self._running:
+                return False
+            self._running.add(entry_id)
+        try:
+            self.store.mark_running(entry_id)
+            self._executor.submit(self._run, entry)
+        except BaseException:
+            with self._lock:
+                self._running.discard(entry_id)
+            raise
+        return True
+
+    def _submit(self, entry: dict):
+        with self._lock:
+            self._running.add(entry["id"])
+        self._executor.submit(self._run, entry)
+
+    def _run(self, entry: dict):
+        started = time.time()
+        label = f"{entry['endpoint']} '{entry['search_text']}'"
+        print(f"🗓️ Prefetching {label}")
+        try:
+            result = self.prefetch(entry) or {}
+            self.store.record_run(entry["id"], SUCCEEDED, started, snapshot_id=result.get("snapshot_id"))
+            print(f"✅ Prefetched {label} in {time.time() - started:.1f}s")
+        except Exception as e:
+            self.store.record_run(entry["id"], FAILED, started, error=str(e))
+            print(f"❌ Prefetch of {label} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(entry["id"])
@@ -0,0 +1,350 @@
+# service/snapshots.py
+#
+# History of Rank Maker and Niche Finder results. Every export is ingested into
+# SQLite as a snapshot (one row per keyword or niche, indexed by ASIN, keyword,
+# niche and time), so clients can ask for only what changed since an earlier
+# snapshot and query how rows evolved, instead of re-downloading full CSVs.
+import os
+import csv
+import json
+import time
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "1") == "1"
+SNAPSHOTS_DB_PATH = Path(os.getenv("SNAPSHOTS_DB_PATH", PROJECT_ROOT / "data" / "snapshots.sqlite3"))
+SNAPSHOT_RETENTION_DAYS = float(os.getenv("SNAPSHOT_RETENTION_DAYS", "90"))  # 0 keeps everything
+
+ADDED, REMOVED, CHANGED = "added", "removed", "changed"
+CHANGE_COLUMN = "_change"
+CHANGED_COLUMNS_COLUMN = "_changed_columns"
+
+# Parameters that make two scrapes comparable. API-mode exports differ from browser
+# exports, so they form series of their own (see series_params)
+SERIES_PARAMS = {
+    "smartscout/rank-maker": ("search_text", "max_rank"),
+    "smartscout/niche-finder": ("search_text",),
+}
+# Header (normalized) identifying a row within one export, first match wins
+KEY_COLUMNS = {
+    "smartscout/rank-maker": ("keyword", "keywords", "search term", "search terms", "phrase"),
+    "smartscout/niche-finder": ("subcategory", "sub category", "niche", "niche name", "name"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    endpoint TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    series TEXT NOT NULL,
+    params TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    key_column TEXT,
+    row_count INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_series ON snapshots (series, created_at);
+CREATE INDEX IF NOT EXISTS snapshots_subject ON snapshots (subject, created_at);
+CREATE INDEX IF NOT EXISTS snapshots_created ON snapshots (created_at);
+CREATE TABLE IF NOT EXISTS snapshot_rows (
+    snapshot_id INTEGER NOT NULL,
+    row_key TEXT NOT NULL,
+    row_hash TEXT NOT NULL,
+    asin TEXT,
+    keyword TEXT,
+    niche TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, row_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS snapshot_rows_asin ON snapshot_rows (asin, snapshot_id);
+CREATE INDEX IF NOT EXISTS snapshot_rows_keyword ON snapshot_rows (keyword, snapshot_id);
+CREATE INDEX IF NOT EXISTS snapshot_rows_niche ON snapshot_rows (niche, snapshot_id);
+"""
+
+
+class SnapshotError(ValueError):
+    """Unknown snapshot or malformed `since`"""
+
+
+def _normalize_header(name: str) -> str:
+    return " ".join((name or "").replace("_", " ").split()).lower()
+
+
+def series_params(endpoint: str, params: dict) -> dict:
+    names = SERIES_PARAMS.get(endpoint, ("search_text",))
+    series = {
+        name: params[name].strip().lower() if isinstance(params.get(name), str) else params.get(name)
+        for name in names
+    }
+    # Browser series keep the key they had before the mode was part of it
+    if (params.get("mode") or "browser") != "browser":
+        series["mode"] = params["mode"]
+    return series
+
+
+def series_key(endpoint: str, params: dict) -> str:
+    """Identity of a series of comparable snapshots"""
+    payload = json.dumps([endpoint, series_params(endpoint, params)], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def parse_since(value: str) -> float:
+    """Epoch seconds or an ISO 8601 timestamp (naive ones are local time)"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        raise SnapshotError(f"Invalid since '{value}', expected 'previous', epoch seconds or an ISO 8601 time")
+
+
+class SnapshotStore:
+    """SQLite-backed snapshot history; every call uses its own connection, so it is thread-safe"""
+
+    def __init__(self, path: Path = SNAPSHOTS_DB_PATH, retention_days: float = SNAPSHOT_RETENTION_DAYS):
+        self.path = Path(path)
+        self.retention_days = retention_days
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # --- ingestion ---
+
+    def ingest(self, endpoint: str, params: dict, file_path: str) -> dict:
+        """Store the export at `file_path` as the newest snapshot of its series"""
+        subject = series_params(endpoint, params).get("search_text") or ""
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            columns = reader.fieldnames or []
+            key_column = self._key_column(endpoint, columns)
+            records = []
+            seen = {}
+            content = hashlib.sha256()
+            for row in reader:
+                data = json.dumps([row.get(c) for c in columns], ensure_ascii=False)
+                row_hash = hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+                content.update(row_hash.encode("ascii"))
+                key = (row.get(key_column) or "").strip().lower() if key_column else row_hash
+                # Repeated keys within one export stay distinct rows
+                seen[key] = seen.get(key, 0) + 1
+                if seen[key] > 1:
+                    key = f"{key}#{seen[key]}"
+                records.append((key, row_hash, *self._index_values(endpoint, subject, row, columns, key_column), data))
+
+        now = time.time()
+        with self._transaction() as conn:
+            snapshot_id = conn.execute(
+                "INSERT INTO snapshots (endpoint, subject, series, params, columns, key_column, row_count, "
+                "content_hash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (endpoint, subject, series_key(endpoint, params), json.dumps(series_params(endpoint, params)),
+                 json.dumps(columns), key_column, len(records), content.hexdigest()[:32], now),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO snapshot_rows (snapshot_id, row_key, row_hash, asin, keyword, niche, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((snapshot_id, *record) for record in records),
+            )
+            self._prune(conn, now)
+        print(f"🗂️ Snapshot {snapshot_id}: {endpoint} '{subject}' ({len(records)} rows)")
+        return self.get(snapshot_id)
+
+    def _key_column(self, endpoint: str, columns: list):
+        by_name = {_normalize_header(c): c for c in columns}
+        for candidate in KEY_COLUMNS.get(endpoint, ()):
+            if candidate in by_name:
+                return by_name[candidate]
+        return None  # rows are identified by content; edits show as removed + added
+
+    def _index_values(self, endpoint: str, subject: str, row: dict, columns: list, key_column: str) -> tuple:
+        """(asin, keyword, niche) of a row for the history indexes"""
+        by_name = {_normalize_header(c): row.get(c) for c in columns}
+        key = (row.get(key_column) or "").strip() if key_column else None
+        if endpoint == "smartscout/rank-maker":
+            return subject.upper() or None, (key or "").lower() or None, None
+        asin = by_name.get("asin")
+        keyword = by_name.get("keyword")
+        return (
+            asin.strip().upper() if asin else None,
+            keyword.strip().lower() if keyword else None,
+            (key or subject).lower() or None,
+        )
+
+    def _prune(self, conn, now: float):
+        """Drop snapshots past retention, always keeping the newest of each series"""
+        if not self.retention_days:
+            return
+        cutoff = now - self.retention_days * 86400
+        old = [row[0] for row in conn.execute(
+            "SELECT id FROM snapshots WHERE created_at < ? "
+            "AND id NOT IN (SELECT MAX(id) FROM snapshots GROUP BY series)",
+            (cutoff,),
+        )]
+        for snapshot_id in old:
+            conn.execute("DELETE FROM snapshot_rows WHERE snapshot_id = ?", (snapshot_id,))
+            conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+
+    # --- lookups ---
+
+    @staticmethod
+    def _snapshot(row) -> dict:
+        snapshot = dict(row)
+        snapshot["params"] = json.loads(snapshot["params"])
+        snapshot["columns"] = json.loads(snapshot["columns"])
+        return snapshot
+
+    def get(self, snapshot_id: int):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        return self._snapshot(row) if row else None
+
+    def latest(self, endpoint: str, params: dict, at: float = None, before_id: int = None):
+        """Newest snapshot of the series, optionally taken at or before `at` and older than `before_id`"""
+        query = "SELECT * FROM snapshots WHERE series = ?"
+        args = [series_key(endpoint, params)]
+        if at is not None:
+            query += " AND created_at <= ?"
+            args.append(at)
+        if before_id is not None:
+            query += " AND id < ?"
+            args.append(before_id)
+        with self._connect() as conn:
+            row = conn.execute(query + " ORDER BY created_at DESC, id DESC LIMIT 1", args).fetchone()
+        return self._snapshot(row) if row else None
+
+    def baseline(self, snapshot: dict, since: str):
+        """Snapshot to diff `snapshot` against: the one before it, or the newest taken at or before `since`"""
+        at = None if since in (None, "", "previous") else parse_since(since)
+        return self.latest(snapshot["endpoint"], snapshot["params"], at=at, before_id=snapshot["id"])
+
+    def snapshots(self, endpoint: str = None, subject: str = None, since: float = None,
+                  until: float = None, limit: int = 100) -> list:
+        query, args = "SELECT * FROM snapshots WHERE 1 = 1", []
+        for clause, value in (("endpoint = ?", endpoint), ("subject = ?", subject and subject.strip().lower()),
+                              ("created_at >= ?", since), ("created_at <= ?", until)):
+            if value is not None:
+                query += f" AND {clause}"
+                args.append(value)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY created_at DESC, id DESC LIMIT ?", args + [limit]).fetchall()
+        return [self._snapshot(row) for row in rows]
+
+    def history(self, asin: str = None, keyword: str = None, niche: str = None, endpoint: str = None,
+                since: float = None, until: float = None, limit: int = 1000) -> list:
+        """Rows matching an ASIN, keyword and/or niche across snapshots, newest first"""
+        if not (asin or keyword or niche):
+            raise SnapshotError("Give at least one of asin, keyword or niche")
+        query = (
+            "SELECT s.id AS snapshot_id, s.endpoint, s.subject, s.created_at, s.columns, r.data "
+            "FROM snapshot_rows r JOIN snapshots s ON s.id = r.snapshot_id WHERE 1 = 1"
+        )
+        args = []
+        for clause, value in (("r.asin = ?", asin and asin.strip().upper()),
+                              ("r.keyword = ?", keyword and keyword.strip().lower()),
+                              ("r.niche = ?", niche and niche.strip().lower()),
+                              ("s.endpoint = ?", endpoint), ("s.created_at >= ?", since),
+                              ("s.created_at <= ?", until)):
+            if value is not None:
+                query += f" AND {clause}"
+                args.append(value)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY s.created_at DESC LIMIT ?", args + [limit]).fetchall()
+        return [
+            {
+                "snapshot_id": row["snapshot_id"],
+                "endpoint": row["endpoint"],
+                "subject": row["subject"],
+                "created_at": row["created_at"],
+                "row": dict(zip(json.loads(row["columns"]), json.loads(row["data"]))),
+            }
+            for row in rows
+        ]
+
+    # --- deltas ---
+
+    def delta(self, snapshot: dict, baseline: dict = None):
+        """
+        `(columns, rows)` of what changed from `baseline` to `snapshot`: rows added,
+        removed (with their last values) or changed (with new values and the names
+        of the changed columns). Without a baseline every row counts as added.
+        """
+        new_columns = snapshot["columns"]
+        old_columns = baseline["columns"] if baseline else []
+        columns = [CHANGE_COLUMN, CHANGED_COLUMNS_COLUMN] + new_columns + [c for c in old_columns if c not in new_columns]
+        rows = []
+        with self._connect() as conn:
+            if baseline is None:
+                for (data,) in conn.execute(
+                    "SELECT data FROM snapshot_rows WHERE snapshot_id = ?", (snapshot["id"],)
+                ):
+                    rows.append(dict(zip(new_columns, json.loads(data)), **{CHANGE_COLUMN: ADDED}))
+                return columns, rows
+
+            if snapshot["content_hash"] == baseline["content_hash"] and new_columns == old_columns:
+                return columns, rows
+            for (data,) in conn.execute(
+                "SELECT n.data FROM snapshot_rows n WHERE n.snapshot_id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM snapshot_rows o WHERE o.snapshot_id = ? AND o.row_key = n.row_key)",
+                (snapshot["id"], baseline["id"]),
+            ):
+                rows.append(dict(zip(new_columns, json.loads(data)), **{CHANGE_COLUMN: ADDED}))
+            for new_data, old_data in conn.execute(
+                "SELECT n.data, o.data FROM snapshot_rows n JOIN snapshot_rows o "
+                "ON o.snapshot_id = ? AND o.row_key = n.row_key "
+                "WHERE n.snapshot_id = ? AND o.row_hash != n.row_hash",
+                (baseline["id"], snapshot["id"]),
+            ):
+                new = dict(zip(new_columns, json.loads(new_data)))
+                old = dict(zip(old_columns, json.loads(old_data)))
+                changed = [c for c in columns[2:] if new.get(c) != old.get(c)]
+                rows.append(dict(new, **{CHANGE_COLUMN: CHANGED, CHANGED_COLUMNS_COLUMN: ";".join(changed)}))
+            for (data,) in conn.execute(
+                "SELECT o.data FROM snapshot_rows o WHERE o.snapshot_id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM snapshot_rows n WHERE n.snapshot_id = ? AND n.row_key = o.row_key)",
+                (baseline["id"], snapshot["id"]),
+            ):
+                rows.append(dict(zip(old_columns, json.loads(data)), **{CHANGE_COLUMN: REMOVED}))
+        return columns, rows
+
+
+def load_snapshot_store():
+    """The configured snapshot store, or None when SNAPSHOTS_ENABLED=0"""
+    return SnapshotStore() if SNAPSHOTS_ENABLED else None
+
+
+def record_snapshot(store, endpoint: str, params: dict, result: dict) -> dict:
+    """Ingest a scraper result's file; history is best effort and never fails the scrape"""
+    if store is None or not result or not result.get("file_path"):
+        return result
+    try:
+        result["snapshot_id"] = store.ingest(endpoint, params, result["file_path"])["id"]
+    except Exception as e:
+        print(f"⚠️ Could not record snapshot for {endpoint}: {e}")
+    return result
@@ -0,0 +1,139 @@
+# worker.py
+#
+# Scrape worker process: claims jobs from the shared queue and runs them on its
+# own warm browsers, so a stuck chromedriver never takes the API down with it.
+#
+#   python worker.py                      # one process, SCRAPER_WORKERS jobs at a time
+#   python worker.py --processes 4        # four supervised processes on this host
+#
+# Start workers on as many hosts as needed; each heartbeats into the queue.
+import os
+import time
+import signal
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from scrapers.base_scraper import resolve_chromedriver
+from scrapers.browser_supervisor import SUPERVISOR
+from scrapers.smartscout.driver_pool import get_driver_pool, prewarm_from_env
+from scrapers.telemetry import register_runtime_gauges, render_metrics
+from service.accounts import AccountScheduler
+from service.handlers import build_handlers
+from service.jobs import JobRunner, load_queue_backend
+from service.snapshots import load_snapshot_store
+
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "3"))
+RESTART_DELAY = 5
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port: int):
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Metrics on :{port}/metrics")
+
+
+def run_worker(concurrency: int, metrics_port: int = None):
+    """Run jobs until SIGTERM/SIGINT, then let running jobs finish and quit the browsers"""
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+
+    pool = get_driver_pool()
+    SUPERVISOR.start()
+    try:
+        resolve_chromedriver()
+        prewarm_from_env(pool)
+    except Exception as e:
+        print(f"⚠️ Browser warm-up failed, continuing cold: {e}")
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    accounts = AccountScheduler(executor, concurrency)
+    register_runtime_gauges(executor, pool, accounts)
+    if metrics_port:
+        serve_metrics(metrics_port)
+    runner = JobRunner(load_queue_backend(), accounts, concurrency, build_handlers(pool, load_snapshot_store(), accounts=accounts))
+    runner.start()
+    stop.wait()
+
+    print(f"🧹 Worker {runner.worker_id} draining {len(runner.current_jobs())} job(s)")
+    runner.stop()
+    accounts.shutdown(cancel_futures=False)
+    executor.shutdown(wait=True)
+    runner.deregister()
+    pool.close()
+    SUPERVISOR.stop()
+
+
+def supervise(processes: int, concurrency: int, metrics_port: int = None):
+    """Keep `processes` workers alive, restarting any that die; child i serves metrics on metrics_port + i"""
+    stopping = False
+
+    def spawn(index):
+        port = metrics_port + index if metrics_port else None
+        process = multiprocessing.Process(target=run_worker, args=(concurrency, port), daemon=False)
+        process.start()
+        return process
+
+    def shutdown(*_):
+        nonlocal stopping
+        stopping = True
+        for process in children:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: the child drains its jobs
+
+    children = [spawn(i) for i in range(processes)]
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    while not stopping:
+        time.sleep(1)
+        for i, process in enumerate(children):
+            if not process.is_alive() and not stopping:
+                print(f"⚠️ Worker process {process.pid} exited with {process.exitcode}, restarting")
+                time.sleep(RESTART_DELAY)
+                children[i] = spawn(i)
+    for process in children:
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scrape jobs from the shared queue")
+    parser.add_argument("--concurrency", type=int, default=SCRAPER_WORKERS, help="jobs per process")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to supervise")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        # Resolved once here; forked children inherit the path
+        try:
+            resolve_chromedriver()
+        except Exception as e:
+            print(f"⚠️ Could not resolve chromedriver: {e}")
+        supervise(args.processes, args.concurrency, args.metrics_port)
+    else:
+        run_worker(args.concurrency, args.metrics_port)
+
+
+if __name__ == "__main__":
+    main()